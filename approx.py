@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# Approximate query mode
+# Stratified reservoir samples with design-weighted estimates and confidence
+# intervals for summarize_by_group and detect_missing.
+
+import time
+from statistics import NormalDist
+from typing import List, Dict, Any, Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STRATA = ['site', 'intervention_group']
+SUPPORTED_AGGS = ['mean', 'sum', 'count']
+MISSING_STRATUM = '<NA>'
+
+
+class StratifiedSample:
+    """
+    A bottom-k (reservoir-equivalent) sample of up to `capacity` rows per stratum.
+
+    Every row gets a uniform random key and each stratum keeps its smallest
+    keys, so any prefix of a stratum's rows (ordered by key) is itself a
+    uniform random sample. That lets queries grow the sample progressively
+    without re-sampling. Samples built from chunks are identical in
+    distribution to samples built from the whole frame.
+    """
+
+    def __init__(self, strata: List[str] = None, capacity: int = 5000, seed: int = 0):
+        self.strata = list(strata or DEFAULT_STRATA)
+        self.capacity = int(capacity)
+        self._rng = np.random.default_rng(seed)
+        self._rows = None
+        self._totals = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, strata: List[str] = None, capacity: int = 5000,
+                   seed: int = 0) -> 'StratifiedSample':
+        return cls.from_chunks([df], strata, capacity, seed)
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[pd.DataFrame], strata: List[str] = None,
+                    capacity: int = 5000, seed: int = 0) -> 'StratifiedSample':
+        sample = cls(strata, capacity, seed)
+        for chunk in chunks:
+            sample.update(chunk)
+        return sample
+
+    def _stratum_keys(self, chunk: pd.DataFrame) -> pd.Series:
+        # One string key per row; missing strata values (None, NaN, NA alike)
+        # form one stratum of their own, whatever dtype the chunk inferred
+        parts = [chunk[col].astype(object).where(chunk[col].notna(), MISSING_STRATUM).map(str)
+                 for col in self.strata]
+        key = parts[0]
+        for part in parts[1:]:
+            key = key + '\x1f' + part
+        return key
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """
+        Fold a chunk into the reservoir and the per-stratum population counts.
+
+        Linear in the chunk: strata are hashed to integer codes, and each
+        stratum's `capacity` smallest keys are picked with argpartition.
+        Only those candidates are merged (and sorted) with the reservoir.
+        """
+        missing = [c for c in self.strata if c not in chunk.columns]
+        if missing:
+            raise KeyError(f'Strata column(s) not found: {missing}')
+        keys = self._rng.random(len(chunk))
+        codes = chunk.groupby(self.strata, dropna=False, sort=False).ngroup().to_numpy()
+        groups = pd.Series(np.arange(len(chunk))).groupby(codes, sort=False).indices
+        labels = np.empty(len(groups), dtype=object)
+        picked = []
+        for code, positions in groups.items():
+            labels[code] = self._stratum_keys(chunk.iloc[positions[:1]]).iat[0]
+            if len(positions) > self.capacity:
+                positions = positions[np.argpartition(keys[positions], self.capacity - 1)[:self.capacity]]
+            picked.append(positions)
+        counts = pd.Series(np.bincount(codes, minlength=len(labels)), index=labels)
+        counts = counts.groupby(level=0).sum()
+        self._totals = counts if self._totals is None else self._totals.add(counts, fill_value=0)
+
+        picked = np.sort(np.concatenate(picked)) if picked else np.array([], dtype=np.int64)
+        rows = chunk.iloc[picked].assign(_skey=labels[codes[picked]], _key=keys[picked])
+        if self._rows is not None:
+            rows = pd.concat([self._rows.drop(columns='_rank'), rows], ignore_index=True)
+        rows = rows.sort_values(['_skey', '_key'], kind='stable')
+        rank = rows.groupby('_skey', sort=False).cumcount().to_numpy()
+        keep = rank < self.capacity
+        self._rows = rows[keep].assign(_rank=rank[keep]).reset_index(drop=True)
+
+    @property
+    def population(self) -> int:
+        return 0 if self._totals is None else int(self._totals.sum())
+
+    def take(self, per_stratum: int = None) -> pd.DataFrame:
+        """
+        Return the first `per_stratum` sampled rows of each stratum with
+        columns _stratum (code), _N (stratum population) and _n (rows taken).
+        """
+        if self._rows is None:
+            raise ValueError('Sample is empty')
+        per_stratum = self.capacity if per_stratum is None else min(per_stratum, self.capacity)
+        rows = self._rows[self._rows['_rank'] < per_stratum]
+        stratum, labels = pd.factorize(rows['_skey'])
+        totals = self._totals.reindex(labels).to_numpy(dtype=np.float64)[stratum]
+        taken = np.bincount(stratum)[stratum].astype(np.float64)
+        return rows.assign(_stratum=stratum, _N=totals, _n=taken)
+
+
+def _design(rows: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Per-row stratum codes and weights plus per-stratum N_h and n_h.
+    """
+    s = rows['_stratum'].to_numpy()
+    n_h = np.bincount(s).astype(np.float64)
+    N_h = np.zeros(len(n_h))
+    N_h[s] = rows['_N'].to_numpy()
+    return {'s': s, 'w': N_h[s] / n_h[s], 'N_h': N_h, 'n_h': n_h}
+
+
+def _domain_estimate(design: Dict[str, np.ndarray], z: np.ndarray) -> tuple:
+    """
+    Horvitz-Thompson total of z and its stratified variance
+    sum_h N_h^2 (1 - n_h/N_h) s_h^2 / n_h, with s_h^2 from bincount sums.
+    """
+    s, N_h, n_h = design['s'], design['N_h'], design['n_h']
+    total = float(np.dot(design['w'], z))
+    sum_z = np.bincount(s, weights=z, minlength=len(n_h))
+    sum_z2 = np.bincount(s, weights=z * z, minlength=len(n_h))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_h = np.where(n_h > 1, (sum_z2 - sum_z ** 2 / n_h) / (n_h - 1), 0.0)
+    variance = float(np.sum(N_h ** 2 * (1 - n_h / N_h) * np.maximum(var_h, 0.0) / n_h))
+    return total, max(variance, 0.0)
+
+
+def _estimate(design: Dict[str, np.ndarray], in_group: np.ndarray, values: np.ndarray,
+              func: str) -> tuple:
+    present = in_group & ~np.isnan(values) if values is not None else in_group
+    if func == 'count' or values is None:
+        return _domain_estimate(design, present.astype(np.float64))
+    y = np.where(present, values, 0.0)
+    if func == 'sum':
+        return _domain_estimate(design, y)
+    # mean = ratio of two totals; linearized variance
+    n_hat, _ = _domain_estimate(design, present.astype(np.float64))
+    if n_hat == 0:
+        return np.nan, np.nan
+    y_hat, _ = _domain_estimate(design, y)
+    ratio = y_hat / n_hat
+    _, variance = _domain_estimate(design, np.where(present, values - ratio, 0.0) / n_hat)
+    return ratio, variance
+
+
+def _summaries(rows: pd.DataFrame, group_col: str, agg_dict: Dict[str, Any], z: float):
+    records, worst = [], 0.0
+    design = _design(rows)
+    groups = rows[group_col]
+    columns = {col: pd.to_numeric(rows[col], errors='coerce').to_numpy(np.float64) for col in agg_dict}
+    for g in pd.unique(groups.dropna()):
+        in_group = (groups == g).to_numpy()
+        rec = {group_col: g}
+        specs = [(col, f) for col, funcs in agg_dict.items()
+                 for f in ([funcs] if isinstance(funcs, str) else funcs)]
+        specs.append((None, 'patient_count'))
+        for col, func in specs:
+            values = None if col is None else columns[col]
+            est, var = _estimate(design, in_group, values, 'count' if col is None else func)
+            half = z * np.sqrt(var)
+            name = 'patient_count' if col is None else (col if isinstance(agg_dict[col], str) else f'{col}_{func}')
+            rec[name], rec[f'{name}_ci_low'], rec[f'{name}_ci_high'] = est, est - half, est + half
+            if est and np.isfinite(half):
+                worst = max(worst, half / abs(est))
+        records.append(rec)
+    out = pd.DataFrame(records)
+    if len(out):
+        out = out.sort_values(group_col).reset_index(drop=True)
+    return out, worst
+
+
+def _progressive(sample: StratifiedSample, run, per_stratum: int, rel_error: float,
+                 time_budget: float):
+    start = time.perf_counter()
+    m = per_stratum if per_stratum is not None else (64 if rel_error or time_budget else sample.capacity)
+    while True:
+        rows = sample.take(m)
+        result, worst = run(rows)
+        done = (per_stratum is not None or m >= sample.capacity
+                or (rel_error is not None and worst <= rel_error)
+                or (time_budget is not None and time.perf_counter() - start >= time_budget / 2))
+        if done:
+            result.attrs.update({'sample_rows': len(rows), 'population_rows': sample.population,
+                                 'max_relative_error': worst})
+            return result
+        m = min(m * 2, sample.capacity)
+
+
+def approx_summarize_by_group(data: Union[pd.DataFrame, StratifiedSample], group_col: str,
+                              agg_dict: Dict[str, Union[str, List[str]]] = None,
+                              per_stratum: int = None, rel_error: float = None,
+                              time_budget: float = None, confidence: float = 0.95,
+                              strata: List[str] = None, seed: int = 0) -> pd.DataFrame:
+    """
+    Estimate summarize_by_group() from a stratified sample, with confidence intervals.
+
+    Supported aggregations: 'mean', 'sum', 'count'. Each output column has
+    matching *_ci_low/*_ci_high columns; patient_count is always estimated.
+
+    Budget (pick one; otherwise the whole reservoir is used):
+        per_stratum: rows per (site, intervention_group) stratum
+        rel_error:   grow the sample until every CI half-width is within this
+                     fraction of its estimate
+        time_budget: grow the sample while time remains (seconds, approximate)
+
+    result.attrs records sample_rows, population_rows and max_relative_error.
+
+    A DataFrame is sampled on every call (one pass over it); for repeated
+    queries build a StratifiedSample once and pass that instead.
+    """
+    sample = data if isinstance(data, StratifiedSample) else \
+        StratifiedSample.from_frame(data, strata, seed=seed)
+    agg_dict = agg_dict or {}
+    for col, funcs in agg_dict.items():
+        for f in ([funcs] if isinstance(funcs, str) else funcs):
+            if f not in SUPPORTED_AGGS:
+                raise ValueError(f'Unsupported approximate aggregation: {f}')
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return _progressive(sample, lambda rows: _summaries(rows, group_col, agg_dict, z),
+                        per_stratum, rel_error, time_budget)
+
+
+def approx_detect_missing(data: Union[pd.DataFrame, StratifiedSample], columns: List[str] = None,
+                          per_stratum: int = None, rel_error: float = None,
+                          time_budget: float = None, confidence: float = 0.95,
+                          strata: List[str] = None, seed: int = 0) -> pd.DataFrame:
+    """
+    Estimate detect_missing() from a stratified sample, with confidence intervals.
+
+    Returns a DataFrame indexed by column with missing_count, ci_low and ci_high.
+    As with approx_summarize_by_group, pass a prebuilt StratifiedSample for
+    repeated queries.
+    """
+    sample = data if isinstance(data, StratifiedSample) else \
+        StratifiedSample.from_frame(data, strata, seed=seed)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    def run(rows: pd.DataFrame):
+        cols = columns or [c for c in rows.columns if not c.startswith('_')]
+        records, worst = {}, 0.0
+        design = _design(rows)
+        for col in cols:
+            est, var = _domain_estimate(design, rows[col].isna().to_numpy(np.float64))
+            half = z * np.sqrt(var)
+            records[col] = {'missing_count': est, 'ci_low': max(est - half, 0.0), 'ci_high': est + half}
+            if est:
+                worst = max(worst, half / est)
+        return pd.DataFrame.from_dict(records, orient='index'), worst
+
+    return _progressive(sample, run, per_stratum, rel_error, time_budget)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# Bootstrap confidence intervals for outcome rates by arm
+# Resamples patients within each arm in vectorized batches, optionally across a
+# process pool, and reports percentile intervals for rates and arm differences.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_OUTCOMES = ['outcome_cvd', 'dropout']
+
+# Per-process copy of the cell table, set once by the pool initializer so
+# batches do not re-send it
+_TABLE: Dict[str, np.ndarray] = {}
+
+
+def _indicator(s: pd.Series, positive: Any) -> np.ndarray:
+    # 1.0 / 0.0 per patient, NaN where the outcome is missing
+    if pd.api.types.is_numeric_dtype(s):
+        return s.to_numpy(dtype=np.float64)
+    return np.where(s.isna(), np.nan, (s == positive).to_numpy(dtype=np.float64))
+
+
+def cell_table(df: pd.DataFrame, group_col: str = 'intervention_group',
+               outcomes: List[str] = None, positive: Any = 'Yes') -> Dict[str, Any]:
+    """
+    Collapse patients to counts per (arm, outcome pattern) cell.
+
+    A pattern records, for every outcome, whether it is missing, negative or
+    positive. Resampling patients within an arm only changes how many fall
+    in each cell, so the cell table is all the bootstrap needs.
+
+    Returns:
+        dict with 'arms' (labels), 'counts' (arms x patterns), and
+        'present'/'positive' (patterns x outcomes) 0/1 matrices.
+    """
+    outcomes = list(outcomes or DEFAULT_OUTCOMES)
+    missing = [c for c in [group_col] + outcomes if c not in df.columns]
+    if missing:
+        raise KeyError(f'Column(s) not found: {missing}')
+    df = df[df[group_col].notna()]
+    arm, arms = pd.factorize(df[group_col], sort=True)
+
+    # state per outcome: 0 missing, 1 negative, 2 positive; pattern = base-3 code
+    pattern = np.zeros(len(df), dtype=np.int64)
+    for j, col in enumerate(outcomes):
+        y = _indicator(df[col], positive)
+        state = np.where(np.isnan(y), 0, 1 + (y > 0)).astype(np.int64)
+        pattern += state * 3 ** j
+    patterns, pattern_idx = np.unique(pattern, return_inverse=True)
+
+    counts = np.bincount(arm * len(patterns) + pattern_idx.ravel(),
+                         minlength=len(arms) * len(patterns)).reshape(len(arms), len(patterns))
+    states = (patterns[:, None] // 3 ** np.arange(len(outcomes))) % 3
+    return {'arms': list(arms), 'outcomes': outcomes, 'counts': counts,
+            'present': (states > 0).astype(np.float64),
+            'positive': (states == 2).astype(np.float64)}
+
+
+def _rates(draws: np.ndarray, present: np.ndarray, positive: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (draws @ positive) / (draws @ present)
+
+
+def _init_worker(counts: np.ndarray, present: np.ndarray, positive: np.ndarray) -> None:
+    _TABLE.update(counts=counts, present=present, positive=positive)
+
+
+def _run_batch(seed: np.random.SeedSequence, size: int) -> np.ndarray:
+    """
+    One batch of resamples: (size, arms, outcomes) array of rates.
+
+    Drawing n_arm patients with replacement is a multinomial draw over the
+    arm's cells, which is equivalent to (and far cheaper than) materializing
+    a size x n_arm resample index matrix and counting it with bincount.
+    """
+    counts, present, positive = _TABLE['counts'], _TABLE['present'], _TABLE['positive']
+    rng = np.random.default_rng(seed)
+    out = np.empty((size, counts.shape[0], present.shape[1]))
+    for a, row in enumerate(counts):
+        n = row.sum()
+        draws = rng.multinomial(n, row / n, size=size) if n else np.zeros((size, len(row)))
+        out[:, a, :] = _rates(draws, present, positive)
+    return out
+
+
+def bootstrap_rates(df: pd.DataFrame, group_col: str = 'intervention_group',
+                    outcomes: List[str] = None, n_resamples: int = 10_000,
+                    confidence: float = 0.95, reference: Any = None, positive: Any = 'Yes',
+                    batch_size: int = 1_000, workers: int = 1, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """
+    Bootstrap percentile confidence intervals for outcome rates by arm.
+
+    Patients are resampled with replacement within each arm (arm sizes are
+    fixed, as randomized). Patients missing an outcome do not count towards
+    that outcome's rate. Differences are arm minus the reference arm
+    ('Control' if present, otherwise the first arm).
+
+    Batches get independent seeds spawned from `seed`, so results are the
+    same for any number of workers; workers > 1 runs batches in a process pool.
+
+    Returns:
+        dict with 'rates' (outcome, group, n, rate, ci_low, ci_high) and
+        'differences' (outcome, group, reference, difference, ci_low, ci_high).
+    """
+    table = cell_table(df, group_col, outcomes, positive)
+    arms, outcomes = table['arms'], table['outcomes']
+    if not arms:
+        raise ValueError(f'No rows with a value in {group_col}')
+    if reference is None:
+        reference = 'Control' if 'Control' in arms else arms[0]
+    if reference not in arms:
+        raise ValueError(f'Reference arm not found: {reference}')
+
+    sizes = [batch_size] * (n_resamples // batch_size)
+    if n_resamples % batch_size:
+        sizes.append(n_resamples % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    init_args = (table['counts'], table['present'], table['positive'])
+    if workers != 1 and len(sizes) > 1:
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=init_args) as pool:
+            stats = np.concatenate(list(pool.map(_run_batch, seeds, sizes)))
+    else:
+        _init_worker(*init_args)
+        stats = np.concatenate([_run_batch(s, n) for s, n in zip(seeds, sizes)])
+
+    q = [50 * (1 - confidence), 50 * (1 + confidence)]
+    observed = _rates(table['counts'].astype(np.float64), table['present'], table['positive'])
+    n_present = table['counts'] @ table['present']
+    with np.errstate(invalid='ignore'):
+        rate_ci = np.nanpercentile(stats, q, axis=0)
+    ref = arms.index(reference)
+    diff_stats = stats - stats[:, [ref], :]
+    with np.errstate(invalid='ignore'):
+        diff_ci = np.nanpercentile(diff_stats, q, axis=0)
+
+    rates, diffs = [], []
+    for j, outcome in enumerate(outcomes):
+        for a, label in enumerate(arms):
+            rates.append({'outcome': outcome, group_col: label, 'n': int(n_present[a, j]),
+                          'rate': observed[a, j], 'ci_low': rate_ci[0, a, j],
+                          'ci_high': rate_ci[1, a, j]})
+            if a != ref:
+                diffs.append({'outcome': outcome, group_col: label, 'reference': reference,
+                              'difference': observed[a, j] - observed[ref, j],
+                              'ci_low': diff_ci[0, a, j], 'ci_high': diff_ci[1, a, j]})
+    result = {'rates': pd.DataFrame(rates), 'differences': pd.DataFrame(diffs)}
+    for frame in result.values():
+        frame.attrs.update({'n_resamples': n_resamples, 'confidence': confidence})
+    return result
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# Clinical trial pipeline command-line interface
+# Usage: python clinical.py {check,validate,load,clean,filter,summarize,plot,serve} ...
+#
+# Only the standard library is imported at start-up. pandas, numpy and
+# matplotlib (via q3_data_utils and friends) are imported inside the
+# subcommands that need them, so --help and `check` start instantly.
+
+import os
+import sys
+import csv
+import gzip
+import argparse
+from typing import List, Dict, Any
+
+from schema import EXPECTED_COLUMNS
+
+# Magic bytes as in compressed_io, which cannot be imported here (it imports pandas)
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+FILTER_CONDITIONS = ['equals', 'greater_than', 'less_than', 'in_range', 'in_list']
+
+
+def parse_filter(text: str) -> Dict[str, Any]:
+    """
+    Parse 'column:condition:value' into a filter_data() filter dict.
+
+    in_list takes comma-separated values, in_range takes 'low,high'.
+    Numeric-looking values are converted to numbers.
+
+    Example:
+        >>> parse_filter('age:greater_than:65')
+        {'column': 'age', 'condition': 'greater_than', 'value': 65}
+    """
+    parts = text.split(':', 2)
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError(f'Filter must look like column:condition:value, got {text!r}')
+    column, condition, raw = parts
+    if condition not in FILTER_CONDITIONS:
+        raise argparse.ArgumentTypeError(
+            f'Unsupported condition {condition!r}; choose from {", ".join(FILTER_CONDITIONS)}')
+    if condition in ('in_list', 'in_range'):
+        value = [_parse_scalar(v.strip()) for v in raw.split(',')]
+        if condition == 'in_range' and len(value) != 2:
+            raise argparse.ArgumentTypeError('in_range needs exactly two values: low,high')
+    else:
+        value = _parse_scalar(raw)
+    return {'column': column, 'condition': condition, 'value': value}
+
+
+def _parse_scalar(raw: str) -> Any:
+    for cast in (int, float):
+        try:
+            return cast(raw)
+        except ValueError:
+            pass
+    return raw
+
+
+def parse_agg(items: List[str]) -> Dict[str, Any]:
+    """
+    Parse ['age=mean', 'bmi=mean,max'] into an agg_dict for summarize_by_group().
+
+    Example:
+        >>> parse_agg(['age=mean', 'bmi=mean,max'])
+        {'age': 'mean', 'bmi': ['mean', 'max']}
+    """
+    agg: Dict[str, List[str]] = {}
+    for item in items:
+        if '=' not in item:
+            raise argparse.ArgumentTypeError(f'Aggregation must look like column=func[,func], got {item!r}')
+        col, funcs = item.split('=', 1)
+        agg.setdefault(col, []).extend(f for f in funcs.split(',') if f)
+    return {col: funcs[0] if len(funcs) == 1 else funcs for col, funcs in agg.items()}
+
+
+# --- subcommands ---
+
+def cmd_check(args: argparse.Namespace) -> int:
+    # Header and row count only, using the csv module: no pandas import
+    if not os.path.exists(args.filepath):
+        print(f'ERROR: data file not found: {args.filepath}', file=sys.stderr)
+        return 1
+    # gzip is in the standard library; zstd and other formats go through `validate`
+    with open(args.filepath, 'rb') as f:
+        magic = f.read(4)
+    unsupported = f'cannot check {args.filepath} without pandas; use `clinical.py validate`'
+    if magic.startswith(ZSTD_MAGIC) or args.filepath.endswith(('.zst', '.zstd')):
+        print(f'ERROR: zstd-compressed file: {unsupported}', file=sys.stderr)
+        return 1
+    opener = gzip.open if magic.startswith(GZIP_MAGIC) else open
+    try:
+        with opener(args.filepath, 'rt', newline='', encoding='utf-8') as f:
+            header = [h.strip().lower() for h in next(csv.reader(f), [])]
+            rows = sum(1 for _ in f)
+    except (UnicodeDecodeError, OSError):
+        print(f'ERROR: not a UTF-8 CSV: {unsupported}', file=sys.stderr)
+        return 1
+    problems = [f'MISSING COLUMN: {c}' for c in EXPECTED_COLUMNS if c not in header]
+    if rows < args.min_rows:
+        problems.append(f'TOO FEW ROWS: {rows} (minimum expected {args.min_rows})')
+    for p in problems:
+        print(f'  {p}')
+    if problems:
+        print(f'CSV check FAILED ({len(problems)} problems)', file=sys.stderr)
+        return 1
+    print(f'CSV check PASSED: {rows} rows, {len(header)} columns')
+    return 0
+
+
+def cmd_validate(args: argparse.Namespace) -> int:
+    import data_quality
+    argv = [args.filepath, '--min-rows', str(args.min_rows)]
+    if args.report:
+        argv += ['--report', args.report]
+    return data_quality.main(argv)
+
+
+def cmd_load(args: argparse.Namespace) -> int:
+    from q3_data_utils import load_data
+    df = load_data(args.filepath)
+    print(f'Loaded {len(df)} rows, {len(df.columns)} columns')
+    print(df.dtypes.to_string())
+    return 0
+
+
+def _lazy(args: argparse.Namespace):
+    from lazy_frame import LazyFrame
+    lf = LazyFrame.scan_csv(args.filepath)
+    if getattr(args, 'clean', True):
+        lf = lf.clean(dedup_key=args.dedup_key) if args.dedup_key else lf.clean()
+    if getattr(args, 'filter', None):
+        lf = lf.filter(args.filter)
+    return lf
+
+
+def _write_or_print(df, output: str) -> None:
+    if output:
+        from q3_data_utils import save_data
+        save_data(df, output)
+        print(f'Wrote {len(df)} rows to {output}')
+    else:
+        print(df.to_string())
+
+
+def cmd_clean(args: argparse.Namespace) -> int:
+    _write_or_print(_lazy(args).collect(), args.output)
+    return 0
+
+
+def cmd_filter(args: argparse.Namespace) -> int:
+    lf = _lazy(args)
+    if args.columns:
+        lf = lf.select(args.columns.split(','))
+    _write_or_print(lf.collect(), args.output)
+    return 0
+
+
+def cmd_summarize(args: argparse.Namespace) -> int:
+    agg = parse_agg(args.agg) if args.agg else None
+    _write_or_print(_lazy(args).summarize_by_group(args.by, agg).collect(), args.output)
+    return 0
+
+
+def cmd_plot(args: argparse.Namespace) -> int:
+    from report_render import render_figures
+    df = _lazy(args).select([args.column]).collect()
+    spec = {'kind': 'bar', 'data': df[args.column].value_counts(), 'path': args.output,
+            'title': args.title or f'{args.column} value counts', 'rotation': 45}
+    result = render_figures([spec], workers=1)
+    print('Rendered' if result['rendered'] else 'Unchanged, skipped', args.output)
+    return 0
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    import cohort_service
+    argv = [args.filepath, '--host', args.host, '--port', str(args.port),
+            '--workers', str(args.workers), '--timeout', str(args.timeout)]
+    return cohort_service.main(argv + ([] if args.clean else ['--no-clean']))
+
+
+def cmd_risk(args: argparse.Namespace) -> int:
+    import risk_score
+    argv = [args.filepath, '-k', str(args.k), '--by', *args.by, '--chunksize', str(args.chunksize)]
+    return risk_score.main(argv + (['--output', args.output] if args.output else []))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='clinical', description='Clinical trial data pipeline.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('check', help='Fast header and row-count check (no pandas)')
+    p.add_argument('filepath')
+    p.add_argument('--min-rows', type=int, default=1000)
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser('validate', help='Full streaming data-quality report')
+    p.add_argument('filepath')
+    p.add_argument('--min-rows', type=int, default=1000)
+    p.add_argument('--report', help='Write the report to this file')
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser('load', help='Load a CSV and show its shape and dtypes')
+    p.add_argument('filepath')
+    p.set_defaults(func=cmd_load)
+
+    def data_args(p: argparse.ArgumentParser, with_filters: bool = True) -> None:
+        p.add_argument('filepath')
+        p.add_argument('--no-clean', dest='clean', action='store_false',
+                       help='Skip clean_data() before the command')
+        p.add_argument('--dedup-key', help='Deduplicate on this key column instead of full rows')
+        if with_filters:
+            p.add_argument('--filter', action='append', type=parse_filter, default=[],
+                           metavar='COL:COND:VALUE', help='filter_data() condition; repeatable')
+
+    p = sub.add_parser('clean', help='Clean a raw extract')
+    data_args(p, with_filters=False)
+    p.add_argument('-o', '--output', help='Output CSV, .csv.gz/.csv.zst for compressed (default: print)')
+    p.set_defaults(func=cmd_clean)
+
+    p = sub.add_parser('filter', help='Filter (and optionally project) a dataset')
+    data_args(p)
+    p.add_argument('--columns', help='Comma-separated columns to keep')
+    p.add_argument('-o', '--output', help='Output CSV, .csv.gz/.csv.zst for compressed (default: print)')
+    p.set_defaults(func=cmd_filter)
+
+    p = sub.add_parser('summarize', help='Group and aggregate')
+    data_args(p)
+    p.add_argument('--by', required=True, help='Group column')
+    p.add_argument('--agg', action='append', metavar='COL=FUNC[,FUNC]', help='Aggregation; repeatable')
+    p.add_argument('-o', '--output', help='Output CSV, .csv.gz/.csv.zst for compressed (default: print)')
+    p.set_defaults(func=cmd_summarize)
+
+    p = sub.add_parser('plot', help='Bar chart of a column\'s value counts')
+    data_args(p)
+    p.add_argument('--column', required=True)
+    p.add_argument('--title')
+    p.add_argument('-o', '--output', required=True, help='Output PNG')
+    p.set_defaults(func=cmd_plot)
+
+    p = sub.add_parser('serve', help='Serve filter/summary queries over HTTP on a resident dataset')
+    p.add_argument('filepath')
+    p.add_argument('--no-clean', dest='clean', action='store_false')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8765)
+    p.add_argument('--workers', type=int, default=4)
+    p.add_argument('--timeout', type=float, default=10.0, help='Per-query timeout in seconds')
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser('risk', help='Highest-risk patients per group (streamed, cleaned on the fly)')
+    p.add_argument('filepath')
+    p.add_argument('-k', type=int, default=10)
+    p.add_argument('--by', nargs='+', default=['site'], help='Group columns')
+    p.add_argument('--chunksize', type=int, default=200_000)
+    p.add_argument('-o', '--output', help='Output CSV (default: print)')
+    p.set_defaults(func=cmd_risk)
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
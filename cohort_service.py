@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# Cohort query service
+# Loads and cleans the dataset once and answers filter/summary queries over
+# HTTP/JSON on localhost, using asyncio with a worker pool for the pandas work.
+#
+# Endpoints:
+#   GET  /health    dataset shape and columns
+#   GET  /metrics   request counts and latency percentiles per endpoint
+#   POST /filter    {"filters": [...], "columns": [...], "limit": 100}
+#   POST /summary   {"group_col": "site", "agg_dict": {...}, "filters": [...]}
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+from q3_data_utils import load_data, clean_data
+from result_cache import ResultCache, dataset_fingerprint, cached_filter_data, cached_summarize_by_group
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error', 504: 'Gateway Timeout'}
+MAX_BODY_BYTES = 1024 ** 2
+ENDPOINTS = ('/health', '/metrics', '/filter', '/summary')
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class CohortService:
+    """
+    Resident dataset plus the query handlers behind the HTTP server.
+
+    Queries run in a thread pool so the event loop keeps accepting requests
+    while pandas works; threads share the one resident frame (no copies per
+    worker) and pandas releases the GIL in most of its kernels. Each query
+    has a timeout; results are memoized in a ResultCache keyed on the
+    dataset fingerprint, which is computed once at start-up.
+
+    A query that times out gets a 504 but keeps running in its executor
+    thread until pandas returns, so slow queries still occupy workers.
+    """
+
+    def __init__(self, df: pd.DataFrame, workers: int = 4, timeout: float = 10.0,
+                 cache: ResultCache = None, latency_window: int = 1000):
+        self.df = df
+        self.fingerprint = dataset_fingerprint(df, exact=True)
+        self.timeout = timeout
+        self.cache = cache if cache is not None else ResultCache()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cohort')
+        self._latency: Dict[str, deque] = defaultdict(lambda: deque(maxlen=latency_window))
+        self._counts: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self._server = None
+
+    @classmethod
+    def from_csv(cls, filepath: str, clean: bool = True, **kwargs) -> 'CohortService':
+        df = load_data(filepath)
+        if df.empty:
+            raise FileNotFoundError(f'No data loaded from {filepath}')
+        return cls(clean_data(df) if clean else df, **kwargs)
+
+    # --- query handlers (run in the worker pool) ---
+
+    def _filter(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        filters = body.get('filters') or []
+        result = cached_filter_data(self.df, filters, self.cache, self.fingerprint)
+        if body.get('columns'):
+            result = result[body['columns']]
+        limit = body.get('limit', 100)
+        rows = result if limit is None else result.head(int(limit))
+        return {'count': len(result), 'rows': _records(rows)}
+
+    def _summary(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        if 'group_col' not in body:
+            raise RequestError(400, 'group_col is required')
+        df, fingerprint = self.df, self.fingerprint
+        if body.get('filters'):
+            df = cached_filter_data(df, body['filters'], self.cache, self.fingerprint)
+            # The filtered frame is identified by the dataset and the filter spec,
+            # so it is never hashed
+            fingerprint = ResultCache.make_key(self.fingerprint, 'filter', body['filters'])
+        summary = cached_summarize_by_group(df, body['group_col'], body.get('agg_dict'),
+                                            self.cache, fingerprint)
+        return {'rows': _records(summary)}
+
+    def _health(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return {'status': 'ok', 'rows': len(self.df), 'columns': list(self.df.columns)}
+
+    def metrics(self) -> Dict[str, Any]:
+        out = {}
+        for endpoint, samples in self._latency.items():
+            ms = np.asarray(samples) * 1000
+            out[endpoint] = {
+                'requests': sum(self._counts[endpoint].values()),
+                'status': {str(k): v for k, v in sorted(self._counts[endpoint].items())},
+                'latency_ms': {'mean': float(ms.mean()), 'p50': float(np.percentile(ms, 50)),
+                               'p95': float(np.percentile(ms, 95)), 'max': float(ms.max())},
+            }
+        return {'endpoints': out, 'cache': self.cache.stats()}
+
+    # --- HTTP ---
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        routes = {('GET', '/health'): (self._health, False),
+                  ('POST', '/filter'): (self._filter, True),
+                  ('POST', '/summary'): (self._summary, True)}
+        if path == '/metrics' and method == 'GET':
+            return 200, self.metrics()
+        if (method, path) not in routes:
+            return (405 if path in ENDPOINTS else 404), {'error': f'{method} {path} not supported'}
+        handler, heavy = routes[(method, path)]
+        try:
+            payload = json.loads(body or b'{}')
+            if not isinstance(payload, dict):
+                raise RequestError(400, 'Request body must be a JSON object')
+            if not heavy:
+                return 200, handler(payload)
+            loop = asyncio.get_running_loop()
+            result = await asyncio.wait_for(loop.run_in_executor(self._pool, handler, payload),
+                                            self.timeout)
+            return 200, result
+        except asyncio.TimeoutError:
+            return 504, {'error': f'Query exceeded {self.timeout}s timeout'}
+        except RequestError as e:
+            return e.status, {'error': str(e)}
+        except json.JSONDecodeError as e:
+            return 400, {'error': f'Invalid JSON: {e}'}
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, {'error': f'{type(e).__name__}: {e}'}
+        except Exception as e:
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        start = time.perf_counter()
+        endpoint = 'invalid'
+        status = 500
+        try:
+            try:
+                method, path, body = await _read_request(reader)
+                # Unknown paths share one metrics entry, so 404s cannot grow the tables
+                endpoint = path if path in ENDPOINTS else 'unknown'
+                status, payload = await self.dispatch(method, path, body)
+            except RequestError as e:
+                status, payload = e.status, {'error': str(e)}
+            data = json.dumps(payload, default=str).encode()
+            writer.write(f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}\r\n'
+                         f'Content-Type: application/json\r\nContent-Length: {len(data)}\r\n'
+                         f'Connection: close\r\n\r\n'.encode() + data)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            status = 499
+        finally:
+            writer.close()
+            if endpoint != '/metrics':
+                self._latency[endpoint].append(time.perf_counter() - start)
+                self._counts[endpoint][status] += 1
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8765) -> asyncio.AbstractServer:
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+        return self._server
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.LimitOverrunError:
+        raise RequestError(413, 'Request headers too large')
+    lines = head.decode('latin-1').split('\r\n')
+    parts = lines[0].split()
+    if len(parts) != 3:
+        raise RequestError(400, 'Malformed request line')
+    method, target, _ = parts
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            k, v = line.split(':', 1)
+            headers[k.strip().lower()] = v.strip()
+    try:
+        length = int(headers.get('content-length', 0) or 0)
+    except ValueError:
+        raise RequestError(400, 'Invalid Content-Length header')
+    if length < 0:
+        raise RequestError(400, 'Invalid Content-Length header')
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, f'Request body over {MAX_BODY_BYTES} bytes')
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target.split('?', 1)[0], body
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    # to_json handles NaN/NaT -> null and numpy scalars
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+
+async def serve(service: CohortService, host: str, port: int) -> None:
+    server = await service.start(host, port)
+    print(f'Serving {len(service.df)} rows on http://{host}:{service.port}')
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Serve cohort queries over a resident dataset.')
+    parser.add_argument('filepath')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=10.0, help='Per-query timeout in seconds')
+    parser.add_argument('--no-clean', dest='clean', action='store_false')
+    args = parser.parse_args(argv)
+
+    try:
+        service = CohortService.from_csv(args.filepath, clean=args.clean,
+                                         workers=args.workers, timeout=args.timeout)
+    except FileNotFoundError as e:
+        print(f'ERROR: {e}', file=sys.stderr)
+        return 1
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
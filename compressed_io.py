@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# Compressed extract I/O
+# Reads gzip/zstd-compressed CSV and Parquet files directly, decompressing on a
+# background thread so it overlaps with parsing, and writes compressed CSVs.
+
+import io
+import os
+import gzip
+import queue
+import threading
+from typing import Any, Iterator, Optional
+
+import pandas as pd
+
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.gzip': 'gzip', '.zst': 'zstd', '.zstd': 'zstd'}
+MAGIC_BYTES = {b'\x1f\x8b': 'gzip', b'\x28\xb5\x2f\xfd': 'zstd'}
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """
+    'gzip', 'zstd' or None, from the file extension or else the magic bytes.
+    """
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext in COMPRESSION_EXTENSIONS:
+        return COMPRESSION_EXTENSIONS[ext]
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(4)
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+    for magic, method in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return method
+    return None
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('Reading or writing zstd files requires the zstandard package '
+                          '(pip install zstandard)') from None
+    return zstandard
+
+
+def _open_stream(path: str, method: str):
+    if method == 'gzip':
+        return gzip.open(path, 'rb')
+    if method == 'zstd':
+        return _zstandard().ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    raise ValueError(f'Unsupported compression: {method}')
+
+
+class ThreadedDecompressor(io.RawIOBase):
+    """
+    Binary reader whose data is decompressed ahead of time on a background thread.
+
+    zlib and zstd release the GIL while decompressing, so the thread keeps
+    producing blocks while the CSV parser consumes earlier ones. At most
+    max_blocks blocks are buffered.
+    """
+
+    def __init__(self, path: str, method: str, block_size: int = 1 << 20, max_blocks: int = 8):
+        super().__init__()
+        self._path, self._method, self._block_size = path, method, block_size
+        self._queue: 'queue.Queue[Optional[bytes]]' = queue.Queue(maxsize=max_blocks)
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._buffer = memoryview(b'')
+        self._eof = False
+        # Open in the caller's thread so a missing file raises here
+        self._stream = _open_stream(path, method)
+        self._thread = threading.Thread(target=self._produce, name='decompress', daemon=True)
+        self._thread.start()
+
+    def _produce(self) -> None:
+        try:
+            with self._stream as f:
+                while not self._stop.is_set():
+                    block = f.read(self._block_size)
+                    if not block:
+                        break
+                    self._put(block)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._put(None)
+
+    def _put(self, item: Optional[bytes]) -> None:
+        # Poll so close() can stop a producer blocked on a full queue
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            if self._eof:
+                return 0
+            block = self._queue.get()
+            if block is None:
+                self._eof = True
+                if self._error is not None:
+                    raise self._error
+                return 0
+            self._buffer = memoryview(block)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+        super().close()
+
+
+def is_parquet(path: str) -> bool:
+    """
+    True for .parquet/.pq files, also under a .gz/.zst extension.
+    """
+    root, ext = os.path.splitext(str(path).lower())
+    if ext in COMPRESSION_EXTENSIONS:
+        ext = os.path.splitext(root)[1]
+    return ext in ('.parquet', '.pq')
+
+
+def open_compressed(path: str, threaded: bool = None, block_size: int = 1 << 20) -> io.BufferedIOBase:
+    """
+    Open a (possibly compressed) file for binary reading.
+
+    threaded=None decompresses on a background thread only when there is
+    more than one CPU; on a single core the hand-off costs more than it saves.
+    """
+    method = detect_compression(path)
+    if method is None:
+        return open(path, 'rb')
+    if threaded is None:
+        threaded = (os.cpu_count() or 1) > 1
+    if not threaded:
+        return _open_stream(path, method)
+    return io.BufferedReader(ThreadedDecompressor(path, method, block_size), buffer_size=block_size)
+
+
+def read_csv(path: str, threaded: bool = None, **kwargs) -> Any:
+    """
+    pd.read_csv() that decompresses gzip/zstd input on a background thread.
+
+    Uncompressed files go straight to pandas. With chunksize/iterator the
+    result is an iterator of chunks that closes the file when exhausted.
+    """
+    method = detect_compression(path)
+    if method is None or kwargs.get('compression') not in (None, 'infer'):
+        return pd.read_csv(path, **kwargs)
+    kwargs.pop('compression', None)
+    handle = open_compressed(path, threaded)
+    if kwargs.get('chunksize') or kwargs.get('iterator'):
+        return _chunks(handle, kwargs)
+    with handle:
+        return pd.read_csv(handle, **kwargs)
+
+
+def _chunks(handle: io.BufferedIOBase, kwargs: dict) -> Iterator[pd.DataFrame]:
+    with handle, pd.read_csv(handle, **kwargs) as reader:
+        yield from reader
+
+
+def read_parquet(path: str, **kwargs) -> pd.DataFrame:
+    """
+    pd.read_parquet() that also accepts a gzip/zstd-wrapped Parquet file.
+
+    Parquet needs random access, so wrapped files are decompressed into
+    memory first; prefer Parquet's own compression (see write_parquet).
+    """
+    if detect_compression(path) is None:
+        return pd.read_parquet(path, **kwargs)
+    with open_compressed(path) as f:
+        return pd.read_parquet(io.BytesIO(f.read()), **kwargs)
+
+
+def write_csv(df: pd.DataFrame, path: str, compression: str = 'infer', level: int = None,
+              **kwargs) -> None:
+    """
+    df.to_csv() with optional gzip/zstd compression ('infer' uses the extension).
+    """
+    if compression == 'infer':
+        compression = COMPRESSION_EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+    if compression == 'zstd':
+        _zstandard()
+    options = None
+    if compression is not None:
+        options = {'method': compression}
+        if level is not None:
+            options['compresslevel' if compression == 'gzip' else 'level'] = level
+    kwargs.setdefault('index', False)
+    df.to_csv(path, compression=options, **kwargs)
+
+
+def write_parquet(df: pd.DataFrame, path: str, compression: str = 'zstd', **kwargs) -> None:
+    """
+    df.to_parquet() with Parquet's built-in (column-chunk) compression.
+    """
+    kwargs.setdefault('index', False)
+    df.to_parquet(path, compression=compression, **kwargs)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# Streaming data-quality validation for raw clinical trial extracts
+# Reads the CSV once in chunks and builds a per-column quality report in bounded memory.
+
+import sys
+import argparse
+from collections import Counter
+from typing import List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+from q3_data_utils import CLEANING_RULES, compile_cleaning_rules
+from schema import EXPECTED_COLUMNS, DATE_COLUMNS
+import compressed_io
+
+DATE_FORMATS = {
+    'YYYY-MM-DD': r'^\d{4}-\d{2}-\d{2}$',
+    'MM/DD/YYYY': r'^\d{2}/\d{2}/\d{4}$',
+    'DD-MM-YYYY': r'^\d{2}-\d{2}-\d{4}$',
+}
+
+
+def validate_csv(filepath: str, rules: Dict[str, Dict[str, Any]] = None,
+                 chunksize: int = 200_000, max_distinct: int = 50) -> Dict[str, Any]:
+    """
+    Stream a raw extract once and collect per-column quality counts.
+
+    Memory is bounded by the chunk size plus at most max_distinct raw
+    spellings per categorical column (the rest are counted as '<other>').
+
+    Returns:
+        dict with 'rows', 'missing_columns', 'columns' (DataFrame of counts
+        per column), 'spellings' and 'date_formats'.
+    """
+    if rules is None:
+        rules = CLEANING_RULES
+    compiled = compile_cleaning_rules(rules)
+    numeric_cols = [c for c, r in rules.items() if 'sentinels' in r or 'valid_range' in r]
+    text_cols = [c for c in rules if c not in numeric_cols]
+
+    counts: Dict[str, Counter] = {}
+    spellings: Dict[str, Counter] = {c: Counter() for c in text_cols}
+    date_formats: Dict[str, Counter] = {c: Counter() for c in DATE_COLUMNS}
+    rows = 0
+    columns: List[str] = []
+
+    reader = compressed_io.read_csv(filepath, dtype=str, keep_default_na=False,
+                         chunksize=chunksize, skipinitialspace=False)
+    for chunk in reader:
+        if not columns:
+            columns = list(chunk.columns)
+            counts = {c: Counter() for c in columns}
+        rows += len(chunk)
+        for col in columns:
+            raw = chunk[col]
+            is_null = raw.str.strip().isin(['', 'NA', 'NaN', 'nan', 'null', 'NULL'])
+            counts[col]['null_count'] += int(is_null.sum())
+            present = raw[~is_null]
+
+            if col in numeric_cols:
+                rule = rules[col]
+                values = pd.to_numeric(present, errors='coerce')
+                counts[col]['non_numeric_count'] += int(values.isna().sum())
+                is_sentinel = values.isin(rule.get('sentinels', []))
+                counts[col]['sentinel_count'] += int(is_sentinel.sum())
+                if 'valid_range' in rule:
+                    lo, hi = rule['valid_range']
+                    oob = ((values < lo) | (values > hi)) & ~is_sentinel
+                    counts[col]['out_of_range_count'] += int(oob.sum())
+            elif col in text_cols:
+                vc = present.value_counts()
+                _merge_capped(spellings[col], vc, max_distinct)
+                cleaned = compiled[col](pd.Series(vc.index, dtype=object))
+                counts[col]['invalid_category_count'] += int(vc.to_numpy()[cleaned.isna().to_numpy()].sum())
+
+            if col in date_formats:
+                matched = np.zeros(len(present), dtype=bool)
+                for name, pattern in DATE_FORMATS.items():
+                    hit = present.str.match(pattern).to_numpy()
+                    date_formats[col][name] += int(hit.sum())
+                    matched |= hit
+                date_formats[col]['<other>'] += int((~matched).sum())
+
+    table = pd.DataFrame.from_dict({c: dict(counts[c]) for c in columns}, orient='index')
+    for name in ['null_count', 'sentinel_count', 'out_of_range_count',
+                 'non_numeric_count', 'invalid_category_count']:
+        if name not in table.columns:
+            table[name] = 0
+    table = table.fillna(0).astype(int)
+    table.insert(1, 'null_rate', table['null_count'] / rows if rows else 0.0)
+    table['distinct_raw'] = pd.Series({c: len(spellings[c]) for c in spellings}, dtype=float)
+
+    return {
+        'rows': rows,
+        'missing_columns': [c for c in EXPECTED_COLUMNS if c not in columns],
+        'columns': table,
+        'spellings': {c: dict(v) for c, v in spellings.items()},
+        'date_formats': {c: dict(v) for c, v in date_formats.items()},
+    }
+
+
+def _merge_capped(counter: Counter, value_counts: pd.Series, max_distinct: int) -> None:
+    for value, n in value_counts.items():
+        if value in counter or len(counter) < max_distinct:
+            counter[value] += int(n)
+        else:
+            counter['<other>'] += int(n)
+
+
+def check_report(report: Dict[str, Any], min_rows: int = 1000, max_null_rate: float = 0.5,
+                 max_invalid_rate: float = 0.05) -> List[str]:
+    """
+    Return a list of problems that should fail the extract (empty if it passes).
+    """
+    problems = [f'MISSING COLUMN: {c}' for c in report['missing_columns']]
+    rows = report['rows']
+    if rows < min_rows:
+        problems.append(f'TOO FEW ROWS: {rows} (minimum expected {min_rows})')
+    if rows == 0:
+        return problems
+
+    table = report['columns']
+    for col, r in table.iterrows():
+        if r['null_rate'] > max_null_rate:
+            problems.append(f'{col}: null rate {r["null_rate"]:.1%} exceeds {max_null_rate:.0%}')
+        invalid = r['non_numeric_count'] + r['out_of_range_count'] + r['invalid_category_count']
+        if invalid / rows > max_invalid_rate:
+            problems.append(f'{col}: {invalid} invalid values ({invalid / rows:.1%})')
+    for col, formats in report['date_formats'].items():
+        other = formats.get('<other>', 0)
+        if other / rows > max_invalid_rate:
+            problems.append(f'{col}: {other} dates in an unrecognized format')
+    return problems
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """
+    Render a report as plain text for reports/.
+    """
+    lines = [f'Rows: {report["rows"]}']
+    if report['missing_columns']:
+        lines.append(f'Missing columns: {", ".join(report["missing_columns"])}')
+    lines.append('')
+    lines.append(report['columns'].to_string(float_format=lambda x: f'{x:.4f}'))
+    for col, formats in report['date_formats'].items():
+        lines.append(f'\nDate formats in {col}:')
+        lines.extend(f'  {k}: {v}' for k, v in formats.items() if v)
+    for col, spell in report['spellings'].items():
+        lines.append(f'\nRaw spellings in {col}:')
+        lines.extend(f'  {k!r}: {v}' for k, v in sorted(spell.items(), key=lambda kv: -kv[1]))
+    return '\n'.join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Validate a raw clinical trial extract.')
+    parser.add_argument('filepath')
+    parser.add_argument('--min-rows', type=int, default=1000)
+    parser.add_argument('--max-null-rate', type=float, default=0.5)
+    parser.add_argument('--max-invalid-rate', type=float, default=0.05)
+    parser.add_argument('--chunksize', type=int, default=200_000)
+    parser.add_argument('--report', help='Write the full quality report to this file')
+    args = parser.parse_args(argv)
+
+    try:
+        report = validate_csv(args.filepath, chunksize=args.chunksize)
+    except FileNotFoundError:
+        print(f'ERROR: data file not found: {args.filepath}', file=sys.stderr)
+        return 1
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            f.write(format_report(report))
+
+    problems = check_report(report, args.min_rows, args.max_null_rate, args.max_invalid_rate)
+    for p in problems:
+        print(f'  {p}')
+    if problems:
+        print(f'CSV validation FAILED ({len(problems)} problems)', file=sys.stderr)
+        return 1
+    print(f'  Row count OK: {report["rows"]} rows')
+    print('CSV validation PASSED')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
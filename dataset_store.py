@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# Partitioned dataset store
+# Cleaned trial data in Parquet, partitioned by site and enrollment month, with
+# append-only writes and partition pruning on read.
+#
+# Layout:
+#   <root>/site=Site A/enrollment_month=2022-05/part-<id>.parquet
+# Values are percent-encoded; missing keys use NULL_PARTITION.
+
+import os
+import sys
+import time
+import uuid
+import argparse
+from urllib.parse import quote, unquote
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from q3_data_utils import clean_data, _apply_filters
+from dedup import FingerprintSet, dedup_batch
+import compressed_io
+
+PARTITION_COLUMNS = ['site', 'enrollment_month']
+NULL_PARTITION = '__null__'
+
+
+def enrollment_month(df: pd.DataFrame) -> pd.Series:
+    """
+    'YYYY-MM' of enrollment_date (mixed input formats allowed), NaN if unparseable.
+    """
+    dates = pd.to_datetime(df['enrollment_date'], errors='coerce', format='mixed')
+    return dates.dt.strftime('%Y-%m').astype(object).where(dates.notna())
+
+
+def _encode(value: Any) -> str:
+    return NULL_PARTITION if pd.isna(value) else quote(str(value), safe=' ')
+
+
+def _decode(text: str) -> Any:
+    return np.nan if text == NULL_PARTITION else unquote(text)
+
+
+def write_dataset(df: pd.DataFrame, root: str) -> List[str]:
+    """
+    Append a batch to the store: one new part file per (site, month) present.
+
+    Existing part files are never rewritten. The site column is kept in the
+    files so column order and dtypes round-trip; enrollment_month is derived
+    and only lives in the directory names.
+
+    Returns the paths written.
+    """
+    for col in ['site', 'enrollment_date']:
+        if col not in df.columns:
+            raise KeyError(f'Partition source column not found: {col}')
+    batch = f'{time.time_ns():x}-{uuid.uuid4().hex[:8]}'
+    keys = pd.DataFrame({'site': df['site'].map(_encode),
+                         'enrollment_month': enrollment_month(df).map(_encode)})
+    written = []
+    for (site, month), idx in keys.groupby(PARTITION_COLUMNS, sort=True).indices.items():
+        part_dir = os.path.join(root, f'site={site}', f'enrollment_month={month}')
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, f'part-{batch}.parquet')
+        tmp = path + '.tmp'
+        df.iloc[idx].reset_index(drop=True).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        written.append(path)
+    return written
+
+
+def build_dataset(csv_path: str, root: str, chunksize: int = 200_000, **clean_kwargs) -> int:
+    """
+    Clean a raw CSV extract chunk by chunk and append it to the store.
+
+    Duplicates are tracked across chunks, as in a single clean_data() call.
+    Returns the number of rows written.
+    """
+    seen = FingerprintSet()
+    rows = 0
+    for chunk in compressed_io.read_csv(csv_path, chunksize=chunksize):
+        key = clean_kwargs.get('dedup_key') or list(chunk.columns)
+        chunk = dedup_batch(chunk, key, seen=seen)
+        chunk = clean_data(chunk, **dict(clean_kwargs, remove_duplicates=False, dedup_key=None))
+        write_dataset(chunk, root)
+        rows += len(chunk)
+    return rows
+
+
+def list_partitions(root: str) -> List[Tuple[Dict[str, Any], List[str]]]:
+    """
+    Every partition under root as (keys, part file paths), in sorted order.
+    """
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f'Dataset not found: {root}')
+    partitions = []
+    for site_dir in sorted(os.listdir(root)):
+        if not site_dir.startswith('site='):
+            continue
+        for month_dir in sorted(os.listdir(os.path.join(root, site_dir))):
+            if not month_dir.startswith('enrollment_month='):
+                continue
+            part_dir = os.path.join(root, site_dir, month_dir)
+            files = sorted(os.path.join(part_dir, f) for f in os.listdir(part_dir)
+                           if f.endswith('.parquet'))
+            if files:
+                keys = {'site': _decode(site_dir.split('=', 1)[1]),
+                        'enrollment_month': _decode(month_dir.split('=', 1)[1])}
+                partitions.append((keys, files))
+    return partitions
+
+
+def prune_partitions(partitions: List[Tuple[Dict[str, Any], List[str]]],
+                     filters: List[Dict[str, Any]] = None) -> List[Tuple[Dict[str, Any], List[str]]]:
+    """
+    Keep only partitions whose keys can satisfy the filters on partition columns.
+
+    The filters are evaluated with filter_data semantics against a one-row
+    frame of partition keys; filters on other columns never prune.
+    """
+    key_filters = [f for f in filters or [] if f.get('column') in PARTITION_COLUMNS]
+    if not key_filters or not partitions:
+        return list(partitions)
+    keys = pd.DataFrame([k for k, _ in partitions], columns=PARTITION_COLUMNS, dtype=object)
+    keep = _apply_filters(keys, key_filters).index
+    return [partitions[i] for i in keep]
+
+
+def read_dataset(root: str, filters: List[Dict[str, Any]] = None,
+                 columns: List[str] = None) -> pd.DataFrame:
+    """
+    Load the store, reading only partitions (and columns) the query can use.
+
+    Filters use the filter_data() format. Filters on site or enrollment_month
+    ('YYYY-MM' strings, e.g. in_range ['2022-01', '2022-06']) prune whole
+    partitions; the remaining filters are applied to the rows read.
+    enrollment_month is only returned when asked for in columns.
+    """
+    filters = filters or []
+    parts = prune_partitions(list_partitions(root), filters)
+    wanted = None if columns is None else list(columns)
+    needed = None if wanted is None else \
+        list(dict.fromkeys(wanted + [f['column'] for f in filters if f.get('column')]))
+    file_cols = None if needed is None else [c for c in needed if c != 'enrollment_month']
+
+    with_month = 'enrollment_month' in (needed or [f.get('column') for f in filters])
+    if with_month and file_cols is not None and 'enrollment_date' not in file_cols:
+        file_cols.append('enrollment_date')
+
+    # One Arrow table per part file, a single conversion to pandas at the end;
+    # permissive promotion reconciles batches where a column was all-null
+    tables = [pq.read_table(path, columns=file_cols) for _, files in parts for path in files]
+    if tables:
+        df = pa.concat_tables(tables, promote_options='permissive').to_pandas()
+    else:
+        df = pd.DataFrame(columns=file_cols or [])
+    if with_month:
+        df['enrollment_month'] = enrollment_month(df) if len(df) else pd.Series(dtype=object)
+    df = _apply_filters(df, filters).reset_index(drop=True)
+    if wanted is not None:
+        return df[wanted]
+    return df.drop(columns='enrollment_month', errors='ignore')
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Append a raw extract to the partitioned dataset store.')
+    parser.add_argument('csv_path')
+    parser.add_argument('root', help='Dataset directory (created if missing)')
+    parser.add_argument('--chunksize', type=int, default=200_000)
+    parser.add_argument('--dedup-key', help='Deduplicate on this key column instead of full rows')
+    args = parser.parse_args(argv)
+
+    kwargs = {'dedup_key': args.dedup_key} if args.dedup_key else {}
+    rows = build_dataset(args.csv_path, args.root, args.chunksize, **kwargs)
+    print(f'Appended {rows} rows to {args.root} ({len(list_partitions(args.root))} partitions)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# Keyed deduplication across batches
+# Compact, persistent seen-sets of 64-bit row fingerprints for streaming extracts.
+
+import os
+import numpy as np
+import pandas as pd
+from typing import List, Union
+
+
+def row_fingerprints(df: pd.DataFrame, key: Union[str, List[str]] = 'patient_id',
+                     record_hash: bool = False) -> np.ndarray:
+    """
+    Compute one uint64 fingerprint per row from the key column(s).
+
+    With record_hash=True the remaining columns are folded into the
+    fingerprint, so only rows repeating both key and content collide.
+    Numeric columns are hashed as float64 so that the same value read as
+    int in one batch and float in another still yields the same fingerprint.
+    """
+    keys = [key] if isinstance(key, str) else list(key)
+    missing = [k for k in keys if k not in df.columns]
+    if missing:
+        raise KeyError(f'Key column(s) not found: {missing}')
+
+    cols = list(df.columns) if record_hash else keys
+    frame = df[cols]
+    num_cols = [c for c in cols if pd.api.types.is_numeric_dtype(frame[c])
+                and not pd.api.types.is_bool_dtype(frame[c])]
+    if num_cols:
+        frame = frame.astype({c: 'float64' for c in num_cols})
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype=np.uint64)
+
+
+class FingerprintSet:
+    """
+    Exact seen-set: a sorted array of uint64 fingerprints (8 bytes per key).
+    """
+
+    def __init__(self, fingerprints: np.ndarray = None):
+        if fingerprints is None:
+            fingerprints = np.empty(0, dtype=np.uint64)
+        self._fp = np.unique(np.asarray(fingerprints, dtype=np.uint64))
+
+    def __len__(self) -> int:
+        return len(self._fp)
+
+    @property
+    def nbytes(self) -> int:
+        return self._fp.nbytes
+
+    def contains(self, fp: np.ndarray) -> np.ndarray:
+        """
+        Return a boolean mask of which fingerprints are already in the set.
+        """
+        fp = np.asarray(fp, dtype=np.uint64)
+        if len(self._fp) == 0:
+            return np.zeros(len(fp), dtype=bool)
+        pos = np.searchsorted(self._fp, fp)
+        pos[pos == len(self._fp)] = 0
+        return self._fp[pos] == fp
+
+    def add(self, fp: np.ndarray) -> None:
+        """
+        Add fingerprints to the set.
+        """
+        fp = np.asarray(fp, dtype=np.uint64)
+        new = np.unique(fp[~self.contains(fp)])
+        if len(new):
+            self._fp = np.union1d(self._fp, new)
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            np.save(f, self._fp, allow_pickle=False)
+
+    @classmethod
+    def load(cls, path: str) -> 'FingerprintSet':
+        return cls(np.load(path, allow_pickle=False))
+
+
+class BloomFilter:
+    """
+    Approximate seen-set with fixed memory. False positives (a new row treated
+    as already seen) occur at roughly `error_rate`; false negatives never occur.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001,
+                 _bits: np.ndarray = None, _num_hashes: int = None):
+        if capacity <= 0:
+            raise ValueError('capacity must be positive')
+        if not 0 < error_rate < 1:
+            raise ValueError('error_rate must be between 0 and 1')
+        self.capacity = int(capacity)
+        self.error_rate = float(error_rate)
+        num_bits = int(np.ceil(-capacity * np.log(error_rate) / np.log(2) ** 2))
+        num_bits = max(64, (num_bits + 63) // 64 * 64)
+        if _bits is None:
+            _bits = np.zeros(num_bits // 8, dtype=np.uint8)
+        self._bits = _bits
+        self.num_bits = len(_bits) * 8
+        if _num_hashes is None:
+            _num_hashes = max(1, int(round(self.num_bits / capacity * np.log(2))))
+        self.num_hashes = int(_num_hashes)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bits.nbytes
+
+    def _positions(self, fp: np.ndarray) -> np.ndarray:
+        # Kirsch-Mitzenmacher double hashing: h1 + i * h2 for i in [0, k)
+        fp = np.asarray(fp, dtype=np.uint64)
+        h1 = fp & np.uint64(0xFFFFFFFF)
+        h2 = (fp >> np.uint64(32)) | np.uint64(1)
+        i = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    def contains(self, fp: np.ndarray) -> np.ndarray:
+        pos = self._positions(fp)
+        hit = (self._bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1
+        return hit.all(axis=1)
+
+    def add(self, fp: np.ndarray) -> None:
+        pos = self._positions(fp).ravel()
+        np.bitwise_or.at(self._bits, pos >> np.uint64(3),
+                         np.left_shift(1, (pos & np.uint64(7)).astype(np.uint8)).astype(np.uint8))
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            np.savez(f, bits=self._bits,
+                     meta=np.array([self.capacity, self.num_hashes], dtype=np.int64),
+                     error_rate=np.array([self.error_rate]))
+
+    @classmethod
+    def load(cls, path: str) -> 'BloomFilter':
+        with np.load(path, allow_pickle=False) as z:
+            capacity, num_hashes = (int(x) for x in z['meta'])
+            return cls(capacity, float(z['error_rate'][0]),
+                       _bits=z['bits'].copy(), _num_hashes=num_hashes)
+
+
+def load_seen_set(path: str, mode: str = 'exact', **kwargs) -> Union[FingerprintSet, BloomFilter]:
+    """
+    Load a persisted seen-set, or create an empty one if the file does not exist.
+    """
+    if mode == 'exact':
+        return FingerprintSet.load(path) if os.path.exists(path) else FingerprintSet()
+    elif mode == 'bloom':
+        return BloomFilter.load(path) if os.path.exists(path) else BloomFilter(**kwargs)
+    else:
+        raise ValueError("Unsupported mode: choose 'exact' or 'bloom'")
+
+
+def dedup_batch(df: pd.DataFrame, key: Union[str, List[str]] = 'patient_id',
+                seen: Union[FingerprintSet, BloomFilter] = None,
+                record_hash: bool = False) -> pd.DataFrame:
+    """
+    Drop rows whose key was already seen, in this batch or in earlier batches.
+
+    The first occurrence within the batch is kept. The seen-set is updated in
+    place with the fingerprints of the rows that were kept.
+    """
+    fp = row_fingerprints(df, key, record_hash=record_hash)
+    keep = ~pd.Series(fp).duplicated().to_numpy()
+    if seen is not None:
+        keep &= ~seen.contains(fp)
+        seen.add(fp[keep])
+    return df[keep]
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# Delta refresh between raw extract versions
+# Hashes each row of a new extract keyed by patient_id, classifies it against
+# the previous version and runs only inserted/updated rows through the pipeline;
+# the stored rows and decomposable aggregates are patched.
+#
+# State directory:
+#   rows.parquet          cleaned, typed and feature-engineered rows (not imputed), with row hashes
+#   partials.parquet      per-group row counts and per-column n / sum / sum of squares
+#   summary_<group>.csv   aggregates per group column (patient_count, <col>_mean, <col>_std)
+#   manifest.json         config, last refresh counts and current imputation means
+#
+# export() writes the pipeline outputs (q8 reads them instead of re-running
+# the q5-q7 notebooks over the full extract):
+#   q5_cleaned_data.csv, q5_missing_report.txt      cleaned, mean-imputed rows
+#   q6_transformed_data.csv                         plus features, one-hot encoded
+#   q7_site_summary.csv, q7_intervention_comparison.csv, q7_analysis_report.txt
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import List, Dict, Any, Union
+
+import numpy as np
+import pandas as pd
+
+from q3_data_utils import (clean_data, transform_types, compute_features, detect_missing,
+                           CLEANING_RULES, FEATURE_DEFINITIONS)
+from dedup import row_fingerprints
+import compressed_io
+
+HASH_COLUMN = '_row_hash'
+ALL_ROWS = '*'
+
+DELTA_CONFIG = {
+    'key': 'patient_id',
+    'type_map': {'enrollment_date': 'datetime'},
+    # mean-imputed when rows are read back; means come from the partials
+    'impute': ['bmi', 'systolic_bp', 'diastolic_bp', 'cholesterol_total', 'cholesterol_hdl',
+               'cholesterol_ldl', 'glucose_fasting'],
+    'group_cols': ['site', 'intervention_group'],
+    'value_cols': ['age', 'bmi', 'systolic_bp', 'cholesterol_total', 'glucose_fasting',
+                   'adherence_pct'],
+    # one-hot encoded in the q6 output, over fixed category lists
+    'one_hot': ['site', 'intervention_group', 'bp_category', 'age_group', 'bmi_category'],
+    'drop': ['enrollment_date'],
+}
+
+
+def process_rows(raw: pd.DataFrame, config: Dict[str, Any] = None) -> pd.DataFrame:
+    """
+    The row-local pipeline stages: clean_data, transform_types and the registered features.
+
+    Every stage only looks at its own row, so processing the changed rows
+    alone gives the same rows as processing the whole extract.
+    """
+    config = config or DELTA_CONFIG
+    out = clean_data(raw, remove_duplicates=False)
+    out = transform_types(out, config['type_map'])
+    return compute_features(out)
+
+
+def _categories(col: str) -> List[str]:
+    # Fixed levels, so a batch encodes to the same columns whatever values it holds
+    if col in CLEANING_RULES and 'allowed' in CLEANING_RULES[col]:
+        return list(CLEANING_RULES[col]['allowed'])
+    feature = FEATURE_DEFINITIONS.get(col, {})
+    if feature.get('kind') == 'bins':
+        return list(feature['labels'])
+    if feature.get('kind') == 'select':
+        return list(dict.fromkeys([label for _, label in feature['conditions']] + [feature['default']]))
+    raise KeyError(f'No fixed categories for one-hot column: {col}')
+
+
+def transform_rows(rows: pd.DataFrame, config: Dict[str, Any] = None) -> pd.DataFrame:
+    """
+    The q6 modeling table: one-hot columns (<col>_<level>) and dropped columns.
+
+    Row-local like process_rows, since the levels come from the cleaning
+    rules and feature definitions rather than from the data.
+    """
+    config = config or DELTA_CONFIG
+    out = rows.drop(columns=[c for c in config['drop'] if c in rows.columns])
+    for col in config['one_hot']:
+        if col in out.columns:
+            codes = pd.Categorical(out.pop(col).astype(object), categories=_categories(col))
+            out = pd.concat([out, pd.get_dummies(codes, prefix=col).set_index(out.index)], axis=1)
+    return out
+
+
+def _stat_columns(config: Dict[str, Any]) -> List[str]:
+    return list(dict.fromkeys(config['value_cols'] + config['impute']))
+
+
+def compute_partials(rows: pd.DataFrame, config: Dict[str, Any] = None) -> pd.DataFrame:
+    """
+    Decomposable aggregate state: one row per (grouping, group).
+
+    grouping is a group column or '*' for all rows. Columns are 'rows' and,
+    per statistic column, '<col>:n', '<col>:sum' and '<col>:sumsq'. Partials
+    of disjoint row sets add up, and removing rows subtracts theirs.
+    """
+    config = config or DELTA_CONFIG
+    cols = _stat_columns(config)
+    values = rows.reindex(columns=cols).astype(np.float64)
+    stats = pd.concat([values.notna().astype(np.int64).add_suffix(':n'),
+                       values.fillna(0.0).add_suffix(':sum'),
+                       (values.fillna(0.0) ** 2).add_suffix(':sumsq')], axis=1)
+    stats.insert(0, 'rows', np.int64(1))
+    parts = []
+    for grouping in [ALL_ROWS] + config['group_cols']:
+        if grouping == ALL_ROWS:
+            key = pd.Series(ALL_ROWS, index=rows.index)
+        else:
+            key = rows[grouping] if grouping in rows.columns else pd.Series(np.nan, index=rows.index)
+        part = stats.groupby(key.astype(object).to_numpy(), dropna=True).sum()
+        part.index = pd.MultiIndex.from_arrays([[grouping] * len(part), part.index.astype(object)],
+                                               names=['grouping', 'group'])
+        parts.append(part)
+    return pd.concat(parts)
+
+
+def _patch_partials(current: pd.DataFrame, removed: pd.DataFrame, added: pd.DataFrame) -> pd.DataFrame:
+    out = current.sub(removed, fill_value=0).add(added, fill_value=0)
+    out = out[out['rows'] > 0]
+    counts = [c for c in out.columns if c == 'rows' or c.endswith(':n')]
+    out[counts] = out[counts].round().astype(np.int64)
+    return out.sort_index()
+
+
+def summarize_partials(partials: pd.DataFrame, grouping: str,
+                       config: Dict[str, Any] = None) -> pd.DataFrame:
+    """
+    patient_count, <col>_mean and <col>_std (ddof=1) per group, from the partials.
+    """
+    config = config or DELTA_CONFIG
+    if grouping not in partials.index.get_level_values('grouping'):
+        raise KeyError(f'No aggregates for grouping: {grouping}')
+    p = partials.xs(grouping, level='grouping')
+    out = pd.DataFrame(index=pd.Index(p.index.tolist(), name=grouping))
+    for col in config['value_cols']:
+        n, s, ss = (p[f'{col}:{stat}'].to_numpy(dtype=np.float64) for stat in ('n', 'sum', 'sumsq'))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(n > 0, s / n, np.nan)
+            var = np.where(n > 1, np.clip(ss - s * mean, 0, None) / (n - 1), np.nan)
+        out[f'{col}_mean'] = mean
+        out[f'{col}_std'] = np.sqrt(var)
+    out['patient_count'] = p['rows'].to_numpy()
+    return out.reset_index()
+
+
+def impute_means(partials: pd.DataFrame, config: Dict[str, Any] = None) -> Dict[str, float]:
+    config = config or DELTA_CONFIG
+    total = partials.xs(ALL_ROWS, level='grouping')
+    means = {}
+    for col in config['impute']:
+        n = total[f'{col}:n'].sum() if len(total) else 0
+        means[col] = float(total[f'{col}:sum'].sum() / n) if n else None
+    return means
+
+
+def _prepare(raw: pd.DataFrame, key: str):
+    """
+    (rows, row hashes) with exact duplicate rows collapsed, as in clean_data.
+
+    The hashes cover key and content, so duplicates are found on them
+    rather than with a second pass over the rows.
+    """
+    if key not in raw.columns:
+        raise KeyError(f'Key column not found: {key}')
+    if raw[key].isna().any():
+        raise ValueError(f'Delta refresh needs a {key} on every row')
+    hashes = row_fingerprints(raw, key, record_hash=True)
+    first = ~pd.Series(hashes).duplicated().to_numpy()
+    if not first.all():
+        raw, hashes = raw[first], hashes[first]
+    keys = pd.Index(raw[key])
+    if not keys.is_unique:
+        raise ValueError(f'Delta refresh needs one row per {key}; '
+                         f'found conflicting rows for {keys[keys.duplicated()][0]}')
+    return raw.reset_index(drop=True), hashes
+
+
+def _conform(new: pd.DataFrame, old: pd.DataFrame) -> pd.DataFrame:
+    # A small batch can infer another dtype (e.g. an all-missing column);
+    # match the stored rows so the concatenation keeps their dtypes
+    if not len(old):
+        return new
+    for col in new.columns.intersection(old.columns):
+        if new[col].dtype != old[col].dtype:
+            try:
+                new[col] = new[col].astype(old[col].dtype)
+            except (TypeError, ValueError):
+                pass
+    return new
+
+
+class DeltaStore:
+    """
+    Processed rows, aggregate partials and manifest kept in a state directory.
+    """
+
+    def __init__(self, root: str, config: Dict[str, Any] = None):
+        self.root = root
+        self.config = dict(config or DELTA_CONFIG)
+        self.rows = pd.DataFrame({self.config['key']: pd.Series(dtype=object),
+                                  HASH_COLUMN: pd.Series(dtype=np.uint64)})
+        self.partials = compute_partials(self.rows, self.config)
+        self.last_refresh: Dict[str, Any] = {}
+
+    @classmethod
+    def open(cls, root: str, config: Dict[str, Any] = None) -> 'DeltaStore':
+        """
+        The store at root, or an empty one if nothing was stored yet.
+
+        Stored rows were processed under the manifest's config; a different
+        config is rejected rather than mixed in (remove root to rebuild).
+        """
+        manifest_path = os.path.join(root, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return cls(root, config)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if config is not None and json.loads(json.dumps(config)) != manifest['config']:
+            raise ValueError(f'Delta store at {root} was built with a different config; '
+                             'remove it to rebuild with the new one')
+        store = cls(root, manifest['config'])
+        store.rows = pd.read_parquet(os.path.join(root, 'rows.parquet'))
+        store.partials = pd.read_parquet(os.path.join(root, 'partials.parquet'))
+        store.partials = store.partials.set_index(['grouping', 'group']).sort_index()
+        store.last_refresh = manifest.get('last_refresh', {})
+        return store
+
+    def refresh(self, raw: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Bring the store up to date with a new extract; returns the row counts by change type.
+
+        Rows are matched on the key and compared by a 64-bit hash of the raw
+        row. Only inserted and updated rows are processed; the partials lose
+        the stored contributions of updated and deleted rows and gain the
+        newly processed ones. Rows end up in the new extract's order.
+        """
+        start = time.perf_counter()
+        key = self.config['key']
+        raw, hashes = _prepare(raw, key)
+
+        old = self.rows
+        pos = pd.Index(old[key]).get_indexer(raw[key])
+        matched = pos >= 0
+        updated = matched.copy()
+        updated[matched] = old[HASH_COLUMN].to_numpy()[pos[matched]] != hashes[matched]
+        unchanged = matched & ~updated
+        changed = ~unchanged
+        retained = np.zeros(len(old), dtype=bool)
+        retained[pos[unchanged]] = True
+
+        processed = process_rows(raw[changed], self.config).reset_index(drop=True)
+        processed[HASH_COLUMN] = hashes[changed]
+        processed = _conform(processed, old)
+        self.partials = _patch_partials(self.partials,
+                                        compute_partials(old[~retained], self.config),
+                                        compute_partials(processed, self.config))
+
+        kept = old.iloc[pos[unchanged]]
+        rows = pd.concat([kept, processed], ignore_index=True) if len(kept) else processed
+        order = np.argsort(np.concatenate([np.flatnonzero(unchanged), np.flatnonzero(changed)]),
+                           kind='stable')
+        self.rows = rows.iloc[order].reset_index(drop=True)
+
+        self.last_refresh = {'inserted': int((~matched).sum()), 'updated': int(updated.sum()),
+                             'deleted': int(len(old) - matched.sum()),
+                             'unchanged': int(unchanged.sum()), 'rows': len(self.rows),
+                             'seconds': round(time.perf_counter() - start, 3)}
+        return self.last_refresh
+
+    def cleaned(self, impute: bool = True) -> pd.DataFrame:
+        """
+        The processed rows, with missing values mean-imputed from the partials.
+        """
+        out = self.rows.drop(columns=HASH_COLUMN)
+        if impute:
+            means = {c: v for c, v in impute_means(self.partials, self.config).items()
+                     if v is not None and c in out.columns}
+            out = out.fillna(means)
+        return out
+
+    def summary(self, grouping: str) -> pd.DataFrame:
+        return summarize_partials(self.partials, grouping, self.config)
+
+    def export(self, out_dir: str = 'output') -> List[str]:
+        """
+        Write the q5/q6/q7 pipeline outputs from the stored state; returns the paths.
+
+        Nothing is reprocessed: the rows were cleaned and featurized when
+        they changed, and the q7 aggregates come from the partials. Only
+        the imputation and one-hot encoding run over all rows.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        paths = {name: os.path.join(out_dir, name) for name in
+                 ['q5_cleaned_data.csv', 'q5_missing_report.txt', 'q6_transformed_data.csv',
+                  'q7_site_summary.csv', 'q7_intervention_comparison.csv', 'q7_analysis_report.txt']}
+        cleaned = self.cleaned()
+        features = [c for c in FEATURE_DEFINITIONS if c in cleaned.columns]
+        compressed_io.write_csv(cleaned.drop(columns=features), paths['q5_cleaned_data.csv'])
+        report = pd.DataFrame({'missing_before': detect_missing(self.rows.drop(columns=HASH_COLUMN)),
+                               'missing_after': detect_missing(cleaned)})
+        report.to_csv(paths['q5_missing_report.txt'], sep='\t')
+        compressed_io.write_csv(transform_rows(cleaned, self.config), paths['q6_transformed_data.csv'])
+
+        site, arm = self.summary('site'), self.summary('intervention_group')
+        compressed_io.write_csv(site, paths['q7_site_summary.csv'])
+        compressed_io.write_csv(arm, paths['q7_intervention_comparison.csv'])
+        counts = ', '.join(f'{k} {v}' for k, v in self.last_refresh.items() if k != 'seconds')
+        with open(paths['q7_analysis_report.txt'], 'w') as f:
+            f.write(f'Patients: {len(self.rows)}\nLast refresh: {counts}\n\n'
+                    f'By site:\n{site.to_string(index=False)}\n\n'
+                    f'By intervention group:\n{arm.to_string(index=False)}\n')
+        return list(paths.values())
+
+    def save(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        self.rows.to_parquet(os.path.join(self.root, 'rows.parquet'), index=False)
+        self.partials.reset_index().to_parquet(os.path.join(self.root, 'partials.parquet'), index=False)
+        for grouping in self.config['group_cols']:
+            compressed_io.write_csv(self.summary(grouping),
+                                    os.path.join(self.root, f'summary_{grouping}.csv'))
+        manifest = {'config': self.config, 'last_refresh': self.last_refresh,
+                    'impute_means': impute_means(self.partials, self.config)}
+        with open(os.path.join(self.root, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+
+def refresh(source: Union[str, pd.DataFrame], root: str,
+            config: Dict[str, Any] = None, export_dir: str = None) -> Dict[str, Any]:
+    """
+    Open the store at root, apply the extract (path or DataFrame) and save;
+    with export_dir, also write the pipeline outputs there.
+    """
+    raw = compressed_io.read_csv(source) if isinstance(source, str) else source
+    store = DeltaStore.open(root, config)
+    counts = store.refresh(raw)
+    store.save()
+    if export_dir:
+        store.export(export_dir)
+    return counts
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Apply a raw extract to the delta store, processing only changed rows.')
+    parser.add_argument('source', nargs='?', default='data/clinical_trial_raw.csv')
+    parser.add_argument('root', nargs='?', default='output/delta')
+    parser.add_argument('--export', metavar='DIR', help='Also write the q5-q7 outputs to DIR')
+    args = parser.parse_args(argv)
+
+    try:
+        counts = refresh(args.source, args.root, export_dir=args.export)
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        print(f'ERROR: {e}', file=sys.stderr)
+        return 1
+    print(f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['deleted']} deleted, "
+          f"{counts['unchanged']} unchanged in {counts['seconds']}s -> {args.root}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,10 +9,17 @@ Hidden variables drive the realistic patterns:
 - Patient engagement level
 """
 
+import argparse
+
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+parser = argparse.ArgumentParser(description='Generate the synthetic clinical trial extract.')
+parser.add_argument('--visits', action='store_true',
+                    help='Also write a longitudinal visits table (data/clinical_trial_visits.csv)')
+args = parser.parse_args()
+
 # Set seed for reproducibility
 np.random.seed(42)
 
@@ -310,6 +317,51 @@ print(f"  - Text inconsistencies: capitalization, typos, spacing")
 print(f"  - Date formats: 3 different formats")
 print(f"  - Whitespace: ~10% of text fields")
 
+# ============================================================================
+# LONGITUDINAL VISITS (optional)
+# ============================================================================
+
+# Quarterly visits from enrollment to the end of follow-up (earlier for
+# dropouts), repeating BP, cholesterol and glucose. Uses its own generator
+# so the patient table above is identical with or without --visits.
+if args.visits:
+    rng = np.random.default_rng(4242)
+    scheduled = follow_up_months // 3 + 1
+    completed = np.where(dropout, np.ceil(scheduled * rng.uniform(0.2, 1.0, N)), scheduled)
+    n_visits = np.maximum(completed, 1).astype(int)
+
+    patient_idx = np.repeat(np.arange(N), n_visits)
+    visit_number = np.arange(len(patient_idx)) - np.repeat(np.cumsum(n_visits) - n_visits, n_visits)
+    visit_month = visit_number * 3
+    visit_date = (pd.to_datetime(enrollment_date_str).to_numpy()[patient_idx]
+                  + pd.to_timedelta(visit_month * 30, unit='D'))
+
+    # Treated responders improve over the first year, everyone drifts slightly
+    improving = np.minimum(visit_month, 12) / 12
+    visits = pd.DataFrame({
+        'patient_id': np.asarray(patient_id)[patient_idx],
+        'visit_number': visit_number,
+        'visit_month': visit_month,
+        'visit_date': pd.DatetimeIndex(visit_date).strftime('%Y-%m-%d'),
+        'systolic_bp': (systolic_bp[patient_idx] - improving * treatment_a_effect[patient_idx] * 10
+                        + visit_month * 0.1 + rng.normal(0, 8, len(patient_idx))).round(0),
+        'diastolic_bp': (diastolic_bp[patient_idx] + rng.normal(0, 6, len(patient_idx))).round(0),
+        'cholesterol_total': (cholesterol_total[patient_idx] - improving * treatment_a_effect[patient_idx] * 20
+                              + rng.normal(0, 15, len(patient_idx))).round(0),
+        'glucose_fasting': (glucose_fasting[patient_idx] - improving * treatment_b_effect[patient_idx] * 15
+                            + rng.normal(0, 10, len(patient_idx))).round(0),
+    })
+
+    # Missed measurements, more often at lower-quality sites
+    for col in ['systolic_bp', 'diastolic_bp', 'cholesterol_total', 'glucose_fasting']:
+        missed = rng.random(len(visits)) < 0.12 - site_quality_values[patient_idx] * 0.08
+        visits.loc[missed, col] = np.nan
+
+    visits_file = 'data/clinical_trial_visits.csv'
+    visits.to_csv(visits_file, index=False)
+    print(f"\n✓ Generated visits table: {visits_file}")
+    print(f"  Rows: {len(visits)} ({n_visits.mean():.1f} visits per patient)")
+
 # Print summary statistics
 print(f"\nSummary statistics:")
 print(f"  Sites: {df['site'].nunique()} unique sites")
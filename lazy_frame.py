@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# Lazy query plans over q3_data_utils
+# Records load/clean/fill/filter/transform/bin/summarize steps and only runs
+# them on collect(), after pushing projections and predicates into the reader.
+
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+import pandas as pd
+
+from q3_data_utils import (clean_data, fill_missing, filter_data, transform_types,
+                           create_bins, summarize_by_group, _apply_filters,
+                           compute_features, feature_plan, feature_inputs, available_features,
+                           FEATURE_DEFINITIONS)
+from dedup import FingerprintSet, dedup_batch
+import compressed_io
+
+# Steps that see one row at a time and can therefore run chunk by chunk
+# inside the scan. fill_missing (column statistics) and summarize_by_group
+# need the whole frame.
+ROW_LOCAL_OPS = {'clean', 'filter', 'transform_types', 'create_bins', 'features', 'select'}
+
+
+class LazyFrame:
+    """
+    A deferred pipeline over a CSV file, Parquet file or in-memory DataFrame.
+
+    Example:
+        >>> summary = (LazyFrame.scan_csv('data/clinical_trial_raw.csv')
+        ...            .clean().fill_missing('bmi', 'median')
+        ...            .summarize_by_group('site', {'age': 'mean', 'bmi': 'mean'})
+        ...            .collect())
+    """
+
+    def __init__(self, source: Any, kind: str, plan: List[Tuple[str, Dict[str, Any]]] = None,
+                 chunksize: int = 200_000):
+        self._source = source
+        self._kind = kind
+        self._plan = list(plan or [])
+        self._chunksize = chunksize
+
+    @classmethod
+    def scan_csv(cls, filepath: str, chunksize: int = 200_000) -> 'LazyFrame':
+        return cls(filepath, 'csv', chunksize=chunksize)
+
+    @classmethod
+    def scan_parquet(cls, filepath: str) -> 'LazyFrame':
+        return cls(filepath, 'parquet')
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'LazyFrame':
+        return cls(df, 'frame')
+
+    def _then(self, op: str, **kwargs) -> 'LazyFrame':
+        if self._plan and self._plan[-1][0] == 'summarize_by_group':
+            raise ValueError('summarize_by_group must be the last step of a plan')
+        return LazyFrame(self._source, self._kind, self._plan + [(op, kwargs)], self._chunksize)
+
+    # --- plan builders (same arguments as the eager q3_data_utils functions) ---
+
+    def clean(self, **kwargs) -> 'LazyFrame':
+        if 'seen' in kwargs:
+            raise ValueError('Cross-batch seen-sets are not supported in lazy plans')
+        return self._then('clean', **kwargs)
+
+    def fill_missing(self, column: str, strategy: str = 'mean') -> 'LazyFrame':
+        return self._then('fill_missing', column=column, strategy=strategy)
+
+    def filter(self, filters: List[Dict[str, Any]]) -> 'LazyFrame':
+        return self._then('filter', filters=list(filters))
+
+    def transform_types(self, type_map: Dict[str, str]) -> 'LazyFrame':
+        return self._then('transform_types', type_map=dict(type_map))
+
+    def create_bins(self, column: str, bins: List[Any], labels: List[str],
+                    new_column: str = None) -> 'LazyFrame':
+        if new_column is None:
+            new_column = f'{column}_binned'
+        return self._then('create_bins', column=column, bins=bins, labels=labels,
+                          new_column=new_column)
+
+    def add_features(self, names: List[str] = None) -> 'LazyFrame':
+        # Resolve the feature list now so later registry edits do not change the plan
+        # names=None adds every feature whose inputs exist once the data is read
+        definitions = {n: FEATURE_DEFINITIONS[n] for level in feature_plan(names) for n in level}
+        return self._then('features', names=list(names or definitions), definitions=definitions,
+                          all=names is None)
+
+    def select(self, columns: List[str]) -> 'LazyFrame':
+        return self._then('select', columns=list(columns))
+
+    def summarize_by_group(self, group_col: str,
+                           agg_dict: Dict[str, Any] = None) -> 'LazyFrame':
+        return self._then('summarize_by_group', group_col=group_col, agg_dict=agg_dict)
+
+    # --- optimizer ---
+
+    def _optimize(self) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[Optional[Set[str]]]]:
+        """
+        Drop dead steps and compute the columns each step must hand on.
+
+        Returns the pruned plan and, for every step, the set of columns needed
+        after it (None = all columns).
+        """
+        needed: Optional[Set[str]] = None
+        kept, after = [], []
+        for op, kw in reversed(self._plan):
+            if op == 'create_bins' and needed is not None and kw['new_column'] not in needed:
+                continue  # result never used downstream
+            if op == 'features' and needed is not None:
+                names = [n for n in kw['names'] if n in needed]
+                if not names:
+                    continue
+                kw = dict(kw, names=names)
+            if op == 'transform_types' and needed is not None:
+                kw = dict(kw, type_map={c: t for c, t in kw['type_map'].items() if c in needed})
+                if not kw['type_map']:
+                    continue
+            kept.append((op, kw))
+            after.append(None if needed is None else set(needed))
+            needed = _columns_needed_before(op, kw, needed)
+        kept.reverse()
+        after.reverse()
+        return kept, [needed] + after
+
+    def explain(self) -> str:
+        """
+        Describe the optimized plan: what the scan reads and where each step runs.
+        """
+        plan, needed = self._optimize()
+        streamed = _streamable_prefix(plan)
+        cols = 'all columns' if needed[0] is None else ', '.join(sorted(needed[0]))
+        lines = [f'scan {self._kind} {self._source if self._kind != "frame" else "<DataFrame>"}'
+                 f' [columns: {cols}]']
+        for i, (op, kw) in enumerate(plan):
+            where = 'per chunk' if i < streamed else 'full frame'
+            lines.append(f'  {i + 1}. {op}({_fmt_kwargs(kw)}) -- {where}')
+        return '\n'.join(lines)
+
+    # --- execution ---
+
+    def collect(self) -> pd.DataFrame:
+        """
+        Run the optimized plan and return the result.
+        """
+        plan, needed = self._optimize()
+        streamed = _streamable_prefix(plan)
+        prefix, rest = plan[:streamed], plan[streamed:]
+        seen = FingerprintSet()
+
+        pieces = []
+        for chunk in self._scan(needed[0], prefix):
+            for i, (op, kw) in enumerate(prefix):
+                chunk = _run_step(op, kw, chunk, streaming=True, seen=seen)
+                chunk = _project(chunk, needed[i + 1])
+            pieces.append(chunk)
+        df = pd.concat(pieces) if len(pieces) > 1 else pieces[0]
+        if any(op == 'filter' for op, _ in prefix):
+            df = df.reset_index(drop=True)
+
+        for j, (op, kw) in enumerate(rest):
+            df = _run_step(op, kw, df, streaming=False)
+            df = _project(df, needed[streamed + j + 1])
+        return df
+
+    def _scan(self, usecols: Optional[Set[str]], prefix: List[Tuple[str, Dict[str, Any]]]):
+        if self._kind == 'frame':
+            df = self._source
+            yield df if usecols is None else df[[c for c in df.columns if c in usecols]]
+        elif self._kind == 'csv':
+            header = compressed_io.read_csv(self._source, nrows=0).columns
+            cols = None if usecols is None else [c for c in header if c in usecols]
+            yield from compressed_io.read_csv(self._source, usecols=cols, chunksize=self._chunksize)
+        elif self._kind == 'parquet':
+            # Leading raw-column filters go straight to the Parquet reader
+            pushed = []
+            for op, kw in prefix:
+                if op != 'filter':
+                    break
+                pushed.extend(kw['filters'])
+            cols = None if usecols is None else sorted(usecols)
+            yield compressed_io.read_parquet(self._source, columns=cols,
+                                             filters=parquet_filters(pushed) or None)
+        else:
+            raise ValueError(f'Unsupported source kind: {self._kind}')
+
+
+def _columns_needed_before(op: str, kw: Dict[str, Any],
+                           needed: Optional[Set[str]]) -> Optional[Set[str]]:
+    if op == 'summarize_by_group':
+        agg = kw['agg_dict'] or {}
+        return {kw['group_col'], *agg.keys()}
+    if op == 'select':
+        return set(kw['columns'])
+    if needed is None:
+        return None
+    if op == 'filter':
+        return needed | {f.get('column') for f in kw['filters']}
+    if op == 'fill_missing':
+        return needed | {kw['column']}
+    if op == 'create_bins':
+        return (needed - {kw['new_column']}) | {kw['column']}
+    if op == 'features':
+        defs = {n: kw['definitions'][n] for level in feature_plan(kw['names'], kw['definitions'])
+                for n in level}
+        inputs = {c for spec in defs.values() for c in feature_inputs(spec)}
+        return (needed - set(defs)) | (inputs - set(defs))
+    if op == 'clean':
+        if not kw.get('remove_duplicates', True):
+            return needed
+        key = kw.get('dedup_key')
+        if key is None:
+            return None  # full-row duplicates: every column takes part
+        return needed | ({key} if isinstance(key, str) else set(key))
+    return needed
+
+
+def _streamable_prefix(plan: List[Tuple[str, Dict[str, Any]]]) -> int:
+    """
+    Number of leading steps that can run chunk by chunk during the scan.
+
+    Stops at the first whole-frame step, and before any de-duplicating clean
+    that follows a filter (index labels would no longer match the eager path).
+    """
+    filtered = False
+    for i, (op, kw) in enumerate(plan):
+        if op not in ROW_LOCAL_OPS:
+            return i
+        if op == 'clean' and kw.get('remove_duplicates', True) and filtered:
+            return i
+        filtered = filtered or op == 'filter'
+    return len(plan)
+
+
+def _run_step(op: str, kw: Dict[str, Any], df: pd.DataFrame, streaming: bool,
+              seen: FingerprintSet = None) -> pd.DataFrame:
+    if op == 'clean':
+        if streaming and kw.get('remove_duplicates', True):
+            # Duplicates may span chunks: remember row fingerprints across chunks
+            key = kw.get('dedup_key') or list(df.columns)
+            df = dedup_batch(df, key, seen=seen, record_hash=kw.get('record_hash', False))
+            return clean_data(df, **dict(kw, remove_duplicates=False, dedup_key=None))
+        return clean_data(df, **kw)
+    if op == 'filter':
+        # Chunks keep their labels; the index is reset once after concatenation
+        return _apply_filters(df, kw['filters']) if streaming else filter_data(df, kw['filters'])
+    if op == 'fill_missing':
+        return fill_missing(df, kw['column'], kw['strategy'])
+    if op == 'transform_types':
+        return transform_types(df, kw['type_map'])
+    if op == 'create_bins':
+        return create_bins(df, kw['column'], kw['bins'], kw['labels'], kw['new_column'])
+    if op == 'features':
+        names = kw['names']
+        if kw.get('all'):
+            available = available_features(df.columns, kw['definitions'])
+            names = [n for n in names if n in available]
+        return compute_features(df, names, kw['definitions'])
+    if op == 'select':
+        return df[kw['columns']]
+    if op == 'summarize_by_group':
+        return summarize_by_group(df, kw['group_col'], kw['agg_dict'])
+    raise ValueError(f'Unknown plan step: {op}')
+
+
+def _project(df: pd.DataFrame, needed: Optional[Set[str]]) -> pd.DataFrame:
+    if needed is None or set(df.columns) <= needed:
+        return df
+    return df[[c for c in df.columns if c in needed]]
+
+
+def _fmt_kwargs(kw: Dict[str, Any]) -> str:
+    return ', '.join(f'{k}={v!r}' for k, v in kw.items() if k not in ('definitions', 'all'))
+
+
+def parquet_filters(filters: List[Dict[str, Any]]) -> List[Tuple[str, str, Any]]:
+    """
+    Translate filter_data filter dicts into pyarrow (column, op, value) filters.
+    """
+    out = []
+    for f in filters:
+        col, cond, val = f.get('column'), f.get('condition'), f.get('value')
+        if cond == 'equals':
+            out.append((col, '==', val))
+        elif cond == 'greater_than':
+            out.append((col, '>', val))
+        elif cond == 'less_than':
+            out.append((col, '<', val))
+        elif cond == 'in_range':
+            lo, hi = val
+            out.extend([(col, '>=', lo), (col, '<=', hi)])
+        elif cond == 'in_list':
+            out.append((col, 'in', list(val)))
+    return out
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# Missingness pattern analysis
+# Packs each row's null mask into one integer and counts co-missing patterns.
+
+from collections import Counter
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from q3_data_utils import clean_data
+import compressed_io
+
+MAX_PATTERN_COLUMNS = 64
+
+
+def pattern_codes(df: pd.DataFrame, columns: List[str] = None) -> Tuple[np.ndarray, List[str]]:
+    """
+    Encode each row's missingness as a uint64 bitmask (bit i = columns[i] is null).
+
+    Columns are packed one at a time, so no dense boolean frame is built.
+    """
+    if columns is None:
+        columns = list(df.columns)
+    if len(columns) > MAX_PATTERN_COLUMNS:
+        raise ValueError(f'At most {MAX_PATTERN_COLUMNS} columns can be packed into a pattern')
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise KeyError(f'Column(s) not found: {missing}')
+
+    codes = np.zeros(len(df), dtype=np.uint64)
+    for bit, col in enumerate(columns):
+        mask = df[col].isna().to_numpy()
+        codes |= mask.astype(np.uint64) << np.uint64(bit)
+    return codes, list(columns)
+
+
+def decode_pattern(code: int, columns: List[str]) -> List[str]:
+    """
+    Return the column names whose bit is set in a pattern code.
+    """
+    code = int(code)
+    return [c for i, c in enumerate(columns) if code >> i & 1]
+
+
+def _count_patterns(codes: np.ndarray, groups: np.ndarray = None) -> Counter:
+    # One unique over the codes, then one bincount over (group, pattern) pairs
+    uniq, inverse = np.unique(codes, return_inverse=True)
+    if groups is None:
+        counts = np.bincount(inverse, minlength=len(uniq))
+        return Counter({(None, int(u)): int(n) for u, n in zip(uniq, counts) if n})
+    group_codes, group_labels = pd.factorize(groups, use_na_sentinel=False)
+    combined = group_codes.astype(np.int64) * len(uniq) + inverse
+    counts = np.bincount(combined, minlength=len(group_labels) * len(uniq))
+    out = Counter()
+    for idx in np.flatnonzero(counts):
+        g, p = divmod(int(idx), len(uniq))
+        label = group_labels[g]
+        out[(None if pd.isna(label) else label, int(uniq[p]))] = int(counts[idx])
+    return out
+
+
+def _patterns_frame(counter: Counter, columns: List[str], by: str = None) -> pd.DataFrame:
+    records = []
+    for (group, code), n in counter.items():
+        names = decode_pattern(code, columns)
+        records.append({'group': group, 'pattern_code': code,
+                        'pattern': '+'.join(names) if names else '<complete>',
+                        'n_missing_cols': len(names), 'count': n})
+    out = pd.DataFrame(records, columns=['group', 'pattern_code', 'pattern', 'n_missing_cols', 'count'])
+    totals = out.groupby('group', dropna=False)['count'].transform('sum')
+    out['fraction'] = out['count'] / totals
+    if by is None:
+        out = out.drop(columns='group')
+        return out.sort_values(['count', 'pattern_code'], ascending=[False, True]).reset_index(drop=True)
+    out = out.rename(columns={'group': by})
+    return out.sort_values([by, 'count', 'pattern_code'],
+                           ascending=[True, False, True]).reset_index(drop=True)
+
+
+def missing_patterns(df: pd.DataFrame, columns: List[str] = None, by: str = None) -> pd.DataFrame:
+    """
+    Count distinct missingness patterns, optionally per group (e.g. by='site').
+
+    Returns one row per (group, pattern) with the missing column names,
+    the count and the fraction of rows in that group.
+    """
+    if columns is None:
+        columns = [c for c in df.columns if c != by]
+    codes, columns = pattern_codes(df, columns)
+    groups = df[by].to_numpy() if by is not None else None
+    return _patterns_frame(_count_patterns(codes, groups), columns, by)
+
+
+def missing_patterns_csv(filepath: str, columns: List[str] = None, by: str = None,
+                         chunksize: int = 500_000, clean: bool = True) -> pd.DataFrame:
+    """
+    Stream a CSV in chunks and count missingness patterns in bounded memory.
+
+    With clean=True each chunk goes through clean_data() first, so sentinels
+    count as missing and the group column uses canonical spellings.
+    """
+    usecols = None if columns is None else list(dict.fromkeys(list(columns) + ([by] if by else [])))
+    counter = Counter()
+    for chunk in compressed_io.read_csv(filepath, usecols=usecols, chunksize=chunksize):
+        if clean:
+            chunk = clean_data(chunk, remove_duplicates=False)
+        if columns is None:
+            columns = [c for c in chunk.columns if c != by]
+        codes, _ = pattern_codes(chunk, columns)
+        counter.update(_count_patterns(codes, chunk[by].to_numpy() if by else None))
+    return _patterns_frame(counter, columns, by)
+
+
+def co_missing_counts(patterns: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Pairwise co-missing row counts derived from a pattern table.
+
+    Entry (a, b) is the number of rows where both a and b are missing; the
+    diagonal is the per-column missing count.
+    """
+    codes = patterns['pattern_code'].to_numpy(dtype=np.uint64)
+    bits = ((codes[:, None] >> np.arange(len(columns), dtype=np.uint64)) & np.uint64(1)).astype(np.int64)
+    weights = patterns['count'].to_numpy(dtype=np.int64)
+    matrix = bits.T @ (bits * weights[:, None])
+    return pd.DataFrame(matrix, index=columns, columns=columns)
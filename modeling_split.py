@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# Modeling dataset splits
+# Stratified train/validation/test and k-fold assignment for the q6 transformed
+# data, streamed into one Parquet file per split so training jobs load only theirs.
+#
+# Output layout:
+#   <out_dir>/train.parquet        (with a 'fold' column when folds > 1)
+#   <out_dir>/validation.parquet
+#   <out_dir>/test.parquet
+#   <out_dir>/manifest.json        seed, fractions, strata and row counts
+
+import os
+import sys
+import json
+import argparse
+from typing import List, Dict, Any, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import compressed_io
+
+STRATIFY_COLUMNS = ['outcome_cvd', 'site', 'intervention_group']
+DEFAULT_FRACTIONS = {'train': 0.7, 'validation': 0.15, 'test': 0.15}
+
+
+def _stratum_sources(columns: List[str], stratify: List[str]) -> Dict[str, List[str]]:
+    # Each stratification variable comes from its own column or, after one-hot
+    # encoding, from its '<name>_*' indicator columns
+    sources = {}
+    for name in stratify:
+        if name in columns:
+            sources[name] = [name]
+            continue
+        dummies = [c for c in columns if c.startswith(f'{name}_')]
+        if not dummies:
+            raise KeyError(f'Stratification column not found: {name} (nor {name}_* indicators)')
+        sources[name] = dummies
+    return sources
+
+
+def stratum_codes(df: pd.DataFrame, stratify: List[str] = None) -> np.ndarray:
+    """
+    Integer stratum per row for the combination of the stratify variables.
+
+    Missing values form their own stratum. A variable that was one-hot
+    encoded is recovered from its indicator columns (no indicator set counts
+    as missing).
+    """
+    stratify = STRATIFY_COLUMNS if stratify is None else list(stratify)
+    codes = np.zeros(len(df), dtype=np.int64)
+    for name, cols in _stratum_sources(list(df.columns), stratify).items():
+        if cols == [name]:
+            level, labels = pd.factorize(df[name], use_na_sentinel=False)
+            n_levels = max(len(labels), 1)
+        else:
+            onehot = df[cols].fillna(False).to_numpy(dtype=bool)
+            level = np.where(onehot.any(axis=1), onehot.argmax(axis=1) + 1, 0)
+            n_levels = len(cols) + 1
+        codes = codes * n_levels + level
+    # compact the mixed-radix code so it stays small however many variables
+    return np.unique(codes, return_inverse=True)[1].ravel()
+
+
+def _ranks(codes: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # Position of each row within its stratum, in a random order
+    n = len(codes)
+    order = np.lexsort((rng.random(n), codes))
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, sorted_codes, side='left')
+    ranks = np.empty(n, dtype=np.int64)
+    ranks[order] = np.arange(n) - starts
+    return ranks
+
+
+def _check_fractions(fractions: Dict[str, float]) -> Dict[str, float]:
+    fractions = dict(DEFAULT_FRACTIONS if fractions is None else fractions)
+    if not fractions or min(fractions.values()) < 0 or not np.isclose(sum(fractions.values()), 1.0):
+        raise ValueError(f'Split fractions must be non-negative and sum to 1: {fractions}')
+    return fractions
+
+
+def assign_splits(df: pd.DataFrame, fractions: Dict[str, float] = None,
+                  stratify: List[str] = None, seed: int = 0) -> pd.Series:
+    """
+    Stratified split label per row (categorical, in the order of fractions).
+
+    Every stratum is shuffled (seeded) and cut at the rounded cumulative
+    fractions of its size, so each split gets its share of every stratum.
+    """
+    fractions = _check_fractions(fractions)
+    codes = stratum_codes(df, stratify)
+    ranks = _ranks(codes, np.random.default_rng(seed))
+    sizes = np.bincount(codes)
+    cuts = np.rint(np.cumsum(list(fractions.values()))[:-1] * sizes[:, None])
+    split = (ranks[:, None] >= cuts[codes]).sum(axis=1)
+    return pd.Series(pd.Categorical.from_codes(split, categories=list(fractions)),
+                     index=df.index, name='split')
+
+
+def assign_folds(df: pd.DataFrame, k: int = 5, stratify: List[str] = None,
+                 seed: int = 0) -> pd.Series:
+    """
+    Stratified k-fold index (0..k-1) per row; fold sizes per stratum differ by at most one.
+    """
+    if k < 2:
+        raise ValueError('k must be at least 2')
+    ranks = _ranks(stratum_codes(df, stratify), np.random.default_rng(seed))
+    return pd.Series(ranks % k, index=df.index, name='fold')
+
+
+def _to_table(frame: pd.DataFrame, schema: pa.Schema = None) -> pa.Table:
+    if schema is None:
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    frame = frame.copy()
+    for col in frame.columns:
+        # a chunk where a text column is all-missing is read back as float NaN
+        if frame[col].isna().all():
+            frame[col] = pd.Series([None] * len(frame), index=frame.index, dtype=object)
+    return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+def export_splits(source: Union[str, pd.DataFrame], out_dir: str,
+                  fractions: Dict[str, float] = None, stratify: List[str] = None,
+                  seed: int = 0, folds: int = 5, chunksize: int = 100_000) -> Dict[str, int]:
+    """
+    Assign splits (and train folds) and stream each split to its own Parquet file.
+
+    source is a DataFrame or a (possibly compressed) CSV path. For a path,
+    the first pass reads only the stratification columns; the second reads
+    chunks and appends each chunk's rows to the split writers, so the full
+    dataset is never held in memory. Rows keep their source order within
+    each split. Returns the row count per split.
+    """
+    fractions = _check_fractions(fractions)
+    stratify = STRATIFY_COLUMNS if stratify is None else list(stratify)
+    if isinstance(source, pd.DataFrame):
+        keys = source
+        chunks = (source.iloc[i:i + chunksize] for i in range(0, max(len(source), 1), chunksize))
+    else:
+        header = list(compressed_io.read_csv(source, nrows=0).columns)
+        usecols = [c for cols in _stratum_sources(header, stratify).values() for c in cols]
+        keys = compressed_io.read_csv(source, usecols=usecols)
+        chunks = compressed_io.read_csv(source, chunksize=chunksize)
+
+    split = assign_splits(keys, fractions, stratify, seed).cat.codes.to_numpy()
+    fold = None
+    if folds and folds > 1:
+        train = split == 0
+        fold = np.full(len(keys), -1, dtype=np.int64)
+        fold[train] = assign_folds(keys[train], folds, stratify, seed).to_numpy()
+    del keys
+
+    os.makedirs(out_dir, exist_ok=True)
+    names = list(fractions)
+    paths = {name: os.path.join(out_dir, f'{name}.parquet') for name in names}
+    writers: Dict[str, pq.ParquetWriter] = {}
+    counts = dict.fromkeys(names, 0)
+    offset = 0
+    try:
+        for chunk in chunks:
+            rows = slice(offset, offset + len(chunk))
+            offset += len(chunk)
+            for code, name in enumerate(names):
+                mask = split[rows] == code
+                part = chunk[mask]
+                if name == names[0] and fold is not None:
+                    part = part.assign(fold=fold[rows][mask])
+                if name not in writers:
+                    schema = _to_table(part).schema.remove_metadata()
+                    writers[name] = pq.ParquetWriter(paths[name] + '.tmp', schema, compression='zstd')
+                if len(part):
+                    writers[name].write_table(_to_table(part, writers[name].schema))
+                counts[name] += len(part)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    if offset != len(split):
+        raise ValueError(f'Source changed between passes: {len(split)} then {offset} rows')
+    for name in names:
+        os.replace(paths[name] + '.tmp', paths[name])
+
+    manifest = {'seed': seed, 'fractions': fractions, 'stratify': stratify,
+                'folds': folds if fold is not None else None, 'rows': counts}
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return counts
+
+
+def load_split(out_dir: str, split: str = 'train', columns: List[str] = None,
+               folds: List[int] = None) -> pd.DataFrame:
+    """
+    Load one exported split, optionally only some columns and (train) folds.
+    """
+    path = os.path.join(out_dir, f'{split}.parquet')
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'Split not found: {path}')
+    filters = None if folds is None else [('fold', 'in', list(folds))]
+    return pq.read_table(path, columns=columns, filters=filters).to_pandas()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Split the modeling dataset into stratified Parquet files.')
+    parser.add_argument('source', nargs='?', default='output/q6_transformed_data.csv')
+    parser.add_argument('out_dir', nargs='?', default='output/q6_splits')
+    parser.add_argument('--fractions', type=float, nargs=3, metavar=('TRAIN', 'VAL', 'TEST'),
+                        default=list(DEFAULT_FRACTIONS.values()))
+    parser.add_argument('--stratify', nargs='+', default=STRATIFY_COLUMNS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--folds', type=int, default=5, help='Folds within train (0 for none)')
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    try:
+        counts = export_splits(args.source, args.out_dir, dict(zip(DEFAULT_FRACTIONS, args.fractions)),
+                               args.stratify, args.seed, args.folds, args.chunksize)
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        print(f'ERROR: {e}', file=sys.stderr)
+        return 1
+    print(', '.join(f'{name}: {n}' for name, n in counts.items()) + f' rows -> {args.out_dir}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
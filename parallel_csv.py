@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# Parallel CSV reader
+# Splits a large CSV into newline-aligned byte ranges, parses them in worker
+# processes and reassembles the result exactly as a single pd.read_csv would.
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+import compressed_io
+
+# read_csv options that only make sense for the whole file
+UNSUPPORTED_OPTIONS = {'header', 'names', 'skiprows', 'skipfooter', 'nrows', 'chunksize',
+                       'iterator', 'index_col', 'compression'}
+
+
+def byte_ranges(path: str, parts: int) -> Tuple[int, List[Tuple[int, int]]]:
+    """
+    Split the data rows of a CSV into up to `parts` newline-aligned ranges.
+
+    Returns (end of the header line, [(start, end), ...]). Assumes quoted
+    fields never contain newlines, which holds for our extracts.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.readline()
+        data_start = f.tell()
+        bounds = [data_start]
+        for i in range(1, parts):
+            target = data_start + (size - data_start) * i // parts
+            if target <= bounds[-1]:
+                continue
+            f.seek(target - 1)
+            f.readline()  # move to the start of the next full line
+            if f.tell() >= size:
+                break
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+        bounds.append(size)
+    return data_start, [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _parse_range(path: str, start: int, end: int, names: List[str],
+                 kwargs: Dict[str, Any]) -> pd.DataFrame:
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(io.BytesIO(data), header=None, names=names, **kwargs)
+
+
+def _target_dtype(parts: List[pd.Series]):
+    """
+    The dtype a single read would give the concatenated column, or None when
+    the parts disagree in a way only re-parsing as text can settle.
+    """
+    observed = [s.dtype for s in parts if s.notna().any()]
+    has_na = any(s.isna().any() for s in parts)
+    if not observed:
+        return parts[0].dtype
+    kinds = {getattr(d, 'kind', 'O') for d in observed}
+    if len(set(map(str, observed))) == 1:
+        dtype = observed[0]
+    elif kinds <= {'i', 'u', 'f'}:
+        dtype = np.result_type(*observed)
+    elif kinds == {'b', 'O'} and all(s.dropna().map(type).eq(bool).all()
+                                      for s in parts if s.dtype == object):
+        dtype = np.dtype(object)  # booleans with missing values somewhere
+    else:
+        return None
+    if has_na and getattr(dtype, 'kind', 'O') in 'iub':
+        # A missing value anywhere makes the whole column float (or object for bool)
+        dtype = np.dtype(np.float64) if dtype.kind != 'b' else np.dtype(object)
+    return dtype
+
+
+def read_csv_parallel(path: str, workers: int = None, min_part_bytes: int = 32 * 1024 ** 2,
+                      **kwargs) -> pd.DataFrame:
+    """
+    Parse a large CSV in parallel byte ranges; same rows, order and dtypes as pd.read_csv.
+
+    Each worker parses one range with the file's header as column names and
+    the same options (usecols, dtype, na_values, ...). Columns whose inferred
+    dtypes differ between ranges are reconciled: numeric parts are promoted,
+    all-missing parts adopt the common dtype, and a column that mixes numbers
+    and text in different ranges is re-parsed as text, as the single read
+    would keep it.
+
+    Files smaller than two parts, and compressed files (which cannot be
+    split), are read with a single parser.
+    """
+    bad = UNSUPPORTED_OPTIONS & set(kwargs)
+    if bad:
+        raise ValueError(f'Unsupported option(s) for parallel reads: {sorted(bad)}')
+    workers = workers or os.cpu_count() or 1
+    if compressed_io.detect_compression(path) is not None:
+        return compressed_io.read_csv(path, **kwargs)
+    parts = min(workers, max(1, os.path.getsize(path) // min_part_bytes))
+    if parts < 2:
+        return pd.read_csv(path, **kwargs)
+
+    names = list(pd.read_csv(path, nrows=0).columns)
+    _, ranges = byte_ranges(path, parts)
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        def run(options):
+            futures = [pool.submit(_parse_range, path, a, b, names, options) for a, b in ranges]
+            return [f.result() for f in futures]
+
+        pieces = run(kwargs)
+        columns = list(pieces[0].columns)
+        reparse = []
+        for col in columns:
+            target = _target_dtype([p[col] for p in pieces])
+            if target is None:
+                reparse.append(col)
+                continue
+            for p in pieces:
+                if p[col].dtype != target:
+                    p[col] = p[col].astype(target)
+        if reparse:
+            dtype = dict(kwargs.get('dtype') or {}) if isinstance(kwargs.get('dtype'), dict) else {}
+            dtype.update({c: str for c in reparse})
+            usecols = [c for c in names if c in reparse]
+            text = run(dict(kwargs, usecols=usecols, dtype=dtype))
+            for p, t in zip(pieces, text):
+                for col in reparse:
+                    p[col] = t[col]
+
+    return pd.concat(pieces, ignore_index=True)
@@ -57,51 +57,15 @@ if [ ! -f "$DATA_FILE" ]; then
 	exit 1
 fi
 
-# Expected columns (lowercase)
-expected_cols=(
-	patient_id age sex bmi enrollment_date systolic_bp diastolic_bp
-	cholesterol_total cholesterol_hdl cholesterol_ldl glucose_fasting
-	site intervention_group follow_up_months adverse_events outcome_cvd
-	adherence_pct dropout
-)
-
-# Read header, normalize
-header_line=$(head -n1 "$DATA_FILE" | tr -d '\r')
-IFS=',' read -r -a header_arr <<< "$header_line"
-
-# Normalize header entries: trim and lowercase
-declare -A header_map
-for col in "${header_arr[@]}"; do
-	# trim spaces
-	col_clean=$(echo "$col" | sed 's/^ *//; s/ *$//' | tr '[:upper:]' '[:lower:]')
-	header_map["$col_clean"]=1
-done
-
-missing_count=0
-for ec in "${expected_cols[@]}"; do
-	if [ -z "${header_map[$ec]:-}" ]; then
-		echo "  MISSING COLUMN: $ec"
-		missing_count=$((missing_count+1))
-	fi
-done
-
-# Row count check (exclude header)
-total_lines=$(wc -l < "$DATA_FILE" | tr -d ' ')
-data_rows=$((total_lines-1))
-min_rows=1000
-if [ "$data_rows" -lt "$min_rows" ]; then
-	echo "  TOO FEW ROWS: $data_rows (minimum expected $min_rows)"
-	missing_count=$((missing_count+1))
-else
-	echo "  Row count OK: $data_rows rows"
-fi
-
-if [ "$missing_count" -gt 0 ]; then
-	echo "CSV validation FAILED ($missing_count problems)" >&2
-	exit 1
+# Single streaming pass: header, row count, null/sentinel/range/date/category checks.
+# The full per-column report is written to reports/data_quality.txt.
+if command -v python3 >/dev/null 2>&1; then
+	PYTHON=python3
 else
-	echo "CSV validation PASSED"
+	PYTHON=python
 fi
+"$PYTHON" "$BASE_DIR/data_quality.py" "$DATA_FILE" --min-rows 1000 \
+	--report "$BASE_DIR/reports/data_quality.txt" || exit 1
 
 echo "Saving directory structure to reports/directory_structure.txt"
 if command -v tree >/dev/null 2>&1; then
@@ -2,79 +2,400 @@
 # Assignment 5, Question 3: Data Utilities Library
 # Core reusable functions for data loading, cleaning, and transformation.
 
+import os
+import re
+import ast
+import graphlib
+
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Any, Union
 
+from dedup import dedup_batch
+import compressed_io
+
 
-def load_data(filepath: str) -> pd.DataFrame:
+def load_data(filepath: str, filters: List[Dict[str, Any]] = None,
+              columns: List[str] = None, compact: bool = False, workers: int = 1) -> pd.DataFrame:
     """
     Load CSV file into DataFrame.
+
+    filepath may also be a partitioned dataset directory (see dataset_store);
+    then only the partitions matching `filters` are read. filters (filter_data
+    format) and columns work for CSV files too. gzip/zstd-compressed CSVs
+    and Parquet files (.parquet, .pq) are read directly.
+
+    compact=True applies compact_frame(): integer patient_id keys and
+    categorical text columns (see df.attrs for the codec and memory usage).
+
+    workers > 1 parses a large uncompressed CSV in parallel byte ranges
+    (see parallel_csv); the result is the same as a single read.
     """
     if not isinstance(filepath, str):
         raise TypeError('filepath must be a string')
+    if os.path.isdir(filepath):
+        from dataset_store import read_dataset
+        df = read_dataset(filepath, filters, columns)
+        return compact_frame(df) if compact else df
     try:
-        df = pd.read_csv(filepath)
-        return df
+        usecols = None if columns is None else \
+            list(dict.fromkeys(list(columns) + [f['column'] for f in filters or []]))
+        if compressed_io.is_parquet(filepath):
+            df = compressed_io.read_parquet(filepath, columns=usecols)
+        elif workers != 1:
+            from parallel_csv import read_csv_parallel
+            df = read_csv_parallel(filepath, workers=workers, usecols=usecols)
+        else:
+            df = compressed_io.read_csv(filepath, usecols=usecols)
+        if filters:
+            df = filter_data(df, filters)
+        if columns is not None:
+            df = df[list(columns)]
+        return compact_frame(df) if compact else df
     except FileNotFoundError:
         print(f"Error: File not found at {filepath}")
         return pd.DataFrame()
 
 
-def clean_data(df: pd.DataFrame, remove_duplicates: bool = True, 
-               sentinel_value: Union[float, int] = -999) -> pd.DataFrame:
+def save_data(df: pd.DataFrame, filepath: str, compression: str = 'infer',
+              level: int = None) -> None:
+    """
+    Save a stage artifact as CSV (or Parquet for .parquet/.pq paths).
+
+    compression: 'infer' (from a .gz/.zst extension), 'gzip', 'zstd' or None.
+    """
+    if compressed_io.is_parquet(filepath):
+        compressed_io.write_parquet(df, filepath, compression='zstd' if compression == 'infer' else compression)
+    else:
+        compressed_io.write_csv(df, filepath, compression=compression, level=level)
+
+
+# --- Memory budget ---
+# None means no limit: everything runs in memory. With a budget (bytes, or a
+# size such as '512MB'; also read from $CLINICAL_MEMORY_BUDGET) chunked readers
+# size their chunks to fit, and summarize_by_group/sort_data spill to disk
+# (see spill.py) when their working set would not.
+
+MEMORY_BUDGET = None
+MEMORY_OVERHEAD = 4  # working memory of a pandas operation, in multiples of its input
+DEFAULT_CHUNKSIZE = 1_000_000
+_SIZE_UNITS = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+
+
+def parse_size(size: Union[int, str]) -> int:
+    """
+    Bytes from an int or a size string such as '512MB' or '2 GB'.
+    """
+    if isinstance(size, (int, np.integer)):
+        return int(size)
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?B?)\s*', str(size).upper())
+    if not match:
+        raise ValueError(f'Invalid size: {size!r}')
+    unit = match.group(2)
+    unit = unit + 'B' if unit and not unit.endswith('B') else unit
+    return int(float(match.group(1)) * _SIZE_UNITS[unit])
+
+
+def set_memory_budget(budget: Union[int, str, None]) -> None:
+    """
+    Set (or with None, clear) the process-wide memory budget.
+    """
+    global MEMORY_BUDGET
+    MEMORY_BUDGET = None if budget is None else parse_size(budget)
+
+
+def get_memory_budget() -> Union[int, None]:
+    if MEMORY_BUDGET is not None:
+        return MEMORY_BUDGET
+    env = os.environ.get('CLINICAL_MEMORY_BUDGET')
+    return parse_size(env) if env else None
+
+
+def estimate_row_bytes(df: pd.DataFrame) -> float:
+    """
+    Average in-memory bytes per row (deep, so text columns count their strings).
+    """
+    return float(df.memory_usage(deep=True, index=False).sum()) / max(len(df), 1)
+
+
+def auto_chunksize(row_bytes: float, budget: int = None, minimum: int = 1_000) -> int:
+    """
+    Rows per chunk so that a chunk and its working memory fit the budget.
+    """
+    budget = budget or get_memory_budget()
+    if budget is None:
+        return DEFAULT_CHUNKSIZE
+    return max(minimum, int(budget / (max(row_bytes, 1.0) * MEMORY_OVERHEAD)))
+
+
+def _over_budget(df: pd.DataFrame, columns: List[str]) -> bool:
+    budget = get_memory_budget()
+    if budget is None:
+        return False
+    used = df[[c for c in dict.fromkeys(columns) if c in df.columns]]
+    return estimate_row_bytes(used) * len(used) * MEMORY_OVERHEAD > budget
+
+
+# --- Compact representation ---
+
+def encode_patient_ids(ids: pd.Series, codec: Dict[str, Any] = None):
+    """
+    Encode patient IDs as integers with a reversible codec.
+
+    IDs that are one prefix plus a number ('P00001') are stored as the number
+    (codec kind 'pattern'); anything else falls back to dictionary codes
+    (kind 'dictionary'). Missing or unknown IDs, including pattern IDs with
+    other zero padding, encode to -1. Pass an existing codec to encode lookup
+    values consistently.
+
+    Returns:
+        (codes as int32 or int64 ndarray, codec dict)
+    """
+    ids = pd.Series(ids)
+    if codec is None:
+        codec = _pattern_codec(ids) or {'kind': 'dictionary',
+                                        'values': pd.unique(ids.dropna()).tolist()}
+    if codec['kind'] == 'pattern':
+        # Only digit groups the codec would print back: exactly `width` digits,
+        # or more without a leading zero ('P1' and 'P000001' are not 'P00001')
+        width = codec['width']
+        parts = ids.astype(object).str.extract(
+            rf'^{re.escape(codec["prefix"])}(\d{{{width}}}|[1-9]\d{{{width},}})$')[0]
+        codes = pd.to_numeric(parts, errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+    else:
+        codes = pd.Index(codec['values']).get_indexer(ids).astype(np.int64)
+    dtype = np.int32 if len(codes) == 0 or codes.max() < 2 ** 31 else np.int64
+    return codes.astype(dtype), codec
+
+
+def _pattern_codec(ids: pd.Series) -> Dict[str, Any]:
+    present = ids.dropna().astype(str)
+    if present.empty:
+        return None
+    parts = present.str.extract(r'^([^\d]*)(\d+)$')
+    if parts[0].isna().any() or parts[0].nunique() != 1 or parts[1].str.len().max() > 18:
+        return None
+    codec = {'kind': 'pattern', 'prefix': parts[0].iloc[0],
+             'width': int(parts[1].str.len().min())}
+    # Only reversible if formatting the number reproduces every ID exactly
+    numbers = parts[1].astype(np.int64)
+    if not decode_patient_ids(numbers.to_numpy(), codec).equals(present.reset_index(drop=True).astype(object)):
+        return None
+    return codec
+
+
+def decode_patient_ids(codes: Any, codec: Dict[str, Any]) -> pd.Series:
     """
-    Basic data cleaning: remove duplicates, replace sentinel values, and aggressively 
-    standardize string columns, including fixing known misspellings with a final 
-    explicit mapping.
+    Inverse of encode_patient_ids(); -1 decodes to NaN.
     """
+    codes = np.asarray(codes, dtype=np.int64)
+    missing = codes < 0
+    if codec['kind'] == 'pattern':
+        values = pd.Series(codes, dtype=object).map(
+            lambda n: f'{codec["prefix"]}{n:0{codec["width"]}d}')
+    else:
+        values = pd.Series(np.asarray(codec['values'], dtype=object)[np.where(missing, 0, codes)])
+    return values.where(~missing, np.nan).astype(object)
+
+
+def compact_frame(df: pd.DataFrame, id_column: str = 'patient_id',
+                  max_unique_ratio: float = 0.5) -> pd.DataFrame:
+    """
+    Shrink a frame: integer-encode the ID column and turn text columns with
+    few distinct values (at most max_unique_ratio of the rows) into categoricals,
+    which store each distinct string once.
+
+    The result's attrs hold 'patient_id_codec' (for decode_patient_ids) and
+    'memory_usage' ({'before': bytes, 'after': bytes}).
+    """
+    before = int(df.memory_usage(deep=True).sum())
     out = df.copy()
+    if id_column in out.columns:
+        codes, codec = encode_patient_ids(out[id_column])
+        out[id_column] = codes
+        out.attrs['patient_id_codec'] = codec
+    for col in out.columns:
+        s = out[col]
+        if col == id_column or not (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)):
+            continue
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            continue
+        if s.nunique() <= max_unique_ratio * len(s):
+            out[col] = s.astype('category')
+    after = int(out.memory_usage(deep=True).sum())
+    out.attrs['memory_usage'] = {'before': before, 'after': after}
+    return out
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-column memory usage (bytes) of two versions of a frame.
+    """
+    report = pd.DataFrame({'before_bytes': before.memory_usage(deep=True, index=False),
+                           'after_bytes': after.memory_usage(deep=True, index=False)})
+    report.loc['total'] = report.sum()
+    report['ratio'] = report['before_bytes'] / report['after_bytes']
+    return report
+
+
+# --- Declarative cleaning rules ---
+# Each column lists what clean_data() should do to it. Text mappings are keyed
+# on the normalized UPPERCASE spelling (see _normalize_text).
+#   sentinels:   values meaning "missing" in the source system -> NaN
+#   valid_range: (low, high) inclusive; values outside -> NaN
+#   normalize:   aggressive text normalization before mapping
+#   mapping:     normalized spelling -> canonical value
+#   case:        'title' re-cases values that the mapping did not cover
+#   allowed:     canonical values to keep; anything else -> NaN
+NUMERIC_SENTINELS = [-999, -1]
+
+CLEANING_RULES = {
+    'age': {'sentinels': NUMERIC_SENTINELS, 'valid_range': (0, 100)},
+    'bmi': {'sentinels': NUMERIC_SENTINELS},
+    'systolic_bp': {'sentinels': NUMERIC_SENTINELS},
+    'diastolic_bp': {'sentinels': NUMERIC_SENTINELS},
+    'cholesterol_total': {'sentinels': NUMERIC_SENTINELS},
+    'cholesterol_hdl': {'sentinels': NUMERIC_SENTINELS},
+    'cholesterol_ldl': {'sentinels': NUMERIC_SENTINELS},
+    'glucose_fasting': {'sentinels': NUMERIC_SENTINELS},
+    'follow_up_months': {'sentinels': NUMERIC_SENTINELS},
+    'adverse_events': {'sentinels': NUMERIC_SENTINELS},
+    'adherence_pct': {'sentinels': NUMERIC_SENTINELS, 'valid_range': (0, 100)},
+    'site': {
+        'normalize': True,
+        'mapping': {'SITE A': 'Site A', 'SITE B': 'Site B', 'SITE C': 'Site C',
+                    'SITE D': 'Site D', 'SITE E': 'Site E'},
+        'allowed': ['Site A', 'Site B', 'Site C', 'Site D', 'Site E'],
+    },
+    'intervention_group': {
+        'normalize': True,
+        # Treatment arms A and B are consolidated into 'Intervention'
+        'mapping': {'CONTROL': 'Control', 'CONTRL': 'Control', 'CONTROL GROUP': 'Control',
+                    'TREATMENT A': 'Intervention', 'TREATMEN A': 'Intervention',
+                    'TREATMENTA': 'Intervention', 'TREATMENT B': 'Intervention',
+                    'TREATMEN B': 'Intervention', 'TREATMENTB': 'Intervention'},
+        'allowed': ['Control', 'Intervention'],
+    },
+    'sex': {
+        'normalize': True,
+        'mapping': {'M': 'Male', 'MALE': 'Male', 'F': 'Female', 'FEMALE': 'Female'},
+        'allowed': ['Male', 'Female'],
+    },
+    'outcome_cvd': {'normalize': True, 'case': 'title', 'allowed': ['Yes', 'No']},
+    'dropout': {'normalize': True, 'case': 'title', 'allowed': ['Yes', 'No']},
+}
+
+
+def _normalize_text(values: pd.Series) -> pd.Series:
+    """
+    Uppercase, drop punctuation/digits/underscores and collapse whitespace.
+    """
+    out = values.astype(str).str.normalize('NFKC').str.upper()
+    out = out.str.replace('_', ' ', regex=False)
+    out = out.str.replace(r'[^A-Z\s]', '', regex=True)
+    out = out.str.replace(r'\s+', ' ', regex=True).str.strip()
+    return out.replace({'NAN': np.nan, '': np.nan})
+
+
+def _compile_numeric_rule(rule: Dict[str, Any], extra_sentinels: List[Any]):
+    sentinels = list(rule.get('sentinels', [])) + list(extra_sentinels)
+    valid_range = rule.get('valid_range')
+
+    def apply(s: pd.Series) -> pd.Series:
+        bad = s.isin(sentinels) if sentinels else np.zeros(len(s), dtype=bool)
+        if valid_range is not None and pd.api.types.is_numeric_dtype(s):
+            lo, hi = valid_range
+            bad = bad | (s < lo) | (s > hi)
+        if not bad.any():
+            return s
+        return s.mask(bad)
+    return apply
+
+
+def _compile_text_rule(rule: Dict[str, Any]):
+    mapping = rule.get('mapping', {})
+    allowed = rule.get('allowed')
+
+    def translate(uniques: pd.Series) -> pd.Series:
+        out = _normalize_text(uniques) if rule.get('normalize') else uniques.astype(object)
+        mapped = out.map(mapping)
+        if rule.get('case') == 'title':
+            out = out.str.title()
+        out = mapped.where(mapped.notna(), out)
+        if allowed is not None:
+            out = out.where(out.isin(allowed))
+        return out
+
+    def apply(s: pd.Series) -> pd.Series:
+        # Clean each distinct spelling once, then broadcast back via the codes
+        codes, uniques = pd.factorize(s, use_na_sentinel=True)
+        cleaned = translate(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+        values = np.append(cleaned, np.nan).astype(object)
+        return pd.Series(values[codes], index=s.index, name=s.name, dtype=object)
+    return apply
+
+
+def compile_cleaning_rules(rules: Dict[str, Dict[str, Any]] = None,
+                           extra_sentinels: List[Any] = None) -> Dict[str, Any]:
+    """
+    Compile a per-column rules spec into one vectorized function per column.
+    """
+    if rules is None:
+        rules = CLEANING_RULES
+    extra_sentinels = extra_sentinels or []
+    compiled = {}
+    for col, rule in rules.items():
+        unknown = set(rule) - {'sentinels', 'valid_range', 'normalize', 'mapping', 'case', 'allowed'}
+        if unknown:
+            raise ValueError(f'Unsupported rule key(s) for {col}: {sorted(unknown)}')
+        if 'sentinels' in rule or 'valid_range' in rule:
+            compiled[col] = _compile_numeric_rule(rule, extra_sentinels)
+        else:
+            compiled[col] = _compile_text_rule(rule)
+    return compiled
+
+
+def apply_cleaning_rules(df: pd.DataFrame, rules: Dict[str, Dict[str, Any]] = None,
+                         extra_sentinels: List[Any] = None) -> pd.DataFrame:
+    """
+    Apply compiled cleaning rules in a single pass over only the ruled columns.
+    """
+    compiled = compile_cleaning_rules(rules, extra_sentinels)
+    out = df.copy()
+    for col, func in compiled.items():
+        if col in out.columns:
+            out[col] = func(out[col])
+    return out
+
+
+def clean_data(df: pd.DataFrame, remove_duplicates: bool = True, 
+               sentinel_value: Union[float, int] = -999,
+               dedup_key: Union[str, List[str]] = None, seen=None,
+               record_hash: bool = False,
+               rules: Dict[str, Dict[str, Any]] = None) -> pd.DataFrame:
+    """
+    Basic data cleaning: remove duplicates, then apply the per-column cleaning
+    rules (sentinels and valid ranges on numeric columns, text normalization,
+    canonical mappings and allowed categories on categorical columns).
+
+    rules defaults to CLEANING_RULES; sentinel_value is added to the sentinels
+    of every numeric rule.
+
+    With dedup_key (e.g. 'patient_id') duplicates are detected on the key's
+    64-bit fingerprint instead of the full row; pass a `seen` set from
+    dedup.load_seen_set() to also drop keys delivered in earlier batches.
+    """
+    out = df
 
     # 1. Remove duplicates
     if remove_duplicates:
-        out.drop_duplicates(inplace=True)
-
-    # 2. Replace sentinel values with NaN (np.nan)
-    out.replace(to_replace=[sentinel_value, -1], value=np.nan, inplace=True)
-    
-    # --- Final Aggressive Mapping Dictionary for Ultimate Consolidation ---
-    # This dictionary maps ALL observed fragmented values (in UPPER case) 
-    # to the final, clean target groups.
-    CONSOLIDATED_MAPPING = {
-        # Site Consolidation (Targets: Site A, B, C, D, E)
-        'SITE A': 'Site A', 'SITE B': 'Site B', 'SITE C': 'Site C', 
-        'SITE D': 'Site D', 'SITE E': 'Site E', 'SITE_D': 'Site D',
-
-        # Intervention Group Consolidation (Targets: Control, Intervention)
-        # All control variations
-        'CONTROL': 'Control', 'CONTRL': 'Control', 'CONTROL GROUP': 'Control',
-        
-        # All treatment variations (A and B) consolidated into 'Intervention'
-        'TREATMENT A': 'Intervention', 'TREATMENTB': 'Intervention', 
-        'TREATMEN A': 'Intervention', 'TREATMENTB ': 'Intervention',
-        'TREATMENT B': 'Intervention', 'TREATMENTA': 'Intervention', 
-    }
-    
-    # 3. Apply Standardization and Final Mapping
-    for col in ['site', 'intervention_group', 'sex', 'outcome_cvd', 'dropout']:
-        if col in out.columns:
-            # Step A: Aggressive Text Cleaning
-            # Use UPPERCASE for easy, non-case-sensitive matching in the dictionary
-            out[col] = out[col].astype(str).str.normalize('NFKC').str.upper()
-            out[col] = out[col].str.replace('_', ' ', regex=False).str.strip()
-            out[col] = out[col].str.replace(r'[^A-ZA-Z\s]', '', regex=True).str.strip() 
-            out[col] = out[col].str.replace(r'\s+', ' ', regex=True).str.strip()
-            out[col] = out[col].replace('NAN', np.nan) # Replace NaN strings created by cleaning
-            
-            # Step B: Apply final explicit mapping to the now-UPPERCASE strings
-            # This is the guaranteed fix for the fragmentation
-            out[col] = out[col].replace(CONSOLIDATED_MAPPING)
-            
-            # Step C: Re-apply Title Case to clean columns for final output readability
-            if col not in ['site', 'intervention_group']: # Only apply to other categorical
-                out[col] = out[col].str.title() 
+        if dedup_key is not None:
+            out = dedup_batch(out, dedup_key, seen=seen, record_hash=record_hash)
+        else:
+            out = out.drop_duplicates()
 
-    return out
+    # 2. Sentinels, ranges and categorical standardization in one pass
+    return apply_cleaning_rules(out, rules, extra_sentinels=[sentinel_value])
 
 
 def detect_missing(df: pd.DataFrame) -> pd.Series:
@@ -93,7 +414,7 @@ def fill_missing(df: pd.DataFrame, column: str, strategy: str = 'mean') -> pd.Da
         raise KeyError(f"Column not found: {column}")
         
     if strategy == 'ffill':
-        out[column] = out[column].fillna(method='ffill')
+        out[column] = out[column].ffill()
         return out
         
     if strategy in ['mean', 'median']:
@@ -114,6 +435,18 @@ def fill_missing(df: pd.DataFrame, column: str, strategy: str = 'mean') -> pd.Da
 def filter_data(df: pd.DataFrame, filters: List[Dict[str, Any]]) -> pd.DataFrame:
     """
     Apply a list of filters to DataFrame in sequence.
+
+    df may also be the path of a partitioned dataset directory; partitions
+    whose site/enrollment_month keys fail the filters are not read.
+    """
+    if isinstance(df, str):
+        return load_data(df, filters=filters)
+    return _apply_filters(df, filters).reset_index(drop=True)
+
+
+def _apply_filters(df: pd.DataFrame, filters: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    filter_data() without the final index reset (used for chunked scans).
     """
     out = df.copy()
     for f in filters:
@@ -144,7 +477,7 @@ def filter_data(df: pd.DataFrame, filters: List[Dict[str, Any]]) -> pd.DataFrame
         else:
             raise ValueError(f'Unsupported condition: {cond}')
             
-    return out.reset_index(drop=True)
+    return out
 
 
 def transform_types(df: pd.DataFrame, type_map: Dict[str, str]) -> pd.DataFrame:
@@ -193,15 +526,36 @@ def summarize_by_group(df: pd.DataFrame, group_col: str,
                        agg_dict: Dict[str, Union[str, List[str]]] = None) -> pd.DataFrame:
     """
     Group data and apply aggregations, adding a patient count if not specified.
+
+    df may also be a CSV path. When a memory budget is set and the grouping
+    would not fit it, the aggregation runs out of core with spilled hash
+    partitions (spill.external_summarize); the result is the same.
     """
+    needed = [group_col] + [c for c in agg_dict or {} if c != group_col]
+    if isinstance(df, str):
+        if get_memory_budget() is not None:
+            from spill import external_summarize
+            return external_summarize(df, group_col, agg_dict)
+        df = load_data(df, columns=needed)
     if group_col not in df.columns:
         raise KeyError(f'Group column not found: {group_col}')
-        
+    if _over_budget(df, needed):
+        from spill import external_summarize
+        return external_summarize(df, group_col, agg_dict)
+    return _group_summary(df, group_col, agg_dict)
+
+
+def _group_summary(df: pd.DataFrame, group_col: str,
+                   agg_dict: Dict[str, Union[str, List[str]]] = None) -> pd.DataFrame:
+    # The in-memory aggregation; spill.py runs it on each hash partition
     if agg_dict is None:
         summary_df = df.groupby(group_col).size().to_frame(name='patient_count').reset_index()
         return summary_df
     else:
         summary_df = df.groupby(group_col).agg(agg_dict)
+        if isinstance(summary_df.columns, pd.MultiIndex):
+            # List aggregations: flatten ('bmi', 'mean') -> 'bmi_mean'
+            summary_df.columns = ['_'.join(map(str, c)) for c in summary_df.columns]
         
         if 'patient_count' not in summary_df.columns:
               count_df = df.groupby(group_col).size().rename('patient_count')
@@ -210,5 +564,291 @@ def summarize_by_group(df: pd.DataFrame, group_col: str,
         return summary_df.reset_index()
 
 
+def sort_data(df: pd.DataFrame, by: Union[str, List[str]],
+              ascending: Union[bool, List[bool]] = True) -> pd.DataFrame:
+    """
+    Stable sort by one or more columns, missing values last.
+
+    df may also be a CSV path. Over the memory budget the sort runs as an
+    external merge sort over spilled runs (spill.external_sort); to write a
+    result larger than memory use spill.sort_to_csv.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    if isinstance(df, str):
+        if get_memory_budget() is not None:
+            from spill import external_sort
+            return pd.concat(external_sort(df, by, ascending), ignore_index=True)
+        df = load_data(df)
+    missing = [c for c in by if c not in df.columns]
+    if missing:
+        raise KeyError(f'Sort column(s) not found: {missing}')
+    if _over_budget(df, list(df.columns)):
+        from spill import external_sort
+        return pd.concat(external_sort(df, by, ascending), ignore_index=True)
+    return df.sort_values(by, ascending=ascending, kind='stable',
+                          na_position='last').reset_index(drop=True)
+
+
+# --- Longitudinal visits ---
+
+def _integer_keys(patient_keys: pd.Series, visit_keys: pd.Series):
+    if pd.api.types.is_integer_dtype(patient_keys) and pd.api.types.is_integer_dtype(visit_keys):
+        return patient_keys.to_numpy(), visit_keys.to_numpy()
+    left, codec = encode_patient_ids(patient_keys)
+    right, _ = encode_patient_ids(visit_keys, codec)
+    return left, right
+
+
+def join_patient_visits(visits: pd.DataFrame, patients: pd.DataFrame, on: str = 'patient_id',
+                        columns: List[str] = None, how: str = 'inner') -> pd.DataFrame:
+    """
+    Attach patient-level columns to every visit with a sorted merge.
+
+    Keys are compared as integers (string IDs are encoded first), the patient
+    keys are sorted once and each visit finds its patient by binary search,
+    so no hash table is built over the visits. how='left' keeps visits with
+    no matching patient; a visit ID padded differently from the patient IDs
+    ('P1' vs 'P00001') does not match. Visit order is preserved.
+    """
+    if how not in ('inner', 'left'):
+        raise ValueError("how must be 'inner' or 'left'")
+    for name, frame in [('visits', visits), ('patients', patients)]:
+        if on not in frame.columns:
+            raise KeyError(f'Join column not found in {name}: {on}')
+    if patients[on].duplicated().any():
+        raise ValueError(f'patients must have one row per {on}')
+    columns = [c for c in (columns or patients.columns) if c != on]
+
+    patient_keys, visit_keys = _integer_keys(patients[on], visits[on])
+    order = np.argsort(patient_keys, kind='stable')
+    sorted_keys = patient_keys[order]
+    rows = np.full(len(visit_keys), -1, dtype=np.int64)
+    if len(sorted_keys):
+        pos = np.searchsorted(sorted_keys, visit_keys).clip(max=len(sorted_keys) - 1)
+        matched = (sorted_keys[pos] == visit_keys) & (visit_keys >= 0)
+        rows[matched] = order[pos[matched]]
+
+    out = visits if how == 'left' else visits[rows >= 0]
+    # Row -1 (no patient) becomes all-NaN for left joins
+    attached = patients[columns].reset_index(drop=True).reindex(rows[rows >= 0] if how == 'inner' else rows)
+    attached.index = out.index
+    return pd.concat([out, attached], axis=1)
+
+
+def _visit_partials(chunk: pd.DataFrame, on: str, time_col: str,
+                    value_cols: List[str]) -> pd.DataFrame:
+    # Per patient: visit count, last visit time, and the time and value of the
+    # first and last non-missing observation of each column
+    chunk = chunk.sort_values([on, time_col], kind='stable')
+    keys = chunk[on]
+    g = chunk.groupby(on, sort=True)
+    out = {'n_visits': g.size(), f'last_{time_col}': g[time_col].max()}
+    for col in value_cols:
+        t = chunk[time_col].where(chunk[col].notna())
+        out[f'{col}_baseline'] = g[col].first()
+        out[f'{col}_baseline_t'] = t.groupby(keys, sort=True).min()
+        out[f'{col}_last'] = g[col].last()
+        out[f'{col}_last_t'] = t.groupby(keys, sort=True).max()
+    return pd.DataFrame(out)
+
+
+def _combine_partials(a: pd.DataFrame, b: pd.DataFrame, time_col: str,
+                      value_cols: List[str]) -> pd.DataFrame:
+    # A patient's visits may span chunks: keep the earliest baseline and the
+    # latest last observation, and add the counts
+    a, b = a.align(b, join='outer')
+    out = pd.DataFrame(index=a.index)
+    out['n_visits'] = a['n_visits'].fillna(0) + b['n_visits'].fillna(0)
+    out[f'last_{time_col}'] = np.fmax(a[f'last_{time_col}'], b[f'last_{time_col}'])
+    for col in value_cols:
+        bt, lt = f'{col}_baseline_t', f'{col}_last_t'
+        take_b = b[bt].notna() & ~(a[bt] <= b[bt])
+        out[f'{col}_baseline'] = a[f'{col}_baseline'].where(~take_b, b[f'{col}_baseline'])
+        out[bt] = a[bt].where(~take_b, b[bt])
+        take_b = b[lt].notna() & ~(a[lt] > b[lt])
+        out[f'{col}_last'] = a[f'{col}_last'].where(~take_b, b[f'{col}_last'])
+        out[lt] = a[lt].where(~take_b, b[lt])
+    return out
+
+
+def summarize_visits(visits: Union[pd.DataFrame, str, Any], value_cols: List[str] = None,
+                     on: str = 'patient_id', time_col: str = 'visit_month',
+                     chunksize: int = None) -> pd.DataFrame:
+    """
+    Per-patient baseline, last observation and change from baseline.
+
+    visits may be a DataFrame, a CSV path (read in chunks of `chunksize`
+    rows, by default sized to the memory budget) or an iterable of DataFrame
+    chunks; memory is bounded by one chunk plus one row per patient. Missing measurements are skipped, so *_last is
+    the last observation carried forward and *_baseline the first observed.
+
+    Returns one row per patient with n_visits, last_<time_col> and, for each
+    value column, <col>_baseline, <col>_last and <col>_change.
+    """
+    if isinstance(visits, pd.DataFrame):
+        chunks = [visits]
+    elif isinstance(visits, str):
+        if chunksize is None:
+            chunksize = auto_chunksize(estimate_row_bytes(compressed_io.read_csv(visits, nrows=1_000)))
+        chunks = compressed_io.read_csv(visits, chunksize=chunksize)
+    else:
+        chunks = visits
+
+    summary, time_dtype = None, None
+    for chunk in chunks:
+        time_dtype = time_dtype or chunk[time_col].dtype
+        if value_cols is None:
+            value_cols = [c for c in chunk.select_dtypes('number').columns
+                          if c not in (on, time_col, 'visit_number')]
+        part = _visit_partials(chunk, on, time_col, value_cols)
+        summary = part if summary is None else _combine_partials(summary, part, time_col, value_cols)
+    if summary is None:
+        raise ValueError('No visits to summarize')
+
+    out = summary[['n_visits', f'last_{time_col}']].copy()
+    out['n_visits'] = out['n_visits'].astype(np.int64)
+    if out[f'last_{time_col}'].notna().all():
+        out[f'last_{time_col}'] = out[f'last_{time_col}'].astype(time_dtype)
+    for col in value_cols:
+        out[f'{col}_baseline'] = summary[f'{col}_baseline']
+        out[f'{col}_last'] = summary[f'{col}_last']
+        out[f'{col}_change'] = summary[f'{col}_last'] - summary[f'{col}_baseline']
+    return out.rename_axis(on).reset_index()
+
+# --- Feature registry ---
+# Derived columns declared once and computed together by compute_features().
+#   expr:   arithmetic over columns or other features (DataFrame.eval syntax);
+#           all expr features of a dependency level run in one fused eval call
+#   select: ordered (condition, label) pairs, first match wins, else default
+#   bins:   pd.cut of one column (bins, labels, right)
+FEATURE_DEFINITIONS: Dict[str, Dict[str, Any]] = {
+    'cholesterol_ratio': {'kind': 'expr', 'expr': 'cholesterol_ldl / cholesterol_hdl'},
+    'bp_category': {
+        'kind': 'select',
+        'conditions': [('systolic_bp >= 130', 'High'),
+                       ('systolic_bp >= 120', 'Elevated'),
+                       ('systolic_bp < 120', 'Normal')],
+        'default': 'Unknown',
+    },
+    'age_group': {'kind': 'bins', 'column': 'age', 'bins': [0, 40, 55, 70, 100],
+                  'labels': ['<40', '40-54', '55-69', '70+'], 'right': True},
+    'bmi_category': {'kind': 'bins', 'column': 'bmi', 'bins': [-np.inf, 18.5, 25.0, 30.0, np.inf],
+                     'labels': ['Underweight', 'Normal', 'Overweight', 'Obese'], 'right': False},
+}
+
+
+def register_feature(name: str, kind: str, definitions: Dict[str, Dict[str, Any]] = None,
+                     **spec) -> None:
+    """
+    Add (or replace) a derived feature in the registry.
+
+    Example:
+        >>> register_feature('pulse_pressure', 'expr', expr='systolic_bp - diastolic_bp')
+    """
+    if kind not in ('expr', 'select', 'bins'):
+        raise ValueError(f'Unsupported feature kind: {kind}')
+    required = {'expr': ['expr'], 'select': ['conditions'], 'bins': ['column', 'bins', 'labels']}[kind]
+    missing = [k for k in required if k not in spec]
+    if missing:
+        raise ValueError(f'Feature {name} is missing: {missing}')
+    (FEATURE_DEFINITIONS if definitions is None else definitions)[name] = dict(spec, kind=kind)
+
+
+def _expr_names(expr: str) -> List[str]:
+    return sorted({n.id for n in ast.walk(ast.parse(expr, mode='eval')) if isinstance(n, ast.Name)})
+
+
+def feature_inputs(spec: Dict[str, Any]) -> List[str]:
+    """
+    Columns (or other features) a feature definition reads.
+    """
+    if spec['kind'] == 'expr':
+        return _expr_names(spec['expr'])
+    if spec['kind'] == 'select':
+        return sorted({n for cond, _ in spec['conditions'] for n in _expr_names(cond)})
+    return [spec['column']]
+
+
+def feature_plan(names: List[str] = None,
+                 definitions: Dict[str, Dict[str, Any]] = None) -> List[List[str]]:
+    """
+    Requested features plus the features they depend on, grouped into levels
+    that only depend on earlier levels.
+    """
+    if definitions is None:
+        definitions = FEATURE_DEFINITIONS
+    names = list(definitions) if names is None else list(names)
+    graph: Dict[str, List[str]] = {}
+    todo = list(names)
+    while todo:
+        name = todo.pop()
+        if name in graph:
+            continue
+        if name not in definitions:
+            raise KeyError(f'Unknown feature: {name}')
+        graph[name] = [d for d in feature_inputs(definitions[name]) if d in definitions]
+        todo.extend(graph[name])
+    try:
+        sorter = graphlib.TopologicalSorter(graph)
+        sorter.prepare()
+    except graphlib.CycleError as e:
+        raise ValueError(f'Circular feature definitions: {e.args[1]}') from None
+    levels = []
+    while sorter.is_active():
+        level = sorted(sorter.get_ready())
+        levels.append(level)
+        sorter.done(*level)
+    return levels
+
+
+def available_features(columns: List[str],
+                       definitions: Dict[str, Dict[str, Any]] = None) -> List[str]:
+    """
+    Registered features whose inputs exist in `columns` (directly or via other features).
+    """
+    if definitions is None:
+        definitions = FEATURE_DEFINITIONS
+    have, found = set(columns), []
+    while True:
+        new = [n for n, spec in definitions.items()
+               if n not in found and set(feature_inputs(spec)) <= have]
+        if not new:
+            return [n for n in definitions if n in found]
+        found.extend(new)
+        have.update(new)
+
+
+def compute_features(df: pd.DataFrame, names: List[str] = None,
+                     definitions: Dict[str, Dict[str, Any]] = None) -> pd.DataFrame:
+    """
+    Add registered features and their dependencies to a copy of df.
+
+    By default every feature whose input columns are present is added.
+    Features only look at their own row, so chunks can be processed
+    independently; bins keep the same categories in every chunk.
+    """
+    if definitions is None:
+        definitions = FEATURE_DEFINITIONS
+    if names is None:
+        names = available_features(df.columns, definitions)
+    out = df.copy()
+    for level in feature_plan(names, definitions):
+        exprs = [n for n in level if definitions[n]['kind'] == 'expr']
+        if exprs:
+            # One multi-line eval: numexpr (when installed) fuses each line
+            # without Python-level temporaries
+            out = out.eval('\n'.join(f'{n} = {definitions[n]["expr"]}' for n in exprs))
+        for name in level:
+            spec = definitions[name]
+            if spec['kind'] == 'select':
+                conditions = [out.eval(cond).to_numpy(dtype=bool) for cond, _ in spec['conditions']]
+                labels = [label for _, label in spec['conditions']]
+                out[name] = np.select(conditions, labels, default=spec.get('default'))
+            elif spec['kind'] == 'bins':
+                out[name] = pd.cut(out[spec['column']], bins=spec['bins'], labels=spec['labels'],
+                                   right=spec.get('right', True), include_lowest=True)
+    return out
+
+
 if __name__ == '__main__':
     print("Data utilities loaded successfully!")
\ No newline at end of file
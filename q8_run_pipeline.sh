@@ -7,7 +7,7 @@ mkdir -p reports
 
 echo "Starting clinical trial data pipeline..." > reports/pipeline_log.txt
 
-# --- Run analysis notebooks in order (q4-q7) ---
+# --- Run the analysis pipeline in order (q4-q7) ---
 
 # 1. q4_exploration.ipynb
 echo "Executing q4_exploration.ipynb..." >> reports/pipeline_log.txt
@@ -15,22 +15,19 @@ jupyter nbconvert --execute --to notebook q4_exploration.ipynb --output q4_execu
 || { echo ">>> ERROR: q4_exploration.ipynb failed. Stopping pipeline." >> reports/pipeline_log.txt; exit 1; }
 echo "q4_exploration.ipynb successfully completed." >> reports/pipeline_log.txt
 
-# 2. q5_missing_data.ipynb
-echo "Executing q5_missing_data.ipynb..." >> reports/pipeline_log.txt
-jupyter nbconvert --execute --to notebook q5_missing_data.ipynb --output q5_executed.ipynb \
-|| { echo ">>> ERROR: q5_missing_data.ipynb failed. Stopping pipeline." >> reports/pipeline_log.txt; exit 1; }
-echo "q5_missing_data.ipynb successfully completed." >> reports/pipeline_log.txt
-
-# 3. q6_transformation.ipynb
-echo "Executing q6_transformation.ipynb..." >> reports/pipeline_log.txt
-jupyter nbconvert --execute --to notebook q6_transformation.ipynb --output q6_executed.ipynb \
-|| { echo ">>> ERROR: q6_transformation.ipynb failed. Stopping pipeline." >> reports/pipeline_log.txt; exit 1; }
-echo "q6_transformation.ipynb successfully completed." >> reports/pipeline_log.txt
-
-# 4. q7_aggregation.ipynb 
-echo "Executing q7_aggregation.ipynb..." >> reports/pipeline_log.txt
-jupyter nbconvert --execute --to notebook q7_aggregation.ipynb --output q7_executed.ipynb \
-|| { echo ">>> ERROR: q7_aggregation.ipynb failed. Stopping pipeline." >> reports/pipeline_log.txt; exit 1; }
-echo "q7_aggregation.ipynb successfully completed." >> reports/pipeline_log.txt
+# 2. q5-q7 outputs from the delta store
+# Only rows that changed since the last run are cleaned and featurized; the
+# q5/q6/q7 files in output/ are then rewritten from the stored state. The
+# q5-q7 notebooks stay for interactive analysis of the same outputs.
+echo "Refreshing output/delta from data/clinical_trial_raw.csv..." >> reports/pipeline_log.txt
+python delta_refresh.py data/clinical_trial_raw.csv output/delta --export output >> reports/pipeline_log.txt \
+|| { echo ">>> ERROR: delta refresh failed. Stopping pipeline." >> reports/pipeline_log.txt; exit 1; }
+echo "Delta refresh successfully completed." >> reports/pipeline_log.txt
+
+# 3. Stratified train/validation/test split of the q6 output
+echo "Splitting output/q6_transformed_data.csv..." >> reports/pipeline_log.txt
+python modeling_split.py output/q6_transformed_data.csv output/q6_splits >> reports/pipeline_log.txt \
+|| { echo ">>> ERROR: modeling split failed. Stopping pipeline." >> reports/pipeline_log.txt; exit 1; }
+echo "Modeling split successfully completed." >> reports/pipeline_log.txt
 
 echo "Pipeline complete!" >> reports/pipeline_log.txt
\ No newline at end of file
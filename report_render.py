@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# Report figure rendering
+# Renders figures from pre-aggregated data in a process pool (Agg backend) and
+# skips PNGs whose inputs have not changed since the last run.
+
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any
+
+import pandas as pd
+
+MANIFEST_NAME = '.render_manifest.json'
+
+# The supported spec keys; render_figures rejects any others with ValueError
+_SPEC_KEYS = {'kind', 'data', 'path', 'title', 'xlabel', 'ylabel', 'figsize', 'rotation', 'cmap'}
+
+
+def spec_hash(spec: Dict[str, Any]) -> str:
+    """
+    Hash a figure spec: the aggregated data (values and labels) plus options.
+    """
+    data = spec['data']
+    h = hashlib.sha256()
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+    h.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    h.update(json.dumps([str(c) for c in data.columns]).encode())
+    opts = {k: v for k, v in spec.items() if k not in ('data', 'path')}
+    h.update(json.dumps(opts, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _load_manifest(directory: str) -> Dict[str, str]:
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_manifest(directory: str, manifest: Dict[str, str]) -> None:
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def _render_one(spec: Dict[str, Any]) -> str:
+    # Runs in a worker process: pick the headless backend before pyplot loads
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    kind = spec.get('kind', 'bar')
+    data = spec['data']
+    fig, ax = plt.subplots(figsize=spec.get('figsize', (10, 6)))
+    if kind in ('bar', 'barh', 'line'):
+        data.plot(kind=kind, ax=ax)
+    elif kind == 'heatmap':
+        im = ax.imshow(data.values, cmap=spec.get('cmap', 'Blues'), aspect='auto')
+        fig.colorbar(im, ax=ax)
+        ax.set_xticks(range(len(data.columns)))
+        ax.set_xticklabels(data.columns)
+        ax.set_yticks(range(len(data.index)))
+        ax.set_yticklabels(data.index)
+    else:
+        plt.close(fig)
+        raise ValueError(f'Unsupported figure kind: {kind}')
+
+    ax.set_title(spec.get('title', ''))
+    if 'xlabel' in spec:
+        ax.set_xlabel(spec['xlabel'])
+    if 'ylabel' in spec:
+        ax.set_ylabel(spec['ylabel'])
+    if 'rotation' in spec:
+        plt.setp(ax.get_xticklabels(), rotation=spec['rotation'])
+    fig.tight_layout()
+    fig.savefig(spec['path'])
+    plt.close(fig)
+    return spec['path']
+
+
+def render_figures(specs: List[Dict[str, Any]], workers: int = None,
+                   force: bool = False) -> Dict[str, List[str]]:
+    """
+    Render figure specs to PNG, in parallel, skipping unchanged figures.
+
+    Each spec is a dict with 'kind' ('bar', 'barh', 'line' or 'heatmap'),
+    'data' (a pre-aggregated Series/DataFrame), 'path' and optional 'title',
+    'xlabel', 'ylabel', 'figsize', 'rotation', 'cmap'. A figure is skipped
+    when its PNG exists and the hash of data + options matches the manifest
+    stored next to it.
+
+    Returns:
+        dict with 'rendered' and 'skipped' lists of paths.
+    """
+    for spec in specs:
+        unknown = set(spec) - _SPEC_KEYS
+        if unknown:
+            raise ValueError(f'Unsupported figure spec key(s): {sorted(unknown)}')
+
+    manifests: Dict[str, Dict[str, str]] = {}
+    todo, skipped, hashes = [], [], {}
+    for spec in specs:
+        directory = os.path.dirname(os.path.abspath(spec['path']))
+        os.makedirs(directory, exist_ok=True)
+        manifest = manifests.setdefault(directory, _load_manifest(directory))
+        name = os.path.basename(spec['path'])
+        digest = spec_hash(spec)
+        hashes[spec['path']] = digest
+        if not force and manifest.get(name) == digest and os.path.exists(spec['path']):
+            skipped.append(spec['path'])
+        else:
+            todo.append(spec)
+
+    if len(todo) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(_render_one, todo))
+    else:
+        rendered = [_render_one(spec) for spec in todo]
+
+    for path in rendered:
+        directory = os.path.dirname(os.path.abspath(path))
+        manifests[directory][os.path.basename(path)] = hashes[path]
+    for directory, manifest in manifests.items():
+        _save_manifest(directory, manifest)
+
+    return {'rendered': rendered, 'skipped': skipped}
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# Result cache for filter_data and summarize_by_group
+# Memoizes results keyed on a dataset fingerprint plus a canonical query spec,
+# with a byte-bounded in-memory LRU and an optional on-disk tier.
+
+import os
+import json
+import pickle
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from q3_data_utils import filter_data, summarize_by_group
+
+
+def dataset_fingerprint(df: pd.DataFrame, sample_rows: int = 256, exact: bool = True) -> str:
+    """
+    Fingerprint a DataFrame from its shape, columns, dtypes and every row.
+
+    exact=False hashes a strided sample of sample_rows rows instead: it costs
+    the same for any frame size but misses edits to rows outside the sample,
+    so use it only for frames that are never modified in place.
+    """
+    h = hashlib.sha256()
+    h.update(repr(df.shape).encode())
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(json.dumps([str(t) for t in df.dtypes]).encode())
+    if len(df):
+        if exact and len(df) > sample_rows:
+            try:
+                h.update(pd.util.hash_pandas_object(df).to_numpy().tobytes())
+                return h.hexdigest()[:32]
+            except TypeError:
+                sample = df  # unhashable cells, e.g. lists: hash their reprs below
+        elif len(df) <= sample_rows:
+            sample = df
+        else:
+            positions = np.linspace(0, len(df) - 1, sample_rows).astype(np.int64)
+            sample = df.iloc[positions]
+        # Hash raw bytes in two blocks; per-column hash_pandas_object calls
+        # would dominate the cost on small samples
+        numeric = sample.select_dtypes(include=['number', 'bool'])
+        h.update(np.ascontiguousarray(numeric.to_numpy(dtype=np.float64)).tobytes())
+        other = sample.drop(columns=numeric.columns)
+        h.update('\x1f'.join(map(str, other.to_numpy().ravel())).encode())
+        h.update('\x1f'.join(map(str, sample.index)).encode())
+    return h.hexdigest()[:32]
+
+
+def canonical_spec(op: str, spec: Any) -> str:
+    """
+    Canonical JSON for a query so equivalent specs share a cache entry.
+
+    Filters are a conjunction, so their order and the order of in_list
+    values do not matter; both are sorted.
+    """
+    if op == 'filter':
+        items = []
+        for f in spec:
+            f = dict(f)
+            if f.get('condition') == 'in_list':
+                f['value'] = sorted(f['value'], key=repr)
+            items.append(json.dumps(f, sort_keys=True, default=str))
+        spec = sorted(items)
+    return json.dumps([op, spec], sort_keys=True, default=str)
+
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    return len(pickle.dumps(value))
+
+
+class ResultCache:
+    """
+    LRU result cache bounded by total bytes, with an optional disk tier.
+
+    Entries written to disk_dir survive the process and are read back on a
+    memory miss. Results are copied on the way in and out so callers cannot
+    mutate cached values. Safe to share between threads.
+
+    fingerprint(df) hashes a frame once and remembers the result for that
+    frame object, so repeated queries on it skip the O(n) hash. After
+    modifying a frame in place, call forget(df) so it is hashed again.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 ** 2, disk_dir: str = None):
+        self.max_bytes = int(max_bytes)
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._entries: 'OrderedDict[str, Any]' = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._fingerprints: Dict[int, Any] = {}
+
+    def fingerprint(self, df: pd.DataFrame) -> str:
+        """
+        dataset_fingerprint(df), computed once per frame object.
+        """
+        entry = self._fingerprints.get(id(df))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        value = dataset_fingerprint(df)
+        key = id(df)
+        ref = weakref.ref(df, lambda _: self._fingerprints.pop(key, None))
+        self._fingerprints[key] = (ref, value)
+        return value
+
+    def forget(self, df: pd.DataFrame) -> None:
+        """
+        Drop the remembered fingerprint of a frame that was modified in place.
+        """
+        self._fingerprints.pop(id(df), None)
+
+    @staticmethod
+    def make_key(fingerprint: str, op: str, spec: Any) -> str:
+        digest = hashlib.sha256(canonical_spec(op, spec).encode()).hexdigest()[:32]
+        return f'{fingerprint}-{digest}'
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f'{key}.pkl')
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[Any]:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key].copy()
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            with open(self._disk_path(key), 'rb') as f:
+                value = pickle.load(f)
+            self.hits += 1
+            self.disk_hits += 1
+            self._store(key, value)
+            return value.copy()
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any) -> None:
+        value = value.copy()
+        with self._lock:
+            self._store(key, value)
+        if self.disk_dir:
+            tmp = self._disk_path(key) + '.tmp'
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._disk_path(key))
+
+    def _store(self, key: str, value: Any) -> None:
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return  # never fits; the disk tier (if any) still holds it
+        if key in self._entries:
+            self.bytes -= self._sizes[key]
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            old, _ = self._entries.popitem(last=False)
+            self.bytes -= self._sizes.pop(old)
+            self.evictions += 1
+
+    def invalidate(self, fingerprint: str = None) -> int:
+        """
+        Drop all entries, or only those for one dataset fingerprint.
+        Returns the number of in-memory entries removed.
+        """
+        with self._lock:
+            keys = [k for k in self._entries if fingerprint is None or k.startswith(f'{fingerprint}-')]
+            for k in keys:
+                del self._entries[k]
+                self.bytes -= self._sizes.pop(k)
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.pkl') and (fingerprint is None or name.startswith(f'{fingerprint}-')):
+                    os.remove(os.path.join(self.disk_dir, name))
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+DEFAULT_CACHE = ResultCache()
+
+
+def cached_filter_data(df: pd.DataFrame, filters: List[Dict[str, Any]],
+                       cache: ResultCache = None, fingerprint: str = None) -> pd.DataFrame:
+    """
+    filter_data() with memoization.
+
+    The key uses cache.fingerprint(df), which hashes each frame object once;
+    or pass a precomputed fingerprint (any version string that changes with
+    the data).
+    """
+    cache = DEFAULT_CACHE if cache is None else cache
+    key = cache.make_key(fingerprint or cache.fingerprint(df), 'filter', filters)
+    result = cache.get(key)
+    if result is None:
+        result = filter_data(df, filters)
+        cache.put(key, result)
+    return result
+
+
+def cached_summarize_by_group(df: pd.DataFrame, group_col: str,
+                              agg_dict: Dict[str, Any] = None, cache: ResultCache = None,
+                              fingerprint: str = None) -> pd.DataFrame:
+    """
+    summarize_by_group() with memoization.
+
+    The key uses cache.fingerprint(df), which hashes each frame object once;
+    or pass a precomputed fingerprint (any version string that changes with
+    the data).
+    """
+    cache = DEFAULT_CACHE if cache is None else cache
+    key = cache.make_key(fingerprint or cache.fingerprint(df), 'summarize',
+                         {'group_col': group_col, 'agg_dict': agg_dict})
+    result = cache.get(key)
+    if result is None:
+        result = summarize_by_group(df, group_col, agg_dict)
+        cache.put(key, result)
+    return result
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# CVD risk scoring
+# Vectorized linear/logistic risk score over cleaned data and the top-K
+# highest-risk patients per group, in memory or streamed chunk by chunk.
+
+import sys
+import heapq
+import argparse
+from typing import List, Dict, Any, Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+from q3_data_utils import clean_data, compute_features, feature_inputs
+from dedup import FingerprintSet, dedup_batch
+import compressed_io
+
+# Illustrative coefficients on the cleaned units (years, mmHg, mg/dL, kg/m2);
+# pass a dict of the same shape to score with a fitted model.
+RISK_MODEL = {
+    'link': 'logistic',
+    'intercept': -9.0,
+    'terms': {'age': 0.06, 'systolic_bp': 0.018, 'total_hdl_ratio': 0.3,
+              'glucose_fasting': 0.008, 'bmi': 0.03},
+    'derived': {'total_hdl_ratio': 'cholesterol_total / cholesterol_hdl'},
+}
+DEFAULT_GROUPS = ['site']
+OUTPUT_COLUMNS = ['patient_id']
+
+
+def model_inputs(model: Dict[str, Any] = None) -> List[str]:
+    """
+    Source columns a model reads, with derived terms expanded.
+    """
+    model = model or RISK_MODEL
+    derived = model.get('derived', {})
+    cols = []
+    for term in model['terms']:
+        cols += feature_inputs({'kind': 'expr', 'expr': derived[term]}) if term in derived else [term]
+    return list(dict.fromkeys(cols))
+
+
+def risk_score(df: pd.DataFrame, model: Dict[str, Any] = None) -> pd.Series:
+    """
+    Score every row in one pass: intercept + X @ coefficients, through the link.
+
+    link 'logistic' gives a probability, 'linear' the raw score. Rows with
+    a missing (or non-finite derived) input score NaN.
+    """
+    model = model or RISK_MODEL
+    if model.get('link', 'logistic') not in ('logistic', 'linear'):
+        raise ValueError("link must be 'logistic' or 'linear'")
+    inputs = model_inputs(model)
+    missing = [c for c in inputs if c not in df.columns]
+    if missing:
+        raise KeyError(f'Risk model input column(s) not found: {missing}')
+    frame = df[inputs]
+    derived = model.get('derived', {})
+    if derived:
+        definitions = {name: {'kind': 'expr', 'expr': expr} for name, expr in derived.items()}
+        frame = compute_features(frame, list(derived), definitions)
+    terms = list(model['terms'])
+    X = frame[terms].to_numpy(dtype=np.float64)
+    X[~np.isfinite(X)] = np.nan
+    z = model.get('intercept', 0.0) + X @ np.array([model['terms'][t] for t in terms])
+    if model.get('link', 'logistic') == 'logistic':
+        z = 1.0 / (1.0 + np.exp(-z))
+    return pd.Series(z, index=df.index, name='risk_score')
+
+
+def _group_codes(df: pd.DataFrame, group_cols: List[str]) -> np.ndarray:
+    # One integer per group combination; rows with a missing group key get -1
+    codes = np.zeros(len(df), dtype=np.int64)
+    valid = np.ones(len(df), dtype=bool)
+    for col in group_cols:
+        level, labels = pd.factorize(df[col])
+        valid &= level >= 0
+        codes = codes * max(len(labels), 1) + level
+    return np.where(valid, codes, -1)
+
+
+def _top_positions(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k highest scores, best first; ties keep the earlier row.
+
+    argpartition finds the k-th score in linear time; only the rows at or
+    above it are ordered.
+    """
+    if len(scores) > k:
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(len(scores))
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:k]]
+
+
+def _top_k_rows(scores: np.ndarray, codes: np.ndarray, k: int):
+    """
+    (row positions, ranks) of the top k scores within each group code.
+
+    Rows are bucketed into contiguous group segments with a stable integer
+    sort of the codes, and each segment is reduced with argpartition, so no
+    group is fully sorted by score. Rows with a NaN score or code -1 are skipped.
+    """
+    keep = np.flatnonzero((codes >= 0) & ~np.isnan(scores))
+    order = keep[np.argsort(codes[keep], kind='stable')]
+    picked, ranks = [np.array([], dtype=np.int64)], [np.array([], dtype=np.int64)]
+    if len(order):
+        for segment in np.split(order, np.flatnonzero(np.diff(codes[order])) + 1):
+            top = segment[_top_positions(scores[segment], k)]
+            picked.append(top)
+            ranks.append(np.arange(1, len(top) + 1))
+    return np.concatenate(picked), np.concatenate(ranks)
+
+
+def _output_columns(df: pd.DataFrame, group_cols: List[str], columns: List[str],
+                    model: Dict[str, Any]) -> List[str]:
+    if columns is None:
+        columns = [c for c in OUTPUT_COLUMNS if c in df.columns] + model_inputs(model)
+    return list(dict.fromkeys(group_cols + [c for c in columns if c not in ('risk_score', 'rank')]))
+
+
+def _selected(df: pd.DataFrame, k: int, group_cols: List[str], model: Dict[str, Any],
+              columns: List[str]):
+    if k < 1:
+        raise ValueError('k must be at least 1')
+    missing = [c for c in group_cols if c not in df.columns]
+    if missing:
+        raise KeyError(f'Group column(s) not found: {missing}')
+    scores = risk_score(df, model).to_numpy()
+    rows, ranks = _top_k_rows(scores, _group_codes(df, group_cols), k)
+    out = df.iloc[rows][_output_columns(df, group_cols, columns, model)].reset_index(drop=True)
+    out['risk_score'] = scores[rows]
+    out['rank'] = ranks
+    return out, rows
+
+
+def top_k_by_group(df: pd.DataFrame, k: int = 10, group_cols: List[str] = None,
+                   model: Dict[str, Any] = None, columns: List[str] = None) -> pd.DataFrame:
+    """
+    The k highest-risk patients in every group, with risk_score and rank (1 = highest).
+
+    Ties keep the earlier row. Rows with a missing score or group key are
+    skipped. Output is ordered by group, then rank.
+    """
+    group_cols = DEFAULT_GROUPS if group_cols is None else list(group_cols)
+    out, _ = _selected(df, k, group_cols, model, columns)
+    return out.sort_values(group_cols + ['rank'], kind='stable').reset_index(drop=True)
+
+
+class TopKAccumulator:
+    """
+    Streaming top-K per group: a bounded min-heap of at most k rows per group.
+
+    Each chunk is first reduced to its own per-group top-K (vectorized), so
+    only those candidates touch the heaps. The result equals top_k_by_group()
+    on the concatenated chunks, ties included (the earlier row wins).
+    """
+
+    def __init__(self, k: int = 10, group_cols: List[str] = None, model: Dict[str, Any] = None,
+                 columns: List[str] = None):
+        self.k = k
+        self.group_cols = DEFAULT_GROUPS if group_cols is None else list(group_cols)
+        self.model = model or RISK_MODEL
+        self.columns = columns
+        self.rows_seen = 0
+        self._heaps: Dict[tuple, list] = {}
+        self._out_columns: List[str] = None
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        top, rows = _selected(chunk, self.k, self.group_cols, self.model, self.columns)
+        top = top.drop(columns='rank')
+        if self._out_columns is None:
+            self._out_columns = list(top.columns)
+        keys = top[self.group_cols].itertuples(index=False, name=None)
+        # (score, -row number in the stream): the heap root is the entry to evict
+        for key, score, seq, record in zip(keys, top['risk_score'], self.rows_seen + rows,
+                                           top.itertuples(index=False, name=None)):
+            entry = (score, -int(seq), record)
+            heap = self._heaps.setdefault(key, [])
+            if len(heap) < self.k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+        self.rows_seen += len(chunk)
+
+    def result(self) -> pd.DataFrame:
+        records, ranks = [], []
+        for heap in self._heaps.values():
+            best = sorted(heap, key=lambda e: (-e[0], -e[1]))
+            records += [e[2] for e in best]
+            ranks += range(1, len(best) + 1)
+        out = pd.DataFrame(records, columns=self._out_columns)
+        out['rank'] = np.asarray(ranks, dtype=np.int64)
+        return out.sort_values(self.group_cols + ['rank'], kind='stable').reset_index(drop=True)
+
+
+def top_k_stream(source: Union[str, Iterable[pd.DataFrame]], k: int = 10,
+                 group_cols: List[str] = None, model: Dict[str, Any] = None,
+                 columns: List[str] = None, chunksize: int = 200_000,
+                 clean: bool = True) -> pd.DataFrame:
+    """
+    Top-K per group over a raw extract (path) or an iterable of chunks.
+
+    For a path, chunks are deduplicated across the stream and cleaned, as in
+    a single clean_data() call, before scoring.
+    """
+    if isinstance(source, str):
+        chunks = compressed_io.read_csv(source, chunksize=chunksize)
+    else:
+        chunks = source
+    acc = TopKAccumulator(k, group_cols, model, columns)
+    seen = FingerprintSet()
+    for chunk in chunks:
+        if clean:
+            chunk = dedup_batch(chunk, list(chunk.columns), seen=seen)
+            chunk = clean_data(chunk, remove_duplicates=False)
+        acc.update(chunk)
+    return acc.result()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Highest-risk patients per group.')
+    parser.add_argument('filepath', help='Raw extract (cleaned on the fly)')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--by', nargs='+', default=DEFAULT_GROUPS, help='Group columns')
+    parser.add_argument('--chunksize', type=int, default=200_000)
+    parser.add_argument('-o', '--output', help='Output CSV (default: print)')
+    args = parser.parse_args(argv)
+
+    try:
+        top = top_k_stream(args.filepath, args.k, args.by, chunksize=args.chunksize)
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        print(f'ERROR: {e}', file=sys.stderr)
+        return 1
+    if args.output:
+        compressed_io.write_csv(top, args.output)
+        print(f'Wrote {len(top)} rows to {args.output}')
+    else:
+        print(top.to_string())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+# Raw extract schema
+# Column names shared by the validators and the CLI. Kept free of heavy
+# imports so light-weight commands can use it without loading pandas.
+
+EXPECTED_COLUMNS = [
+    'patient_id', 'age', 'sex', 'bmi', 'enrollment_date', 'systolic_bp', 'diastolic_bp',
+    'cholesterol_total', 'cholesterol_hdl', 'cholesterol_ldl', 'glucose_fasting',
+    'site', 'intervention_group', 'follow_up_months', 'adverse_events', 'outcome_cvd',
+    'adherence_pct', 'dropout',
+]
+
+DATE_COLUMNS = ['enrollment_date']
@@ -0,0 +1,52 @@
+import sys
+import time
+import shutil
+import tempfile
+from pathlib import Path
+repo_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(repo_root))
+import pandas as pd
+import compressed_io
+
+# Ingest throughput for raw, gzip and zstd extracts. The sample extract is
+# replicated to COPIES x 10,000 rows; throughput is uncompressed MB/s.
+COPIES = 50
+RUNS = 3
+
+raw = pd.read_csv(repo_root / 'data' / 'clinical_trial_raw.csv')
+big = pd.concat([raw] * COPIES, ignore_index=True)
+
+tmp = Path(tempfile.mkdtemp())
+try:
+    paths = {'raw': tmp / 'extract.csv', 'gzip': tmp / 'extract.csv.gz', 'zstd': tmp / 'extract.csv.zst'}
+    for name, path in list(paths.items()):
+        try:
+            compressed_io.write_csv(big, str(path))
+        except ImportError as e:
+            print(f'{name}: skipped ({e})')
+            del paths[name]
+    size_mb = paths['raw'].stat().st_size / 1e6
+
+    cases = [('raw (pandas)', lambda: pd.read_csv(paths['raw']))]
+    for name in ['gzip', 'zstd']:
+        if name in paths:
+            p = str(paths[name])
+            cases += [(f'{name} (pandas inline)', lambda p=p: pd.read_csv(p)),
+                      (f'{name} (threaded)', lambda p=p: compressed_io.read_csv(p, threaded=True))]
+
+    out = [f'{len(big)} rows, {size_mb:.1f} MB uncompressed']
+    for name in paths:
+        out.append(f'  {name:<5} on disk: {paths[name].stat().st_size / 1e6:6.1f} MB')
+    for name, load in cases:
+        times = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            df = load()
+            times.append(time.perf_counter() - start)
+        assert len(df) == len(big)
+        best = min(times)
+        out.append(f'{name:<22} {best * 1000:8.1f} ms  {size_mb / best:7.1f} MB/s')
+finally:
+    shutil.rmtree(tmp)
+
+print('\n'.join(out))
@@ -0,0 +1,30 @@
+import sys
+import time
+import statistics
+import subprocess
+from pathlib import Path
+repo_root = Path(__file__).resolve().parent.parent
+
+# Cold-start timings for the clinical CLI. Each invocation is a fresh
+# interpreter, so the numbers include Python start-up and all imports.
+RUNS = 10
+DATA = str(repo_root / 'data' / 'clinical_trial_raw.csv')
+CLI = str(repo_root / 'clinical.py')
+
+cases = [
+    ('python -c pass (baseline)', [sys.executable, '-c', 'pass']),
+    ('clinical --help', [sys.executable, CLI, '--help']),
+    ('clinical check', [sys.executable, CLI, 'check', DATA]),
+    ('clinical load', [sys.executable, CLI, 'load', DATA]),
+]
+
+out = []
+for name, cmd in cases:
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=repo_root, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    out.append(f'{name:<28} median {statistics.median(times):7.1f} ms   min {min(times):7.1f} ms')
+
+print('\n'.join(out))
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# Shared-memory worker pool
+# Publishes a DataFrame's columns once into multiprocessing.shared_memory so
+# worker processes attach to them without copies; tasks send back small results.
+#
+# Numeric, boolean and datetime columns are shared as their values; text and
+# categorical columns as integer codes into a sorted list of categories.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from q3_data_utils import summarize_by_group
+
+# Per-process view of the published frame, set by the pool initializer
+_VIEW = None
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _column_layout(s: pd.Series) -> Dict[str, Any]:
+    # (array to publish, how to rebuild the column from it)
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return {'array': s.cat.codes.to_numpy(), 'kind': 'codes',
+                'categories': s.cat.categories, 'dtype': s.dtype}
+    if isinstance(s.dtype, np.dtype) and s.dtype.kind in 'iufbmM':
+        return {'array': s.to_numpy(), 'kind': 'values', 'dtype': s.dtype}
+    if pd.api.types.is_numeric_dtype(s):
+        # Nullable extension numerics are shared as float64 with NaN
+        return {'array': s.to_numpy(dtype=np.float64, na_value=np.nan), 'kind': 'values',
+                'dtype': np.dtype(np.float64)}
+    codes, categories = pd.factorize(s, sort=True)
+    codes = codes.astype(np.int32 if len(categories) < 2 ** 31 else np.int64)
+    return {'array': codes, 'kind': 'codes', 'categories': categories.astype(s.dtype).array,
+            'dtype': s.dtype}
+
+
+def _decode(codes: np.ndarray, meta: Dict[str, Any], index: pd.Index = None,
+            name: str = None) -> pd.Series:
+    if isinstance(meta['dtype'], pd.CategoricalDtype):
+        values = pd.Categorical.from_codes(codes, dtype=meta['dtype'])
+    else:
+        values = pd.api.extensions.take(meta['categories'], codes, allow_fill=True)
+    # explicit dtype: pandas would otherwise infer str for object columns
+    return pd.Series(values, index=index, name=name, dtype=meta['dtype'])
+
+
+class SharedView:
+    """
+    Read-only, zero-copy view of a published frame inside a process.
+    """
+
+    def __init__(self, spec: Dict[str, Dict[str, Any]]):
+        self.spec = spec
+        self._blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.spec)
+
+    def __len__(self) -> int:
+        return next(iter(self.spec.values()))['length'] if self.spec else 0
+
+    def array(self, column: str) -> np.ndarray:
+        """
+        The shared values (or category codes) of a column, without copying.
+        """
+        if column not in self.spec:
+            raise KeyError(f'Column not published: {column}')
+        if column not in self._arrays:
+            meta = self.spec[column]
+            block = self._blocks[column] = _attach(meta['block'])
+            arr = np.ndarray(meta['length'], dtype=meta['array_dtype'], buffer=block.buf)
+            arr.flags.writeable = False
+            self._arrays[column] = arr
+        return self._arrays[column]
+
+    def is_coded(self, column: str) -> bool:
+        return self.spec[column]['kind'] == 'codes'
+
+    def column(self, column: str, rows: np.ndarray = None) -> pd.Series:
+        """
+        A column as a Series with its original dtype; optionally only `rows`.
+
+        Value columns without `rows` are zero-copy; coded columns are decoded
+        (a copy of the rows asked for).
+        """
+        arr = self.array(column)
+        if rows is not None:
+            arr = arr[rows]
+        if self.is_coded(column):
+            return _decode(arr, self.spec[column], name=column)
+        return pd.Series(arr, name=column, copy=False)
+
+    def frame(self, columns: List[str] = None, rows: np.ndarray = None) -> pd.DataFrame:
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({c: self.column(c, rows) for c in columns})
+
+    def close(self) -> None:
+        self._arrays.clear()
+        for block in self._blocks.values():
+            block.close()
+        self._blocks.clear()
+
+
+class SharedFrame:
+    """
+    Owner of the shared-memory blocks holding a frame's columns.
+
+    The picklable `spec` (block names, dtypes, categories) is all a worker
+    needs to attach. Blocks are unlinked by close().
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: List[str] = None):
+        columns = list(df.columns if columns is None else columns)
+        missing = [c for c in columns if c not in df.columns]
+        if missing:
+            raise KeyError(f'Column(s) not found: {missing}')
+        self.spec: Dict[str, Dict[str, Any]] = {}
+        self._blocks: List[shared_memory.SharedMemory] = []
+        try:
+            for col in columns:
+                layout = _column_layout(df[col])
+                arr = np.ascontiguousarray(layout.pop('array'))
+                block = self.allocate(arr.dtype, len(arr))
+                np.ndarray(len(arr), dtype=arr.dtype, buffer=block.buf)[:] = arr
+                self.spec[col] = dict(layout, block=block.name, length=len(arr),
+                                      array_dtype=arr.dtype)
+        except BaseException:
+            self.close()
+            raise
+        self.view = SharedView(self.spec)
+
+    def allocate(self, dtype: np.dtype, length: int) -> shared_memory.SharedMemory:
+        """
+        A new block owned (and unlinked) by this frame, e.g. for task outputs.
+        """
+        block = shared_memory.SharedMemory(create=True, size=max(1, np.dtype(dtype).itemsize * length))
+        self._blocks.append(block)
+        return block
+
+    def release(self, block: shared_memory.SharedMemory) -> None:
+        """
+        Close and unlink a block from allocate() before the frame is closed.
+        """
+        self._blocks.remove(block)
+        try:
+            block.close()
+        except BufferError:
+            pass
+        block.unlink()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.size for b in self._blocks)
+
+    def close(self) -> None:
+        if getattr(self, 'view', None) is not None:
+            self.view.close()
+        for block in self._blocks:
+            try:
+                block.close()
+            except BufferError:
+                pass  # a caller still holds a view; freed once it is dropped
+            block.unlink()
+        self._blocks.clear()
+
+    def __enter__(self) -> 'SharedFrame':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _init_worker(spec: Dict[str, Dict[str, Any]]) -> None:
+    global _VIEW
+    _VIEW = SharedView(spec)
+
+
+def _call(func: Callable, task: Any) -> Any:
+    return func(_VIEW, task)
+
+
+def _summarize_task(view: SharedView, task) -> pd.DataFrame:
+    group_col, agg_dict, keys = task
+    group = view.array(group_col)
+    rows = np.flatnonzero(np.isin(group, keys))
+    value_cols = [c for c in (agg_dict or {}) if c != group_col]
+    frame = view.frame(value_cols, rows)
+    frame.insert(0, group_col, group[rows])
+    return summarize_by_group(frame, group_col, agg_dict)
+
+
+def _fill_task(view: SharedView, task) -> Any:
+    column, strategy, block_name = task
+    arr = view.array(column)
+    missing = arr < 0 if view.is_coded(column) else pd.isna(arr)
+    block = _attach(block_name)
+    out = np.ndarray(len(arr), dtype=arr.dtype, buffer=block.buf)
+    value = None
+    if strategy == 'ffill':
+        # index of the last non-missing value at or before each row
+        out[:] = arr[np.maximum.accumulate(np.where(missing, 0, np.arange(len(arr))))]
+    else:
+        s = view.column(column)
+        value = s.dropna().mean() if strategy == 'mean' else s.dropna().median()
+        out[:] = arr
+        if not pd.isna(value) and missing.any():
+            out[missing] = value
+    del out
+    block.close()
+    return value
+
+
+class SharedPool:
+    """
+    Process pool whose workers share one published copy of a frame.
+
+    Columns are published once on entry; every task receives only a small
+    description of its work and returns a small result, so neither the frame
+    nor per-worker copies of it are pickled. workers=1 runs tasks inline
+    over the same shared view.
+
+    Usage:
+        with SharedPool(df, workers=4) as pool:
+            by_site = pool.summarize_by_group('site', {'age': 'mean'})
+            filled = pool.fill_missing(['age', 'bmi'], 'median')
+    """
+
+    def __init__(self, df: pd.DataFrame, workers: int = None, columns: List[str] = None):
+        self.df = df
+        self.workers = workers or os.cpu_count() or 1
+        self.frame = SharedFrame(df, columns)
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self.frame.spec,))
+
+    def map(self, func: Callable[[SharedView, Any], Any], tasks: List[Any]) -> List[Any]:
+        """
+        [func(view, task) for task in tasks], in the worker processes.
+
+        func must be a module-level function; it receives the worker's
+        SharedView of the published frame.
+        """
+        tasks = list(tasks)
+        if self._executor is None or len(tasks) < 2:
+            return [func(self.frame.view, t) for t in tasks]
+        return list(self._executor.map(_call, [func] * len(tasks), tasks))
+
+    def _buckets(self, keys: np.ndarray, sizes: np.ndarray) -> List[np.ndarray]:
+        # Largest groups first, each to the currently lightest bucket
+        n = min(self.workers, len(keys))
+        loads, buckets = np.zeros(n), [[] for _ in range(n)]
+        for i in np.argsort(-sizes, kind='stable'):
+            b = int(np.argmin(loads))
+            buckets[b].append(keys[i])
+            loads[b] += sizes[i]
+        return [np.sort(np.array(b, dtype=keys.dtype)) for b in buckets]
+
+    def summarize_by_group(self, group_col: str,
+                           agg_dict: Dict[str, Any] = None) -> pd.DataFrame:
+        """
+        summarize_by_group() with the groups split across workers.
+
+        Each worker aggregates whole groups, so every aggregation (median,
+        nunique, ...) is exact; the result equals the single-process call.
+        """
+        if group_col not in self.frame.spec:
+            raise KeyError(f'Group column not found: {group_col}')
+        for col in agg_dict or {}:
+            if col not in self.frame.spec:
+                raise KeyError(f'Column not found: {col}')
+        view = self.frame.view
+        group = view.array(group_col)
+        coded = view.is_coded(group_col)
+        present = group[group >= 0] if coded else group[~pd.isna(group)]
+        keys, sizes = np.unique(present, return_counts=True)
+        if not len(keys):
+            value_cols = [c for c in agg_dict or {} if c != group_col]
+            empty = view.frame([group_col] + value_cols, np.array([], dtype=np.int64))
+            return summarize_by_group(empty, group_col, agg_dict)
+
+        tasks = [(group_col, agg_dict, b) for b in self._buckets(keys, sizes)]
+        parts = self.map(_summarize_task, tasks)
+        # Codes follow the sorted category order, so sorting codes sorts labels
+        out = pd.concat(parts, ignore_index=True).sort_values(group_col, kind='stable')
+        out = out.reset_index(drop=True)
+        if coded:
+            labels = _decode(out[group_col].to_numpy(), self.frame.spec[group_col])
+            # rebuild the keys as groupby does (it infers str for object labels)
+            out[group_col] = pd.Index(labels.to_numpy() if labels.dtype == object else labels.array)
+        return out
+
+    def fill_missing(self, columns: List[str], strategy: str = 'mean') -> pd.DataFrame:
+        """
+        fill_missing() over several columns at once, one column per task.
+
+        Workers write the filled columns into shared output blocks; only the
+        fill values travel back (kept in df.attrs['fill_values']).
+        """
+        if strategy not in ('mean', 'median', 'ffill'):
+            raise ValueError('Unsupported strategy: choose mean, median, or ffill')
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        for col in columns:
+            if col not in self.frame.spec:
+                raise KeyError(f'Column not found: {col}')
+            if strategy != 'ffill' and not pd.api.types.is_numeric_dtype(self.df[col]):
+                raise TypeError(f"Cannot use '{strategy}' on non-numeric column: {col}")
+
+        view = self.frame.view
+        outputs = {}
+        try:
+            for col in columns:
+                outputs[col] = self.frame.allocate(view.array(col).dtype, len(view))
+            values = self.map(_fill_task, [(c, strategy, outputs[c].name) for c in columns])
+
+            out = self.df.copy()
+            for col in columns:
+                arr = np.ndarray(len(view), dtype=view.array(col).dtype, buffer=outputs[col].buf).copy()
+                out[col] = _decode(arr, self.frame.spec[col], out.index) if view.is_coded(col) else arr
+        finally:
+            # The results are copies, so the output blocks can go now rather
+            # than accumulate until the pool is closed
+            for block in outputs.values():
+                self.frame.release(block)
+        out.attrs['fill_values'] = dict(zip(columns, values))
+        return out
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.frame.close()
+
+    def __enter__(self) -> 'SharedPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
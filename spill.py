@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# Spill-to-disk aggregation and sorting
+# Out-of-core versions of summarize_by_group and sort_data for inputs whose
+# working set exceeds the memory budget (see q3_data_utils.set_memory_budget).
+#
+# Spilled data lives in a temporary directory removed when the operation ends:
+#   part-<n>.pkl   hash partition of the grouping key, a sequence of pickled chunks
+#   run-<n>.pkl    sorted run, a sequence of pickled blocks in sort order
+
+import os
+import sys
+import pickle
+import argparse
+import tempfile
+from typing import List, Dict, Any, Iterable, Iterator, Union
+
+import numpy as np
+import pandas as pd
+
+from q3_data_utils import (get_memory_budget, parse_size, estimate_row_bytes, auto_chunksize,
+                           MEMORY_OVERHEAD, _group_summary)
+import compressed_io
+
+FANOUT = 16          # partitions per split / runs per merge pass
+MAX_DEPTH = 3        # repartitioning levels before a partition is aggregated as is
+SEQ_COLUMN = '_spill_seq'
+
+
+def _budget(budget: Union[int, str, None]) -> int:
+    budget = get_memory_budget() if budget is None else parse_size(budget)
+    if budget is None:
+        raise ValueError('No memory budget set (set_memory_budget or $CLINICAL_MEMORY_BUDGET)')
+    return budget
+
+
+def _chunks(source: Union[str, pd.DataFrame, Iterable[pd.DataFrame]], budget: int,
+            columns: List[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    The source (CSV path, DataFrame or iterable of chunks) in chunks sized to the budget.
+    """
+    if isinstance(source, pd.DataFrame):
+        frame = source if columns is None else source[columns]
+        rows = auto_chunksize(estimate_row_bytes(frame.head(10_000)), budget)
+        for start in range(0, len(frame), rows):
+            yield frame.iloc[start:start + rows]
+    elif isinstance(source, str):
+        sample = compressed_io.read_csv(source, nrows=10_000, usecols=columns)
+        rows = auto_chunksize(estimate_row_bytes(sample), budget)
+        yield from compressed_io.read_csv(source, chunksize=rows, usecols=columns)
+    else:
+        yield from source
+
+
+def _write(handle, frame: pd.DataFrame) -> None:
+    pickle.dump(frame, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read(path: str) -> Iterator[pd.DataFrame]:
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+# --- External hash aggregation ---
+
+def _hash_key(key: pd.Series) -> pd.Series:
+    # CSV chunks infer dtypes independently: an integer key with blanks in
+    # only some chunks reads as int64 in some and float64 in others, and the
+    # two hash differently (likewise bool vs object once a blank appears).
+    # Numeric keys are hashed as float64 and bools as objects, so a value
+    # lands in the same partition whatever its chunk's dtype.
+    if pd.api.types.is_bool_dtype(key):
+        return key.astype(object)
+    if pd.api.types.is_numeric_dtype(key):
+        return key.astype(np.float64)
+    return key
+
+
+def _partition(chunks: Iterable[pd.DataFrame], group_col: str, parts: int, tmp_dir: str,
+               depth: int) -> List[Dict[str, Any]]:
+    """
+    Spill chunks into `parts` files by a hash of the group key.
+
+    Every group lands whole in one partition; the hash key differs per
+    depth so a repartition splits what the previous level put together.
+    """
+    paths = [os.path.join(tmp_dir, f'part-{depth}-{n}.pkl') for n in range(parts)]
+    stats = [{'path': p, 'rows': 0, 'bytes': 0.0, 'keys': set()} for p in paths]
+    handles = [None] * parts
+    try:
+        for chunk in chunks:
+            if group_col not in chunk.columns:
+                raise KeyError(f'Group column not found: {group_col}')
+            hashes = pd.util.hash_pandas_object(_hash_key(chunk[group_col]), index=False,
+                                                hash_key=f'spill-level-{depth:04d}')
+            bucket = (hashes.to_numpy() % np.uint64(parts)).astype(np.int64)
+            for n in np.unique(bucket):
+                part = chunk[bucket == n]
+                if handles[n] is None:
+                    handles[n] = open(paths[n], 'wb')
+                _write(handles[n], part)
+                stats[n]['rows'] += len(part)
+                stats[n]['bytes'] += estimate_row_bytes(part) * len(part)
+                if len(stats[n]['keys']) < 2:
+                    stats[n]['keys'].update(part[group_col].dropna().unique()[:2].tolist())
+    finally:
+        for handle in handles:
+            if handle is not None:
+                handle.close()
+    return [s for s in stats if s['rows']]
+
+
+def _aggregate(chunks: Iterable[pd.DataFrame], group_col: str, agg_dict: Dict[str, Any],
+               budget: int, parts: int, tmp_dir: str, depth: int) -> List[pd.DataFrame]:
+    results = []
+    for part in _partition(chunks, group_col, parts, tmp_dir, depth):
+        too_big = part['bytes'] * MEMORY_OVERHEAD > budget
+        if too_big and depth < MAX_DEPTH and len(part['keys']) > 1:
+            results += _aggregate(_read(part['path']), group_col, agg_dict, budget, FANOUT,
+                                  tmp_dir, depth + 1)
+        else:
+            frames = list(_read(part['path']))
+            results.append(_group_summary(pd.concat(frames, ignore_index=True), group_col, agg_dict))
+        os.remove(part['path'])
+    return results
+
+
+def external_summarize(source: Union[str, pd.DataFrame, Iterable[pd.DataFrame]], group_col: str,
+                       agg_dict: Dict[str, Union[str, List[str]]] = None,
+                       budget: Union[int, str] = None, tmp_dir: str = None,
+                       partitions: int = None) -> pd.DataFrame:
+    """
+    summarize_by_group() for inputs whose grouping does not fit the memory budget.
+
+    Rows are hash-partitioned on the group key into spill files, each
+    partition is aggregated in memory (a partition still over budget is
+    split again), and the per-partition results are concatenated. Any
+    aggregation works, since each group is aggregated whole. Output is
+    sorted by the group column, as groupby would.
+    """
+    budget = _budget(budget)
+    columns = list(dict.fromkeys([group_col] + list(agg_dict or {})))
+    if isinstance(source, pd.DataFrame):
+        missing = [c for c in columns if c not in source.columns]
+        if missing:
+            raise KeyError(f'Column(s) not found: {missing}')
+        if partitions is None:
+            size = estimate_row_bytes(source[columns].head(10_000)) * len(source)
+            partitions = int(np.clip(np.ceil(size * MEMORY_OVERHEAD / budget), 2, 256))
+    with tempfile.TemporaryDirectory(prefix='spill-', dir=tmp_dir) as tmp:
+        results = _aggregate(_chunks(source, budget, columns), group_col, agg_dict, budget,
+                             partitions or FANOUT, tmp, 0)
+    if not results:
+        return _group_summary(pd.DataFrame(columns=columns), group_col, agg_dict)
+    out = pd.concat(results, ignore_index=True)
+    return out.sort_values(group_col, kind='stable').reset_index(drop=True)
+
+
+# --- External merge sort ---
+
+def _sort_keys(by: List[str], ascending: Union[bool, List[bool]]):
+    ascending = [ascending] * len(by) if isinstance(ascending, bool) else list(ascending)
+    if len(ascending) != len(by):
+        raise ValueError('ascending must be a bool or one per sort column')
+    # The input row number breaks ties, which makes the merge stable
+    return by + [SEQ_COLUMN], ascending + [True]
+
+
+def _sorted(frame: pd.DataFrame, keys: List[str], ascending: List[bool]) -> pd.DataFrame:
+    return frame.sort_values(keys, ascending=ascending, na_position='last').reset_index(drop=True)
+
+
+def _write_run(blocks: Iterable[pd.DataFrame], path: str, block_rows: int) -> None:
+    with open(path, 'wb') as f:
+        for block in blocks:
+            for start in range(0, len(block), block_rows):
+                _write(f, block.iloc[start:start + block_rows])
+
+
+def _merge(runs: List[str], keys: List[str], ascending: List[bool]) -> Iterator[pd.DataFrame]:
+    """
+    k-way merge of sorted runs, one block per run in memory at a time.
+
+    After each sort of the loaded rows, everything up to the smallest "last
+    loaded row" of the runs with blocks left is final: no unread row can
+    sort before it. That prefix is emitted and the run it came from is
+    advanced by one block.
+    """
+    readers = [_read(path) for path in runs]
+    carry = []
+    last = {}
+    for n, reader in enumerate(readers):
+        block = next(reader, None)
+        if block is not None:
+            carry.append(block)
+            last[n] = block[SEQ_COLUMN].iat[-1]
+    pending = dict(last)
+    while carry:
+        frame = _sorted(pd.concat(carry, ignore_index=True), keys, ascending)
+        if not pending:
+            yield frame
+            return
+        seq = frame[SEQ_COLUMN].to_numpy()
+        positions = {n: int(np.flatnonzero(seq == s)[0]) for n, s in pending.items()}
+        run = min(positions, key=positions.get)
+        cut = positions[run] + 1
+        yield frame.iloc[:cut]
+        carry = [frame.iloc[cut:]]
+        block = next(readers[run], None)
+        if block is None:
+            del pending[run]
+        else:
+            carry.append(block)
+            pending[run] = block[SEQ_COLUMN].iat[-1]
+
+
+def external_sort(source: Union[str, pd.DataFrame, Iterable[pd.DataFrame]],
+                  by: Union[str, List[str]], ascending: Union[bool, List[bool]] = True,
+                  budget: Union[int, str] = None, tmp_dir: str = None) -> Iterator[pd.DataFrame]:
+    """
+    Sorted chunks of the source, for inputs that do not fit the memory budget.
+
+    Budget-sized chunks are sorted into runs on disk, merged FANOUT at a
+    time until at most FANOUT remain, and the last merge is streamed. The
+    order is that of a stable sort_values with missing values last.
+    """
+    budget = _budget(budget)
+    by = [by] if isinstance(by, str) else list(by)
+    keys, ascending = _sort_keys(by, ascending)
+    with tempfile.TemporaryDirectory(prefix='spill-', dir=tmp_dir) as tmp:
+        runs, seq, block_rows, empty = [], 0, None, None
+        for chunk in _chunks(source, budget):
+            empty = chunk.iloc[:0]
+            missing = [c for c in by if c not in chunk.columns]
+            if missing:
+                raise KeyError(f'Sort column(s) not found: {missing}')
+            if block_rows is None:
+                block_rows = max(1, auto_chunksize(estimate_row_bytes(chunk), budget) // FANOUT)
+            chunk = chunk.assign(**{SEQ_COLUMN: np.arange(seq, seq + len(chunk))})
+            seq += len(chunk)
+            path = os.path.join(tmp, f'run-{len(runs)}.pkl')
+            _write_run([_sorted(chunk, keys, ascending)], path, block_rows)
+            runs.append(path)
+        if not seq and empty is not None:
+            yield empty
+            return
+        while len(runs) > FANOUT:
+            merged = []
+            for start in range(0, len(runs), FANOUT):
+                group = runs[start:start + FANOUT]
+                path = os.path.join(tmp, f'run-{len(runs)}-{start}.pkl')
+                _write_run(_merge(group, keys, ascending), path, block_rows)
+                for old in group:
+                    os.remove(old)
+                merged.append(path)
+            runs = merged
+        for block in _merge(runs, keys, ascending):
+            yield block.drop(columns=SEQ_COLUMN)
+
+
+def sort_to_csv(source: Union[str, pd.DataFrame], output: str, by: Union[str, List[str]],
+                ascending: Union[bool, List[bool]] = True, budget: Union[int, str] = None,
+                tmp_dir: str = None) -> int:
+    """
+    Write the sorted source to an uncompressed CSV without holding it in memory; returns the row count.
+    """
+    rows = 0
+    with open(output, 'w', newline='') as f:
+        for block in external_sort(source, by, ascending, budget, tmp_dir):
+            block.to_csv(f, header=rows == 0, index=False)
+            rows += len(block)
+    return rows
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Sort a CSV larger than memory.')
+    parser.add_argument('source')
+    parser.add_argument('output')
+    parser.add_argument('--by', nargs='+', required=True, help='Sort columns')
+    parser.add_argument('--descending', action='store_true')
+    parser.add_argument('--budget', default='512MB', help="Memory budget, e.g. '512MB'")
+    parser.add_argument('--tmp-dir', help='Directory for spill files (default: system temp)')
+    args = parser.parse_args(argv)
+
+    try:
+        rows = sort_to_csv(args.source, args.output, args.by, not args.descending,
+                           args.budget, args.tmp_dir)
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        print(f'ERROR: {e}', file=sys.stderr)
+        return 1
+    print(f'Sorted {rows} rows -> {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from approx import StratifiedSample, approx_summarize_by_group, approx_detect_missing
+from q3_data_utils import summarize_by_group, detect_missing
+
+
+def _frame(n=4000, seed=1):
+    rng = np.random.default_rng(seed)
+    age = rng.normal(60, 10, n)
+    age[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        'site': rng.choice(['Site A', 'Site B', 'Site C'], n, p=[0.5, 0.3, 0.2]),
+        'intervention_group': rng.choice(['Control', 'Intervention'], n),
+        'age': age,
+    })
+
+
+def test_full_reservoir_is_exact():
+    df = _frame(600)
+    approx = approx_summarize_by_group(df, 'site', {'age': 'mean'})
+    exact = summarize_by_group(df, 'site', {'age': 'mean'})
+    np.testing.assert_allclose(approx['age'], exact['age'])
+    np.testing.assert_allclose(approx['age_ci_high'], approx['age_ci_low'])
+    assert approx['patient_count'].tolist() == exact['patient_count'].tolist()
+
+
+def test_sampled_estimates_cover_truth():
+    df = _frame()
+    sample = StratifiedSample.from_chunks([df.iloc[:1500], df.iloc[1500:]], capacity=150, seed=3)
+    out = approx_summarize_by_group(sample, 'site', {'age': ['mean', 'count']}).set_index('site')
+    exact = summarize_by_group(df, 'site', {'age': ['mean', 'count']}).set_index('site')
+    assert out.attrs['sample_rows'] == 900
+    assert ((out['age_mean_ci_low'] <= exact['age_mean']) & (exact['age_mean'] <= out['age_mean_ci_high'])).all()
+    np.testing.assert_allclose(out['patient_count'], exact['patient_count'])
+
+    missing = approx_detect_missing(sample, ['age'])
+    assert missing.loc['age', 'ci_low'] <= detect_missing(df)['age'] <= missing.loc['age', 'ci_high']
+
+
+def test_error_budget_grows_sample():
+    sample = StratifiedSample.from_frame(_frame(), capacity=600)
+    loose = approx_summarize_by_group(sample, 'site', {'age': 'mean'}, rel_error=0.05)
+    tight = approx_summarize_by_group(sample, 'site', {'age': 'mean'}, rel_error=0.005)
+    assert loose.attrs['sample_rows'] < tight.attrs['sample_rows']
+    assert loose.attrs['max_relative_error'] <= 0.05
+
+
+def test_missing_strata_and_empty_sample():
+    assert StratifiedSample().population == 0
+    df = _frame(3000)
+    df.loc[df.index[:200], 'site'] = None
+    sample = StratifiedSample.from_chunks([df.iloc[:1000], df.iloc[1000:]], capacity=50)
+    assert sample.population == len(df)
+    rows = sample.take()
+    assert rows.groupby('_skey').size().max() == 50
+    assert rows['_skey'].nunique() == 4 * 2
+
+
+def test_none_and_nan_strata_are_one_stratum():
+    df = _frame(2000)
+    first, second = df.iloc[:1000].copy(), df.iloc[1000:].copy()
+    first['site'] = first['site'].astype(object)
+    first.loc[first.index[:100], 'site'] = None
+    second.loc[second.index[:100], 'site'] = np.nan
+    sample = StratifiedSample.from_chunks([first, second], capacity=1000)
+    rows = sample.take()
+    assert rows['_skey'].nunique() == 4 * 2
+    missing = rows[rows['_skey'].str.startswith('<NA>')]
+    assert len(missing) == 200
+    assert missing.groupby('_skey')['_N'].first().sum() == 200
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from bootstrap import cell_table, bootstrap_rates
+
+
+def _trial(n=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    arm = rng.choice(['Control', 'Intervention'], n)
+    p = np.where(arm == 'Control', 0.35, 0.25)
+    cvd = np.where(rng.random(n) < p, 'Yes', 'No').astype(object)
+    cvd[rng.random(n) < 0.05] = None
+    return pd.DataFrame({'intervention_group': arm, 'outcome_cvd': cvd,
+                         'dropout': np.where(rng.random(n) < 0.15, 'Yes', 'No')})
+
+
+def test_cell_table_counts_patients():
+    df = pd.DataFrame({'intervention_group': ['Control', 'Control', 'Intervention', None],
+                       'outcome_cvd': ['Yes', None, 'No', 'Yes'],
+                       'dropout': ['No', 'No', 'No', 'Yes']})
+    table = cell_table(df)
+    assert table['arms'] == ['Control', 'Intervention']
+    assert table['counts'].sum() == 3
+    np.testing.assert_array_equal(table['counts'] @ table['present'], [[1, 2], [1, 1]])
+    np.testing.assert_array_equal(table['counts'] @ table['positive'], [[1, 0], [0, 0]])
+
+
+def test_intervals_match_binomial_and_reference():
+    df = _trial()
+    result = bootstrap_rates(df, n_resamples=4000, batch_size=512, seed=1)
+    rates = result['rates'].set_index(['outcome', 'intervention_group'])
+    row = rates.loc[('outcome_cvd', 'Control')]
+    present = df[(df['intervention_group'] == 'Control') & df['outcome_cvd'].notna()]
+    assert row['n'] == len(present)
+    assert row['rate'] == (present['outcome_cvd'] == 'Yes').mean()
+    se = np.sqrt(row['rate'] * (1 - row['rate']) / row['n'])
+    assert abs((row['ci_high'] - row['ci_low']) / (2 * 1.96 * se) - 1) < 0.1
+
+    diff = result['differences'].set_index('outcome').loc['outcome_cvd']
+    assert diff['reference'] == 'Control'
+    assert diff['ci_low'] < diff['difference'] < diff['ci_high'] < 0
+
+
+def test_same_result_for_any_worker_count():
+    df = _trial(1000)
+    serial = bootstrap_rates(df, n_resamples=600, batch_size=200, seed=7)
+    parallel = bootstrap_rates(df, n_resamples=600, batch_size=200, seed=7, workers=2)
+    pd.testing.assert_frame_equal(serial['rates'], parallel['rates'])
+    pd.testing.assert_frame_equal(serial['differences'], parallel['differences'])
@@ -0,0 +1,97 @@
+import json
+import time
+import asyncio
+import pandas as pd
+from cohort_service import CohortService
+
+
+def _df():
+    return pd.DataFrame({'patient_id': ['P1', 'P2', 'P3', 'P4'],
+                         'age': [70.0, 40.0, 80.0, None],
+                         'site': ['Site A', 'Site B', 'Site A', 'Site C']})
+
+
+async def _request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    data = json.dumps(body).encode() if body is not None else b''
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\n'
+                 f'Content-Length: {len(data)}\r\n\r\n'.encode() + data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(payload)
+
+
+async def _bad_length(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b'POST /filter HTTP/1.1\r\nContent-Length: lots\r\n\r\n')
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    return int(raw.split()[1]), None
+
+
+def _run(service, scenario):
+    async def main():
+        await service.start(port=0)
+        try:
+            return await scenario(service.port)
+        finally:
+            await service.stop()
+    return asyncio.run(main())
+
+
+def test_filter_summary_and_metrics():
+    service = CohortService(_df(), workers=2)
+
+    async def scenario(port):
+        filt = {'filters': [{'column': 'age', 'condition': 'greater_than', 'value': 60}],
+                'columns': ['patient_id', 'age']}
+        results = await asyncio.gather(
+            _request(port, 'POST', '/filter', filt),
+            _request(port, 'POST', '/summary', {'group_col': 'site', 'agg_dict': {'age': 'mean'}}),
+            _request(port, 'GET', '/health'))
+        results.append(await _request(port, 'GET', '/metrics'))
+        return results
+
+    (s1, f), (s2, summ), (s3, health), (s4, metrics) = _run(service, scenario)
+    assert (s1, s2, s3, s4) == (200, 200, 200, 200)
+    assert f == {'count': 2, 'rows': [{'patient_id': 'P1', 'age': 70.0}, {'patient_id': 'P3', 'age': 80.0}]}
+    assert summ['rows'][0] == {'site': 'Site A', 'age': 75.0, 'patient_count': 2}
+    assert summ['rows'][2]['age'] is None
+    assert health['rows'] == 4
+    assert metrics['endpoints']['/filter']['requests'] == 1
+    assert metrics['endpoints']['/summary']['latency_ms']['max'] >= 0
+
+
+def test_errors_and_timeouts():
+    service = CohortService(_df(), timeout=0.05)
+    service._summary = lambda body: time.sleep(0.5)
+
+    async def scenario(port):
+        return [await _request(port, 'POST', '/summary', {'group_col': 'site'}),
+                await _request(port, 'POST', '/filter', {'filters': [{'column': 'age', 'condition': 'nope', 'value': 1}]}),
+                await _request(port, 'GET', '/nowhere'),
+                await _request(port, 'GET', '/elsewhere'),
+                await _request(port, 'GET', '/filter'),
+                await _bad_length(port),
+                await _request(port, 'GET', '/metrics')]
+
+    results = _run(service, scenario)
+    assert [status for status, _ in results[:-1]] == [504, 400, 404, 404, 405, 400]
+    endpoints = results[-1][1]['endpoints']
+    assert endpoints['unknown']['status'] == {'404': 2}
+    assert '/nowhere' not in endpoints and endpoints['invalid']['status'] == {'400': 1}
+
+
+def test_filtered_summary_is_not_rehashed(monkeypatch):
+    import result_cache
+    service = CohortService(_df(), workers=1)
+    monkeypatch.setattr(result_cache, 'dataset_fingerprint', lambda *a, **k: 1 / 0)
+    body = {'group_col': 'site', 'agg_dict': {'age': 'mean'},
+            'filters': [{'column': 'age', 'condition': 'greater_than', 'value': 50}]}
+    first = service._summary(body)
+    assert service._summary(body) == first
+    assert service.cache.stats()['hits'] == 2  # the filter and the summary
+    service._pool.shutdown()
@@ -0,0 +1,48 @@
+import gzip
+import pandas as pd
+import pytest
+import compressed_io
+from q3_data_utils import load_data, save_data, summarize_visits
+from data_quality import validate_csv
+
+
+def _df(n=5000):
+    return pd.DataFrame({'patient_id': [f'P{i:05d}' for i in range(n)],
+                         'visit_month': [i % 4 * 3 for i in range(n)],
+                         'age': [40 + i % 50 for i in range(n)]})
+
+
+@pytest.mark.parametrize('threaded', [True, False])
+def test_gzip_round_trip_through_load_data(tmp_path, threaded):
+    path = str(tmp_path / 'extract.csv.gz')
+    save_data(_df(), path)
+    with open(path, 'rb') as f:
+        assert f.read(2) == b'\x1f\x8b'
+    pd.testing.assert_frame_equal(load_data(path), _df())
+    out = compressed_io.read_csv(path, threaded=threaded, chunksize=1200)
+    assert sum(len(c) for c in out) == 5000
+
+
+def test_detects_compression_without_extension(tmp_path):
+    path = tmp_path / 'extract.dat'
+    with gzip.open(path, 'wt') as f:
+        _df(10).to_csv(f, index=False)
+    assert compressed_io.detect_compression(str(path)) == 'gzip'
+    assert len(load_data(str(path))) == 10
+    assert validate_csv(str(path), rules={})['rows'] == 10
+
+
+def test_chunked_readers_and_early_close(tmp_path):
+    path = str(tmp_path / 'visits.csv.gz')
+    save_data(_df(), path)
+    assert summarize_visits(path, ['age'], chunksize=700)['n_visits'].sum() == 5000
+    reader = compressed_io.read_csv(path, threaded=True, chunksize=10)
+    next(reader)
+    reader.close()  # stops the decompression thread
+
+
+def test_zstd_round_trip(tmp_path):
+    pytest.importorskip('zstandard')
+    path = str(tmp_path / 'extract.csv.zst')
+    save_data(_df(), path)
+    pd.testing.assert_frame_equal(load_data(path), _df())
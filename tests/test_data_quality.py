@@ -0,0 +1,35 @@
+import pandas as pd
+from data_quality import validate_csv, check_report
+
+
+def _write(tmp_path, rows):
+    df = pd.DataFrame(rows, columns=['patient_id', 'age', 'site', 'enrollment_date'])
+    path = tmp_path / 'raw.csv'
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_validate_csv_counts_across_chunks(tmp_path):
+    path = _write(tmp_path, [
+        ['P1', 45, 'Site A', '2022-01-05'],
+        ['P2', -999, 'site_b', '01/05/2022'],
+        ['P3', 130, 'Site Z', '05-01-2022'],
+        ['P4', None, '  SITE A ', 'Jan 5'],
+    ])
+    report = validate_csv(path, chunksize=2)
+    table = report['columns']
+    assert report['rows'] == 4
+    assert table.loc['age', 'sentinel_count'] == 1
+    assert table.loc['age', 'out_of_range_count'] == 1
+    assert table.loc['age', 'null_count'] == 1
+    assert table.loc['site', 'invalid_category_count'] == 1
+    assert report['date_formats']['enrollment_date'] == {
+        'YYYY-MM-DD': 1, 'MM/DD/YYYY': 1, 'DD-MM-YYYY': 1, '<other>': 1}
+    assert report['spellings']['site']['  SITE A '] == 1
+
+
+def test_check_report_flags_missing_columns_and_rows(tmp_path):
+    path = _write(tmp_path, [['P1', 45, 'Site A', '2022-01-05']])
+    problems = check_report(validate_csv(path), min_rows=10)
+    assert any(p.startswith('MISSING COLUMN: bmi') for p in problems)
+    assert any(p.startswith('TOO FEW ROWS') for p in problems)
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from dataset_store import write_dataset, list_partitions, read_dataset
+from q3_data_utils import load_data, filter_data
+
+
+def _batch(ids, site, date):
+    return pd.DataFrame({'patient_id': ids, 'age': [50.0 + i for i in range(len(ids))],
+                         'enrollment_date': date, 'site': site})
+
+
+def test_append_adds_part_files(tmp_path):
+    root = str(tmp_path / 'store')
+    write_dataset(_batch(['P1', 'P2'], 'Site A', '2022-01-05'), root)
+    first = list_partitions(root)[0][1]
+    write_dataset(_batch(['P3'], 'Site A', '01/20/2022'), root)
+    parts = list_partitions(root)
+    assert len(parts) == 1
+    assert parts[0][0] == {'site': 'Site A', 'enrollment_month': '2022-01'}
+    assert set(first) < set(parts[0][1])
+    assert sorted(read_dataset(root)['patient_id']) == ['P1', 'P2', 'P3']
+
+
+def test_filters_prune_partitions(tmp_path):
+    root = str(tmp_path / 'store')
+    write_dataset(pd.concat([_batch(['P1', 'P2'], 'Site A', '2022-01-05'),
+                             _batch(['P3'], 'Site B', '2022-02-05'),
+                             _batch(['P4'], 'Site C', '2022-03-05'),
+                             _batch(['P5'], None, '2022-03-06')]), root)
+    assert len(list_partitions(root)) == 4
+
+    sites = [{'column': 'site', 'condition': 'in_list', 'value': ['Site A', 'Site B']}]
+    out = filter_data(root, sites + [{'column': 'age', 'condition': 'greater_than', 'value': 50}])
+    assert sorted(out['patient_id']) == ['P2']
+    assert list(out.columns) == ['patient_id', 'age', 'enrollment_date', 'site']
+
+    months = [{'column': 'enrollment_month', 'condition': 'in_range', 'value': ['2022-02', '2022-03']}]
+    out = load_data(root, filters=months, columns=['patient_id', 'enrollment_month'])
+    assert out.values.tolist() == [['P3', '2022-02'], ['P4', '2022-03'], ['P5', '2022-03']]
+
+
+def test_load_data_csv_filters_and_columns(tmp_path):
+    path = tmp_path / 'raw.csv'
+    _batch(['P1', 'P2', 'P3'], 'Site A', '2022-01-05').to_csv(path, index=False)
+    out = load_data(str(path), filters=[{'column': 'age', 'condition': 'greater_than', 'value': 50}],
+                    columns=['patient_id'])
+    assert out['patient_id'].tolist() == ['P2', 'P3']
@@ -0,0 +1,45 @@
+import pandas as pd
+import numpy as np
+from dedup import FingerprintSet, BloomFilter, dedup_batch, load_seen_set
+from q3_data_utils import clean_data
+
+
+def _batch(ids, age):
+    return pd.DataFrame({'patient_id': ids, 'age': age})
+
+
+def test_dedup_across_batches_persists(tmp_path):
+    path = str(tmp_path / 'seen.npy')
+    seen = load_seen_set(path)
+    first = dedup_batch(_batch(['P1', 'P2', 'P2'], [50, 60, 60]), seen=seen)
+    assert list(first['patient_id']) == ['P1', 'P2']
+    seen.save(path)
+
+    seen = load_seen_set(path)
+    second = dedup_batch(_batch(['P2', 'P3'], [60, 70]), seen=seen)
+    assert list(second['patient_id']) == ['P3']
+    assert len(seen) == 3
+
+
+def test_record_hash_tie_breaker():
+    seen = FingerprintSet()
+    dedup_batch(_batch(['P1'], [50]), seen=seen, record_hash=True)
+    # Same key with changed content is a new record; int vs float is not
+    out = dedup_batch(_batch(['P1', 'P1'], [51.0, 50.0]), seen=seen, record_hash=True)
+    assert list(out['age']) == [51.0]
+
+
+def test_bloom_filter_no_false_negatives(tmp_path):
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    fp = np.arange(500, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    bloom.add(fp)
+    assert bloom.contains(fp).all()
+    path = str(tmp_path / 'seen.bloom')
+    bloom.save(path)
+    assert load_seen_set(path, mode='bloom').contains(fp).all()
+
+
+def test_clean_data_dedup_key():
+    df = _batch(['P1', 'P1', 'P2'], [50, 51, 60])
+    assert len(clean_data(df)) == 3
+    assert list(clean_data(df, dedup_key='patient_id')['age']) == [50, 60]
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+import delta_refresh
+from delta_refresh import DELTA_CONFIG, DeltaStore, process_rows, refresh
+from q3_data_utils import summarize_by_group, fill_missing
+
+
+def _extract(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    bmi = rng.normal(27, 4, n).round(1)
+    bmi[rng.random(n) < 0.1] = -999
+    return pd.DataFrame({'patient_id': [f'P{i:05d}' for i in range(n)],
+                         'age': rng.integers(30, 90, n), 'sex': rng.choice(['M', 'female', ' F '], n),
+                         'bmi': bmi, 'enrollment_date': '2022-05-01',
+                         'systolic_bp': rng.normal(125, 15, n).round(),
+                         'cholesterol_total': rng.normal(200, 30, n).round(),
+                         'cholesterol_hdl': rng.normal(50, 10, n).round(),
+                         'site': rng.choice(['Site A', 'site b', 'SITE C'], n),
+                         'intervention_group': rng.choice(['Control', 'Treatment A'], n)})
+
+
+def _next_version(v1):
+    v2 = v1.copy()
+    v2.loc[5:24, 'age'] += 1
+    v2.loc[30:34, 'site'] = 'site e'
+    v2 = v2.drop(index=range(100, 110))
+    new = v1.iloc[:8].assign(patient_id=[f'N{i}' for i in range(8)])
+    return pd.concat([new, v2, v2.iloc[:3]], ignore_index=True)  # with exact duplicates
+
+
+def test_classifies_and_processes_only_changed_rows(tmp_path, monkeypatch):
+    root = str(tmp_path / 'delta')
+    assert refresh(_extract(), root)['inserted'] == 600
+    seen = []
+    original = delta_refresh.process_rows
+
+    def counting(raw, config=None):
+        seen.append(len(raw))
+        return original(raw, config)
+    monkeypatch.setattr(delta_refresh, 'process_rows', counting)
+    counts = refresh(_next_version(_extract()), root)
+    assert {k: counts[k] for k in ('inserted', 'updated', 'deleted', 'unchanged')} == \
+        {'inserted': 8, 'updated': 25, 'deleted': 10, 'unchanged': 565}
+    assert seen == [33]
+    assert refresh(_next_version(_extract()), root)['unchanged'] == 598
+
+
+def test_patched_state_matches_full_recompute(tmp_path):
+    root = str(tmp_path / 'delta')
+    refresh(_extract(), root)
+    v2 = _next_version(_extract())
+    refresh(v2, root)
+    store = DeltaStore.open(root)
+    full = process_rows(v2.drop_duplicates().reset_index(drop=True))
+    pd.testing.assert_frame_equal(store.cleaned(impute=False), full, check_dtype=False)
+    pd.testing.assert_series_equal(store.cleaned()['bmi'], fill_missing(full, 'bmi', 'mean')['bmi'])
+    agg = {c: ['mean', 'std'] for c in DELTA_CONFIG['value_cols'] if c in full.columns}
+    expected = summarize_by_group(full, 'site', agg)
+    pd.testing.assert_frame_equal(store.summary('site')[expected.columns], expected)
+    saved = pd.read_csv(tmp_path / 'delta' / 'summary_intervention_group.csv')
+    assert saved['patient_count'].sum() == len(full)
+
+
+def test_conflicting_rows_and_configs_are_rejected(tmp_path):
+    v1 = _extract(20)
+    bad = pd.concat([v1, v1.iloc[:1].assign(age=1)], ignore_index=True)
+    with pytest.raises(ValueError, match='one row per patient_id'):
+        DeltaStore('unused').refresh(bad)
+    root = str(tmp_path / 'delta')
+    refresh(v1, root)
+    assert DeltaStore.open(root, dict(DELTA_CONFIG)).config == DELTA_CONFIG
+    with pytest.raises(ValueError, match='different config'):
+        refresh(v1, root, dict(DELTA_CONFIG, group_cols=['site']))
+
+
+def test_export_after_delta_matches_full_rebuild(tmp_path):
+    root = str(tmp_path / 'delta')
+    refresh(_extract(), root)
+    v2 = _next_version(_extract())
+    refresh(v2, root, export_dir=str(tmp_path / 'patched'))
+    refresh(v2.drop_duplicates(), str(tmp_path / 'full'), export_dir=str(tmp_path / 'rebuilt'))
+    for name in ['q5_cleaned_data.csv', 'q6_transformed_data.csv', 'q7_site_summary.csv',
+                 'q7_intervention_comparison.csv']:
+        patched = pd.read_csv(tmp_path / 'patched' / name)
+        rebuilt = pd.read_csv(tmp_path / 'rebuilt' / name)
+        pd.testing.assert_frame_equal(patched, rebuilt, check_exact=False)
+    q6 = pd.read_csv(tmp_path / 'patched' / 'q6_transformed_data.csv')
+    # Fixed levels: sites absent from the extract still get a column
+    assert {'site_Site D', 'site_Site E', 'bp_category_Unknown'} <= set(q6.columns)
+    assert 'site' not in q6.columns and 'enrollment_date' not in q6.columns
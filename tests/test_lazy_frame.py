@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+from lazy_frame import LazyFrame
+from q3_data_utils import clean_data, fill_missing, filter_data, create_bins, summarize_by_group
+
+
+def _raw():
+    return pd.DataFrame({
+        'patient_id': ['P1', 'P2', 'P2', 'P3', 'P4', 'P5'],
+        'age': [70, -999, -999, 40, 80, 66],
+        'bmi': [25.0, 30.0, 30.0, None, 22.0, 28.0],
+        'site': ['site a', 'SITE B', 'SITE B', 'Site_A', 'site c', 'Site B'],
+        'glucose_fasting': [90, 100, 100, 110, 120, 130],
+    })
+
+
+def test_lazy_matches_eager_across_chunks(tmp_path):
+    path = tmp_path / 'raw.csv'
+    _raw().to_csv(path, index=False)
+    eager = summarize_by_group(
+        create_bins(fill_missing(clean_data(_raw()), 'bmi', 'median'),
+                    'age', [0, 50, 100], ['<50', '50+']),
+        'site', {'age': 'mean', 'bmi': 'mean'})
+    lazy = (LazyFrame.scan_csv(str(path), chunksize=2).clean()
+            .fill_missing('bmi', 'median')
+            .create_bins('age', [0, 50, 100], ['<50', '50+'])
+            .summarize_by_group('site', {'age': 'mean', 'bmi': 'mean'}))
+    pd.testing.assert_frame_equal(lazy.collect(), eager)
+    # The unused bins step is pruned from the plan
+    assert 'create_bins' not in lazy.explain()
+
+
+def test_projection_and_filters_pushed_into_scan(tmp_path):
+    path = tmp_path / 'raw.csv'
+    _raw().to_csv(path, index=False)
+    filters = [{'column': 'age', 'condition': 'greater_than', 'value': 65}]
+    lazy = (LazyFrame.scan_csv(str(path), chunksize=2).clean(dedup_key='patient_id')
+            .filter(filters).summarize_by_group('site', {'bmi': 'mean'}))
+    plan = lazy.explain()
+    assert '[columns: age, bmi, patient_id, site]' in plan
+    assert 'filter' in plan and 'per chunk' in plan.splitlines()[2]
+    eager = summarize_by_group(filter_data(clean_data(_raw(), dedup_key='patient_id'), filters),
+                               'site', {'bmi': 'mean'})
+    pd.testing.assert_frame_equal(lazy.collect(), eager)
+
+
+def test_parquet_predicate_pushdown(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = tmp_path / 'clean.parquet'
+    clean_data(_raw()).to_parquet(path, index=False)
+    filters = [{'column': 'site', 'condition': 'in_list', 'value': ['Site A']}]
+    out = LazyFrame.scan_parquet(str(path)).filter(filters).select(['patient_id']).collect()
+    assert out['patient_id'].tolist() == ['P1', 'P3']
+
+
+def test_lazy_features_prune_unused(tmp_path):
+    from q3_data_utils import compute_features
+    path = tmp_path / 'raw.csv'
+    _raw().assign(cholesterol_ldl=120.0, cholesterol_hdl=60.0).to_csv(path, index=False)
+    lf = (LazyFrame.scan_csv(str(path), chunksize=2).clean().add_features()
+          .summarize_by_group('site', {'cholesterol_ratio': 'mean'}))
+    assert 'bmi_category' not in lf.explain()
+    eager = summarize_by_group(compute_features(clean_data(pd.read_csv(path))),
+                               'site', {'cholesterol_ratio': 'mean'})
+    pd.testing.assert_frame_equal(lf.collect(), eager)
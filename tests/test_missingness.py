@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from missingness import pattern_codes, missing_patterns, missing_patterns_csv, co_missing_counts
+
+
+def _frame():
+    return pd.DataFrame({
+        'site': ['Site A', 'Site A', 'Site B', 'Site B'],
+        'systolic_bp': [np.nan, 120, np.nan, 130],
+        'diastolic_bp': [np.nan, 80, np.nan, 85],
+        'bmi': [22.0, np.nan, 25.0, 30.0],
+    })
+
+
+def test_pattern_codes_bits():
+    codes, cols = pattern_codes(_frame(), ['systolic_bp', 'diastolic_bp', 'bmi'])
+    assert codes.tolist() == [3, 4, 3, 0]
+
+
+def test_missing_patterns_by_site_and_co_missing():
+    df = _frame()
+    cols = ['systolic_bp', 'diastolic_bp', 'bmi']
+    by_site = missing_patterns(df, cols, by='site')
+    site_b = by_site[by_site['site'] == 'Site B'].set_index('pattern')
+    assert site_b.loc['systolic_bp+diastolic_bp', 'count'] == 1
+    assert site_b.loc['<complete>', 'fraction'] == 0.5
+
+    overall = missing_patterns(df, cols)
+    co = co_missing_counts(overall, cols)
+    assert co.loc['systolic_bp', 'diastolic_bp'] == 2
+    assert co.loc['bmi', 'bmi'] == 1
+
+
+def test_missing_patterns_csv_matches_in_memory(tmp_path):
+    path = tmp_path / 'raw.csv'
+    _frame().to_csv(path, index=False)
+    streamed = missing_patterns_csv(str(path), by='site', chunksize=1, clean=False)
+    pd.testing.assert_frame_equal(streamed, missing_patterns(_frame(), by='site'))
+    cols = ('systolic_bp', 'bmi')
+    pd.testing.assert_frame_equal(missing_patterns_csv(str(path), pd.Index(cols), by='site', clean=False),
+                                  missing_patterns(_frame(), list(cols), by='site'))
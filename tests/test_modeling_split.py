@@ -0,0 +1,52 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from modeling_split import stratum_codes, assign_splits, assign_folds, export_splits, load_split
+
+
+def _df(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    site = rng.choice(['a', 'b', 'c'], n)
+    df = pd.DataFrame({'age': rng.integers(30, 80, n), 'bmi': rng.normal(27, 4, n),
+                       'outcome_cvd': rng.choice(['Yes', 'No', None], n, p=[0.3, 0.6, 0.1]),
+                       'intervention_group': rng.choice(['Control', 'Treatment A'], n)})
+    for s in ['a', 'b', 'c']:
+        df[f'site_{s}'] = site == s
+    return df
+
+
+def test_one_hot_strata_and_split_proportions():
+    df = _df()
+    codes = stratum_codes(df)
+    assert len(np.unique(codes)) == 3 * 3 * 2
+    split = assign_splits(df, seed=3)
+    pd.testing.assert_series_equal(split, assign_splits(df, seed=3))
+    table = pd.crosstab(codes, split)
+    expected = np.outer(table.sum(axis=1), [0.7, 0.15, 0.15])
+    assert np.abs(table.to_numpy() - expected).max() <= 1
+    folds = assign_folds(df, k=4)
+    sizes = pd.crosstab(codes, folds)
+    assert (sizes.max(axis=1) - sizes.min(axis=1)).max() <= 1
+
+
+def test_invalid_fractions_and_missing_strata():
+    with pytest.raises(ValueError):
+        assign_splits(_df(), {'train': 0.8, 'test': 0.3})
+    with pytest.raises(KeyError):
+        stratum_codes(_df(), ['sex'])
+
+
+def test_streamed_export_matches_assignment(tmp_path):
+    df = _df()
+    source = tmp_path / 'q6.csv'
+    df.to_csv(source, index=False)
+    out = tmp_path / 'splits'
+    counts = export_splits(str(source), str(out), seed=1, folds=5, chunksize=300)
+    split = assign_splits(pd.read_csv(source), seed=1)
+    assert counts == split.value_counts(sort=False).to_dict()
+    test = load_split(str(out), 'test')
+    pd.testing.assert_frame_equal(test, pd.read_csv(source)[split == 'test'].reset_index(drop=True))
+    train = load_split(str(out), 'train', columns=['age', 'fold'], folds=[0, 1])
+    assert set(train['fold']) == {0, 1} and list(train.columns) == ['age', 'fold']
+    assert json.loads((out / 'manifest.json').read_text())['rows'] == counts
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from parallel_csv import byte_ranges, read_csv_parallel
+from q3_data_utils import load_data
+
+
+def _mixed(n=4000):
+    late_text = np.full(n, np.nan, dtype=object)
+    late_text[n - 2] = 'late'
+    flags = np.array([True, False] * (n // 2), dtype=object)
+    flags[n - 1] = None
+    mixed = np.arange(n).astype(object)
+    mixed[n - 3] = 'abc'
+    maybe_nan = np.arange(n, dtype=float)
+    maybe_nan[n - 5] = np.nan
+    return pd.DataFrame({'patient_id': [f'P{i:05d}' for i in range(n)], 'i': np.arange(n),
+                         'maybe_nan': maybe_nan, 'mixed': mixed, 'late_text': late_text,
+                         'flag': flags})
+
+
+def test_byte_ranges_split_on_line_boundaries(tmp_path):
+    path = tmp_path / 'extract.csv'
+    _mixed().to_csv(path, index=False)
+    data = path.read_bytes()
+    start, ranges = byte_ranges(str(path), 7)
+    assert data[start - 1:start] == b'\n' and ranges[0][0] == start
+    assert ranges[-1][1] == len(data) and len(ranges) == 7
+    for (_, end), (nxt, _) in zip(ranges, ranges[1:]):
+        assert end == nxt and data[end - 1:end] == b'\n'
+
+
+@pytest.mark.parametrize('usecols', [None, ['patient_id', 'mixed', 'flag']])
+def test_matches_single_read_with_mixed_dtypes(tmp_path, usecols):
+    path = str(tmp_path / 'extract.csv')
+    _mixed().to_csv(path, index=False)
+    out = read_csv_parallel(path, workers=3, min_part_bytes=1000, usecols=usecols)
+    pd.testing.assert_frame_equal(out, pd.read_csv(path, usecols=usecols))
+
+
+def test_load_data_workers(tmp_path):
+    path = str(tmp_path / 'extract.csv')
+    _mixed(500).to_csv(path, index=False)
+    pd.testing.assert_frame_equal(load_data(path, workers=2), load_data(path))
+    with pytest.raises(ValueError, match='nrows'):
+        read_csv_parallel(path, nrows=10)
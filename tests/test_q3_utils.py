@@ -1,6 +1,9 @@
 import pandas as pd
 import numpy as np
-from q3_data_utils import detect_missing, fill_missing, create_bins
+from q3_data_utils import (clean_data, detect_missing, fill_missing, create_bins, compute_features,
+                           register_feature, load_data, encode_patient_ids, decode_patient_ids,
+                           join_patient_visits, summarize_visits)
+import pytest
 
 
 def test_detect_missing():
@@ -22,3 +25,105 @@ def test_create_bins():
     out = create_bins(df, 'age', bins=[0,18,35,50,100], labels=['<18','18-34','35-49','50+'])
     assert out['age_binned'].dtype.name == 'category'
     assert str(out.loc[0, 'age_binned']) == '<18'
+
+
+def test_clean_data_rules_sentinels_and_ranges():
+    df = pd.DataFrame({'age': [-999, 45, 130], 'bmi': [-1, 22.5, 30.0],
+                       'site': ['  site_a ', 'SITE  B', 'Site Z']})
+    out = clean_data(df)
+    assert out['age'].isna().tolist() == [True, False, True]
+    assert out['bmi'].isna().sum() == 1
+    assert out['site'].tolist()[:2] == ['Site A', 'Site B']
+    assert pd.isna(out.loc[2, 'site'])
+
+
+def test_clean_data_custom_rules_only_touch_ruled_columns():
+    df = pd.DataFrame({'code': ['-1', 'x'], 'score': [-1, 5]})
+    rules = {'score': {'sentinels': [-1]}}
+    out = clean_data(df, rules=rules)
+    assert out['code'].tolist() == ['-1', 'x']
+    assert out['score'].isna().tolist() == [True, False]
+
+
+def test_compute_features_defaults():
+    df = pd.DataFrame({'cholesterol_ldl': [100.0, 150.0], 'cholesterol_hdl': [50.0, 0.0],
+                       'systolic_bp': [135.0, np.nan], 'age': [30, 70], 'bmi': [18.5, 31.0]})
+    out = compute_features(df)
+    assert out['cholesterol_ratio'].tolist()[0] == 2.0
+    assert out['bp_category'].tolist() == ['High', 'Unknown']
+    assert out['age_group'].astype(str).tolist() == ['<40', '55-69']
+    assert out['bmi_category'].astype(str).tolist() == ['Normal', 'Obese']
+    assert 'cholesterol_ratio' not in df.columns
+
+
+def test_feature_dependencies_and_cycles():
+    defs = {}
+    register_feature('high_ratio', 'select', defs, conditions=[('ratio > 2', 'Yes')], default='No')
+    register_feature('ratio', 'expr', defs, expr='ldl / hdl')
+    out = compute_features(pd.DataFrame({'ldl': [90.0, 150.0], 'hdl': [60.0, 50.0]}),
+                           ['high_ratio'], defs)
+    assert out['high_ratio'].tolist() == ['No', 'Yes']
+    register_feature('ratio', 'expr', defs, expr='high_ratio * 2')
+    with pytest.raises(ValueError):
+        compute_features(pd.DataFrame({'ldl': [1.0]}), ['high_ratio'], defs)
+
+
+def test_patient_id_codec_round_trips():
+    ids = pd.Series(['P00001', 'P00042', None, 'P123456'])
+    codes, codec = encode_patient_ids(ids)
+    assert codec['kind'] == 'pattern' and codes.dtype == np.int32
+    assert codes.tolist() == [1, 42, -1, 123456]
+    assert decode_patient_ids(codes, codec).tolist()[:2] == ['P00001', 'P00042']
+    assert encode_patient_ids(['P00042', 'Q1'], codec)[0].tolist() == [42, -1]
+    padded = encode_patient_ids(pd.Series(['P1', 'P0001', 'P00001', 'P000001', 'P100000']), codec)[0]
+    assert padded.tolist() == [-1, -1, 1, -1, 100000]
+
+    codes, codec = encode_patient_ids(pd.Series(['P1', 'P007', 'abc']))
+    assert codec['kind'] == 'dictionary'
+    assert decode_patient_ids(codes, codec).tolist() == ['P1', 'P007', 'abc']
+
+
+def test_load_data_compact(tmp_path):
+    path = tmp_path / 'raw.csv'
+    pd.DataFrame({'patient_id': [f'P{i:05d}' for i in range(1, 101)],
+                  'site': ['Site A', 'Site B'] * 50,
+                  'note': [f'n{i}' for i in range(100)]}).to_csv(path, index=False)
+    df = load_data(str(path), compact=True)
+    assert df['patient_id'].dtype == np.int32
+    assert df['site'].dtype == 'category'
+    assert df['note'].dtype != 'category'
+    usage = df.attrs['memory_usage']
+    assert usage['after'] < usage['before']
+    assert decode_patient_ids(df['patient_id'], df.attrs['patient_id_codec'])[99] == 'P00100'
+
+
+def _visits():
+    return pd.DataFrame({'patient_id': ['P00002', 'P00001', 'P00002', 'P00009', 'P00001', 'P00002'],
+                         'visit_month': [3, 0, 0, 0, 3, 6],
+                         'systolic_bp': [130.0, 120.0, np.nan, 110.0, 125.0, np.nan]})
+
+
+def test_join_patient_visits_sorted_merge():
+    patients = pd.DataFrame({'patient_id': ['P00002', 'P00001'], 'site': ['Site B', 'Site A']})
+    inner = join_patient_visits(_visits(), patients)
+    assert inner.index.tolist() == [0, 1, 2, 4, 5]
+    assert inner['site'].tolist() == ['Site B', 'Site A', 'Site B', 'Site A', 'Site B']
+    left = join_patient_visits(_visits(), patients, how='left')
+    assert len(left) == 6 and pd.isna(left.loc[3, 'site'])
+
+    # Differently padded visit IDs are other keys, not patient P00001
+    padded = _visits().assign(patient_id=['P1', 'P00001', 'P0001', 'P000001', 'P00002', 'P2'])
+    inner = join_patient_visits(padded, patients)
+    assert inner['patient_id'].tolist() == ['P00001', 'P00002']
+    assert join_patient_visits(padded, patients, how='left')['site'].notna().sum() == 2
+
+
+def test_summarize_visits_chunked_matches_whole():
+    visits = _visits()
+    whole = summarize_visits(visits)
+    chunked = summarize_visits([visits.iloc[:2], visits.iloc[2:4], visits.iloc[4:]])
+    pd.testing.assert_frame_equal(whole, chunked)
+    row = whole.set_index('patient_id').loc['P00002']
+    assert row['n_visits'] == 3 and row['last_visit_month'] == 6
+    assert row['systolic_bp_baseline'] == 130.0 and row['systolic_bp_change'] == 0.0
+    assert whole.set_index('patient_id').loc['P00001', 'systolic_bp_change'] == 5.0
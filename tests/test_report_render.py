@@ -0,0 +1,22 @@
+import os
+import pandas as pd
+from report_render import render_figures
+
+
+def test_render_skips_unchanged_and_rerenders_changed(tmp_path):
+    counts = pd.Series({'Site A': 3, 'Site B': 2})
+    table = pd.DataFrame({'Control': [1, 2], 'Intervention': [2, 0]}, index=['Site A', 'Site B'])
+    specs = [
+        {'kind': 'bar', 'data': counts, 'path': str(tmp_path / 'counts.png'), 'title': 'Counts'},
+        {'kind': 'heatmap', 'data': table, 'path': str(tmp_path / 'crosstab.png')},
+    ]
+    first = render_figures(specs, workers=2)
+    assert sorted(first['rendered']) == sorted(s['path'] for s in specs)
+    assert all(os.path.exists(s['path']) for s in specs)
+
+    second = render_figures(specs)
+    assert second['rendered'] == [] and len(second['skipped']) == 2
+
+    specs[0]['data'] = pd.Series({'Site A': 4, 'Site B': 2})
+    third = render_figures(specs)
+    assert third['rendered'] == [specs[0]['path']]
@@ -0,0 +1,63 @@
+import pandas as pd
+from result_cache import ResultCache, dataset_fingerprint, cached_filter_data, cached_summarize_by_group
+
+
+def _df():
+    return pd.DataFrame({'site': ['Site A', 'Site B', 'Site A'], 'age': [70, 40, 80]})
+
+
+def test_equivalent_filters_hit_and_results_are_isolated():
+    cache = ResultCache()
+    df = _df()
+    f1 = [{'column': 'age', 'condition': 'greater_than', 'value': 50},
+          {'column': 'site', 'condition': 'in_list', 'value': ['Site A', 'Site B']}]
+    f2 = [f1[1] | {'value': ['Site B', 'Site A']}, f1[0]]
+    first = cached_filter_data(df, f1, cache=cache)
+    first.loc[0, 'age'] = -1
+    second = cached_filter_data(df, f2, cache=cache)
+    assert second['age'].tolist() == [70, 80]
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_fingerprint_changes_with_data_and_invalidate():
+    cache = ResultCache()
+    df = _df()
+    cached_summarize_by_group(df, 'site', {'age': 'mean'}, cache=cache)
+    other = df.assign(age=[71, 40, 80])
+    assert dataset_fingerprint(other) != dataset_fingerprint(df)
+    out = cached_summarize_by_group(other, 'site', {'age': 'mean'}, cache=cache)
+    assert out.loc[0, 'age'] == 75.5
+    assert cache.invalidate(dataset_fingerprint(df)) == 1
+    assert cache.stats()['entries'] == 1
+
+
+def test_lru_byte_bound_and_disk_tier(tmp_path):
+    df = _df()
+    cache = ResultCache(max_bytes=1, disk_dir=str(tmp_path))
+    cached_summarize_by_group(df, 'site', cache=cache)
+    assert cache.stats()['bytes'] == 0  # too large for memory, kept on disk
+    fresh = ResultCache(disk_dir=str(tmp_path))
+    out = cached_summarize_by_group(df, 'site', cache=fresh)
+    assert fresh.stats()['disk_hits'] == 1
+    assert out['patient_count'].tolist() == [2, 1]
+
+
+def test_frame_hashed_once_and_forget_sees_edits(monkeypatch):
+    import result_cache
+    calls = []
+    monkeypatch.setattr(result_cache, 'dataset_fingerprint',
+                        lambda df: calls.append(1) or dataset_fingerprint(df))
+    cache = ResultCache()
+    df = pd.DataFrame({'site': ['Site A', 'Site B'] * 500, 'age': range(1000)})
+    before = cached_summarize_by_group(df, 'site', {'age': 'mean'}, cache=cache)
+    cached_summarize_by_group(df, 'site', {'age': 'mean'}, cache=cache)
+    cached_filter_data(df, [], cache=cache)
+    assert len(calls) == 1 and cache.stats()['hits'] == 1
+
+    sampled = dataset_fingerprint(df, exact=False)
+    df.loc[1, 'age'] = 10_000  # in place, between sampled rows
+    assert dataset_fingerprint(df, exact=False) == sampled
+    cache.forget(df)
+    after = cached_summarize_by_group(df, 'site', {'age': 'mean'}, cache=cache)
+    assert after.loc[1, 'age'] != before.loc[1, 'age']
+    assert len(calls) == 2
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from risk_score import RISK_MODEL, risk_score, top_k_by_group, TopKAccumulator
+
+
+def _df(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'patient_id': [f'P{i:05d}' for i in range(n)],
+                       'site': rng.choice(['Site A', 'Site B', 'Site C', None], n, p=[0.4, 0.3, 0.25, 0.05]),
+                       'intervention_group': rng.choice(['Control', 'Intervention'], n),
+                       'age': rng.integers(30, 90, n).astype(float),
+                       'systolic_bp': rng.normal(130, 15, n).round(),
+                       'cholesterol_total': rng.normal(200, 30, n).round(),
+                       'cholesterol_hdl': rng.normal(50, 10, n).round(),
+                       'glucose_fasting': rng.normal(100, 15, n).round(),
+                       'bmi': rng.normal(28, 4, n).round(1)})
+    df.loc[rng.random(n) < 0.05, 'bmi'] = np.nan
+    return df
+
+
+def test_score_matches_formula():
+    df = _df(50)
+    z = (RISK_MODEL['intercept'] + 0.06 * df['age'] + 0.018 * df['systolic_bp']
+         + 0.3 * df['cholesterol_total'] / df['cholesterol_hdl'] + 0.008 * df['glucose_fasting']
+         + 0.03 * df['bmi'])
+    np.testing.assert_allclose(risk_score(df), 1 / (1 + np.exp(-z)))
+    linear = dict(RISK_MODEL, link='linear')
+    np.testing.assert_allclose(risk_score(df, linear), z)
+    with pytest.raises(KeyError):
+        risk_score(df.drop(columns='bmi'))
+
+
+def test_top_k_matches_full_sort_with_ties():
+    df = _df()
+    df.loc[df.index[:40], ['age', 'systolic_bp', 'cholesterol_total', 'cholesterol_hdl',
+                           'glucose_fasting', 'bmi']] = [95, 180, 300, 30, 150, 40]
+    top = top_k_by_group(df, 5, ['site', 'intervention_group'])
+    expected = (df.assign(risk_score=risk_score(df)).dropna(subset=['site', 'risk_score'])
+                .sort_values('risk_score', ascending=False, kind='stable')
+                .groupby(['site', 'intervention_group']).head(5))
+    assert len(top) == 3 * 2 * 5
+    assert set(top['patient_id']) == set(expected['patient_id'])
+    first = top[(top['site'] == 'Site A') & (top['intervention_group'] == 'Control')]
+    assert list(first['rank']) == [1, 2, 3, 4, 5]
+    assert first['risk_score'].is_monotonic_decreasing
+
+
+def test_streaming_heaps_equal_batch():
+    df = _df()
+    acc = TopKAccumulator(k=7, group_cols=['site'])
+    for start in range(0, len(df), 250):
+        acc.update(df.iloc[start:start + 250])
+    assert acc.rows_seen == len(df)
+    pd.testing.assert_frame_equal(acc.result(), top_k_by_group(df, 7, ['site']))
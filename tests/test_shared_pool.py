@@ -0,0 +1,53 @@
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from shared_pool import SharedFrame, SharedPool
+from q3_data_utils import summarize_by_group, fill_missing
+
+
+def _df(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    bmi = rng.normal(27, 4, n)
+    bmi[rng.random(n) < 0.1] = np.nan
+    site = rng.choice(['Site A', 'Site B', 'Site C', 'Site D', None], n).astype(object)
+    return pd.DataFrame({'patient_id': [f'P{i:05d}' for i in range(n)],
+                         'age': rng.integers(30, 80, n), 'bmi': bmi, 'site': site,
+                         'arm': pd.Categorical(rng.choice(['Control', 'Intervention'], n))})
+
+
+def test_shared_frame_round_trips_without_pickling_data():
+    df = _df()
+    with SharedFrame(df) as frame:
+        pd.testing.assert_frame_equal(frame.view.frame(), df)
+    df = df.drop(columns='patient_id')
+    with SharedFrame(df) as frame:
+        assert len(pickle.dumps(frame.spec)) < len(pickle.dumps(df)) // 10
+        bmi = frame.view.column('bmi')
+        assert np.shares_memory(bmi.to_numpy(), frame.view.array('bmi'))
+        del bmi
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_parallel_summary_matches_summarize_by_group(workers):
+    df = _df()
+    agg = {'bmi': ['mean', 'median'], 'age': 'max', 'patient_id': 'nunique'}
+    with SharedPool(df, workers=workers) as pool:
+        for group_col, agg_dict in [('site', agg), ('arm', {'bmi': 'mean'}), ('age', None)]:
+            pd.testing.assert_frame_equal(pool.summarize_by_group(group_col, agg_dict),
+                                          summarize_by_group(df, group_col, agg_dict))
+
+
+def test_parallel_fill_matches_fill_missing():
+    df = _df()
+    with SharedPool(df, workers=2) as pool:
+        published = pool.frame.nbytes
+        filled = pool.fill_missing(['bmi', 'age'], 'median')
+        assert pool.frame.nbytes == published  # output blocks are freed per call
+        expected = fill_missing(fill_missing(df, 'bmi', 'median'), 'age', 'median')
+        pd.testing.assert_frame_equal(filled, expected)
+        assert filled.attrs['fill_values']['bmi'] == df['bmi'].median()
+        pd.testing.assert_frame_equal(pool.fill_missing(['site', 'bmi'], 'ffill'),
+                                      fill_missing(fill_missing(df, 'site', 'ffill'), 'bmi', 'ffill'))
+        with pytest.raises(TypeError):
+            pool.fill_missing(['site'], 'mean')